@@ -0,0 +1,166 @@
+import asyncio
+import contextlib
+import random
+import time
+from collections import namedtuple
+from urllib.parse import urlsplit
+
+from concurrency import THROTTLE_STATUSES
+
+FetchResult = namedtuple("FetchResult", ["url", "status", "text", "error"])
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Ограничитель частоты запросов: не более `rate` запросов в секунду
+    с допустимым всплеском до `burst` запросов.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or max(1, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def backoff_delay(attempt, base=0.5, cap=30.0, retry_after=None):
+    """Экспоненциальная задержка с джиттером; Retry-After сервера имеет приоритет."""
+    if retry_after:
+        try:
+            return min(cap, float(retry_after))
+        except ValueError:
+            pass
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class AsyncFetcher:
+    """
+    Асинхронная загрузка страниц через один пул keep-alive соединений
+    с ограничением частоты для каждого хоста и повторами на 429/5xx.
+    Если передан `metrics` (metrics.StageMetrics), каждая попытка отмечается
+    как внешний вызов `call_name`, а повторы — в счётчике повторов.
+    Если передан `controller` (concurrency.ConcurrencyController), число одновременных
+    запросов к хосту задаёт он, а max_connections — только нижняя граница размера пула.
+    """
+
+    def __init__(self, max_connections=10, rate_per_host=5.0, burst=None,
+                 max_retries=4, timeout=10, headers=None, metrics=None, call_name="http", controller=None):
+        self.max_connections = max_connections or 10
+        self.controller = controller
+        if controller is not None:
+            self.max_connections = max(self.max_connections, controller.ceiling)
+        self.rate_per_host = rate_per_host
+        self.burst = burst
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.headers = headers or {"User-Agent": "Mozilla/5.0"}
+        self.metrics = metrics
+        self.call_name = call_name
+        self._buckets = {}
+        self._session = None
+
+    def _bucket(self, url):
+        host = urlsplit(url).netloc
+        if host not in self._buckets:
+            self._buckets[host] = TokenBucket(self.rate_per_host, self.burst)
+        return self._buckets[host]
+
+    async def __aenter__(self):
+        # aiohttp импортируется при первом запросе: proj_2 с браузером и proj_1 --reparse обходятся без него
+        import aiohttp
+
+        connector = aiohttp.TCPConnector(limit=self.max_connections, limit_per_host=self.max_connections)
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            headers=self.headers,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._session.close()
+
+    def _slot(self, url):
+        if self.controller is None:
+            return contextlib.nullcontext()
+        return self.controller.slot_async(url)
+
+    def _record(self, started, ok, host_limit=None, throttled=False):
+        seconds = time.perf_counter() - started
+        if self.metrics is not None:
+            self.metrics.call(self.call_name, seconds, ok)
+        # Прочие ошибки (500, обрыв соединения) о перегрузке не говорят и лимит не меняют
+        if host_limit is not None and (ok or throttled):
+            host_limit.record(seconds, throttled)
+            if self.metrics is not None:
+                self.metrics.gauge(f"concurrency {host_limit.host}", int(host_limit.limit))
+
+    async def fetch(self, url):
+        import aiohttp
+
+        error = None
+        status = None
+        for attempt in range(self.max_retries + 1):
+            if self.rate_per_host:
+                await self._bucket(url).acquire()
+            retry_after = None
+            throttled = False
+            async with self._slot(url) as host_limit:
+                started = time.perf_counter()
+                try:
+                    async with self._session.get(url) as response:
+                        status = response.status
+                        if status not in RETRY_STATUSES:
+                            text = await response.text(errors="replace")
+                            self._record(started, True, host_limit)
+                            return FetchResult(url, status, text, None)
+                        retry_after = response.headers.get("Retry-After")
+                        error = f"HTTP {status}"
+                        throttled = status in THROTTLE_STATUSES
+                except asyncio.TimeoutError as e:
+                    error = f"{type(e).__name__}: {e}"
+                    throttled = True
+                except aiohttp.ClientError as e:
+                    error = f"{type(e).__name__}: {e}"
+                self._record(started, False, host_limit, throttled)
+            if attempt < self.max_retries:
+                if self.metrics is not None:
+                    self.metrics.retry(self.call_name)
+                await asyncio.sleep(backoff_delay(attempt, retry_after=retry_after))
+        return FetchResult(url, status, None, error)
+
+    async def fetch_all(self, urls, on_done=None):
+        """Загружает все ссылки; порядок результатов совпадает с порядком `urls`."""
+        semaphore = asyncio.Semaphore(self.max_connections)
+
+        async def worker(url):
+            async with semaphore:
+                result = await self.fetch(url)
+            if on_done:
+                on_done(result)
+            return result
+
+        return await asyncio.gather(*(worker(url) for url in urls))
+
+
+def fetch_pages(urls, on_done=None, **kwargs):
+    """Синхронная обёртка над AsyncFetcher.fetch_all для вызова из run_steps."""
+    async def main():
+        async with AsyncFetcher(**kwargs) as fetcher:
+            return await fetcher.fetch_all(urls, on_done=on_done)
+
+    return asyncio.run(main())
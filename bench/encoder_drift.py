@@ -0,0 +1,118 @@
+"""
+Сравнение режимов кодирования PatentSBERTa (fp32 / int8 / onnx) по скорости
+и по расхождению итоговых скоров с fp32.
+Запуск: python -m bench.encoder_drift --modes int8 onnx --processes 1 4
+"""
+import argparse
+import json
+import random
+import time
+
+import numpy as np
+
+from datastore import read_table
+from encoder import EncodingEngine
+from proj_4 import MODEL_NAME, generate_synthesis_phrases
+from scoring import SimilarityScorer
+
+SUBJECTS = ["xanthan gum", "ethanol", "formaldehyde", "lithium carbonate", "citric acid", "polyethylene glycol"]
+TEMPLATES = [
+    "A method for producing {s} comprising mixing the reagents in a microfluidic channel and heating.",
+    "The invention relates to a continuous flow process for the preparation of {s} with improved yield.",
+    "A composition containing {s} for use in the food industry is disclosed.",
+    "An apparatus for the purification of {s} by crystallization is described.",
+]
+
+
+def load_rows(table, limit):
+    """Строки (аннотации, запросы) из таблицы Angl_Abstract или синтетический набор, если её нет."""
+    rows = []
+    try:
+        df = read_table(table, columns=["abstracts", "Name"])
+    except FileNotFoundError:
+        df = None
+    if df is not None:
+        for abstracts, name in zip(df["abstracts"].head(limit), df["Name"].head(limit)):
+            abstracts = dict(abstracts)
+            queries = [name] if isinstance(name, str) else []
+            if abstracts and queries:
+                rows.append((abstracts, queries))
+    if rows:
+        return rows
+    rng = random.Random(0)
+    for i in range(limit):
+        subject = rng.choice(SUBJECTS)
+        abstracts = {f"US{i:07d}{k}": rng.choice(TEMPLATES).format(s=rng.choice(SUBJECTS)) for k in range(8)}
+        rows.append((abstracts, [subject]))
+    return rows
+
+
+def encode_rows(rows, engine):
+    texts = list(dict.fromkeys(
+        [a for abstracts, _ in rows for a in abstracts.values()]
+        + [p for _, queries in rows for q in queries for p in generate_synthesis_phrases(q)]
+    ))
+    engine.model  # загрузка модели не входит в замер
+    start = time.perf_counter()
+    embeddings = engine.encode(texts, show_progress_bar=False)
+    elapsed = time.perf_counter() - start
+    rows_by_text = {t: i for i, t in enumerate(texts)}
+    phrase_rows = {
+        q: np.array([rows_by_text[p] for p in generate_synthesis_phrases(q)])
+        for _, queries in rows for q in queries
+    }
+    scorer = SimilarityScorer(embeddings, rows_by_text, phrase_rows)
+    scores = [scorer.score_matrix(list(abstracts.values()), queries) for abstracts, queries in rows]
+    return scores, elapsed, len(texts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--table", default="Angl_Abstract", help="таблица с аннотациями (datastore)")
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--modes", nargs="+", default=["int8"])
+    parser.add_argument("--processes", nargs="+", type=int, default=[1])
+    parser.add_argument("--output", default=None, help="JSON-файл для отчёта")
+    args = parser.parse_args()
+
+    rows = load_rows(args.table, args.rows)
+    report = []
+    baseline, base_time, n_texts = encode_rows(rows, EncodingEngine(args.model))
+    report.append({"mode": "fp32", "processes": 1, "seconds": base_time, "texts_per_sec": n_texts / base_time})
+
+    for mode in args.modes:
+        for processes in args.processes:
+            engine = EncodingEngine(args.model, mode=mode, processes=processes)
+            scores, elapsed, _ = encode_rows(rows, engine)
+            engine.close()
+            diffs = np.concatenate([np.abs(a - b).ravel() for a, b in zip(scores, baseline)])
+            best_diffs = [abs(float(a.max()) - float(b.max())) for a, b in zip(scores, baseline) if a.size]
+            top1 = [int(a.max(axis=(1, 2)).argmax() == b.max(axis=(1, 2)).argmax()) for a, b in zip(scores, baseline) if a.size]
+            report.append({
+                "mode": mode,
+                "processes": processes,
+                "seconds": elapsed,
+                "texts_per_sec": n_texts / elapsed,
+                "max_score_drift": float(diffs.max()),
+                "mean_score_drift": float(diffs.mean()),
+                "max_best_score_drift": max(best_diffs),
+                "top1_agreement": sum(top1) / len(top1),
+            })
+
+    print(f"Строк: {len(rows)}, текстов: {n_texts}")
+    for entry in report:
+        line = f"{entry['mode']:>5} x{entry['processes']}: {entry['seconds']:.2f} с ({entry['texts_per_sec']:.1f} текстов/с)"
+        if "max_score_drift" in entry:
+            line += (
+                f", расхождение скоров: макс {entry['max_score_drift']:.4f}, среднее {entry['mean_score_drift']:.5f}; "
+                f"best_score: макс {entry['max_best_score_drift']:.4f}; совпадение лучшего патента {entry['top1_agreement']:.1%}"
+            )
+        print(line)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Подмены внешних зависимостей для офлайн-бенчмарков: переводчик, модель эмбеддингов
+и google_patent_scraper, который ходит на локальную заглушку вместо patents.google.com.
+"""
+import hashlib
+import time
+
+import numpy as np
+
+
+class FakeTranslator:
+    """Замена GoogleTranslator: помечает каждую строку и ждёт `latency` секунд на запрос."""
+
+    latency = 0.0
+    calls = 0
+
+    def __init__(self, source="auto", target="en"):
+        self.target = target
+
+    def translate(self, text):
+        FakeTranslator.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return "\n".join(f"[{self.target}] {line}" for line in text.split("\n"))
+
+
+class FakeEncoder:
+    """Замена SentenceTransformer: детерминированные векторы по хэшу текста."""
+
+    def __init__(self, dim=768):
+        self.dim = dim
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, **kwargs):
+        vectors = np.empty((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            seed = int(hashlib.md5(text.encode("utf-8")).hexdigest()[:8], 16)
+            vectors[i] = np.random.default_rng(seed).standard_normal(self.dim, dtype=np.float32)
+        return vectors
+
+
+def stub_scraper_class(base_url):
+    """Подкласс scraper_class, который запрашивает страницы патентов у заглушки."""
+    from google_patent_scraper import scraper_class
+
+    class StubScraper(scraper_class):
+        def request_single_patent(self, patent, url=False):
+            return super().request_single_patent(f"{base_url}/patent/{patent}/en", url=True)
+
+    return StubScraper
+
+
+def install(patents_base_url, translator_latency=0.0, fake_model=True):
+    """Подменяет переводчик, загрузку аннотаций и (по умолчанию) модель в модулях этапов."""
+    import proj_3
+    import translation
+
+    FakeTranslator.latency = translator_latency
+    translation.GoogleTranslator = FakeTranslator
+    proj_3.scraper_class = stub_scraper_class(patents_base_url)
+    if fake_model:
+        import encoder
+        encoder.load_model = lambda *args, **kwargs: FakeEncoder()
@@ -0,0 +1,52 @@
+"""
+Бенчмарк загрузки страниц chembk на локальной заглушке.
+Запуск: python -m bench.fetch --count 500 --latency 0.05
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from bench.stubs import StubServer
+from proj_1 import get_chemical_info, parse_chemical_page
+
+
+def legacy_fetch(base_url, cas_numbers, max_workers):
+    """Прежний способ: отдельный requests.get на каждый CAS-номер в пуле потоков."""
+    def fetch(cas):
+        response = requests.get(f"{base_url}{cas}", headers={"User-Agent": "Mozilla/5.0"}, timeout=10)
+        return (cas, *parse_chemical_page(response.text))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(fetch, cas_numbers))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=10)
+    parser.add_argument("--rate", type=float, default=0, help="Лимит запросов в секунду (0 — без лимита)")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    cas_numbers = [f"{i}-00-0" for i in range(1000, 1000 + args.count)]
+    with StubServer(latency=args.latency, error_rate=args.error_rate) as server:
+        base_url = f"{server.base_url}/en/chem/"
+
+        start = time.perf_counter()
+        legacy_fetch(base_url, cas_numbers, args.workers)
+        legacy = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = get_chemical_info(cas_numbers, base_url, args.workers, args.rate)
+        current = time.perf_counter() - start
+
+    ok = sum(1 for _, name, _ in results if name)
+    print(f"requests + потоки: {args.count / legacy:.1f} стр/с ({legacy:.2f} с)")
+    print(f"aiohttp, пул соединений: {args.count / current:.1f} стр/с ({current:.2f} с), успешно {ok}/{args.count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Бенчмарк разбора страниц chembk: BeautifulSoup (html.parser) против lxml.
+Страницы берутся из архива (--archive data/html_archive) или генерируются по образцу заглушки.
+Запуск: python -m bench.parse --pages 2000
+"""
+import argparse
+import random
+import time
+
+from bench.stubs import CHEMBK_PAGE
+from html_archive import HtmlArchive
+from proj_1 import PAGE_PARSERS
+
+FILLER_ROW = '<tr><td>Property {i}</td><td><span class="value">{value}</span> &deg;C <a href="/x/{i}">ref</a></td></tr>'
+
+
+def synthetic_pages(count, filler_rows, seed=0):
+    """Страницы в формате chembk: синонимы с разметкой и сущностями, плюс строки свойств для объёма."""
+    rng = random.Random(seed)
+    pages = []
+    for i in range(count):
+        cas = f"{1000 + i}-{rng.randint(10, 99)}-{rng.randint(0, 9)}"
+        synonyms = "<br>".join(
+            f"Synonym {k} of {cas}" if k % 3 else f"<b>{cas}</b> &amp; salt {k}"
+            for k in range(1, rng.randint(3, 30))
+        )
+        page = CHEMBK_PAGE.format(cas=cas, synonyms=synonyms)
+        filler = "\n".join(FILLER_ROW.format(i=k, value=rng.random()) for k in range(filler_rows))
+        pages.append(page.replace("</table>", filler + "\n</table>"))
+    return pages
+
+
+def measure(parse, pages):
+    start = time.perf_counter()
+    results = [parse(page) for page in pages]
+    return results, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--filler-rows", type=int, default=100, help="Строк свойств на синтетической странице")
+    parser.add_argument("--archive", help="Каталог HtmlArchive с настоящими страницами")
+    args = parser.parse_args()
+
+    if args.archive:
+        archive = HtmlArchive(args.archive)
+        pages = list(archive.get_many(archive.keys()[:args.pages]).values())
+        archive.close()
+    else:
+        pages = synthetic_pages(args.pages, args.filler_rows)
+    megabytes = sum(len(page.encode("utf-8")) for page in pages) / 2 ** 20
+    print(f"Страниц: {len(pages)}, {megabytes:.1f} МБ")
+
+    reference, legacy = measure(PAGE_PARSERS["bs4"], pages)
+    results, current = measure(PAGE_PARSERS["lxml"], pages)
+    mismatches = [i for i, (a, b) in enumerate(zip(reference, results)) if a != b]
+
+    print(f"BeautifulSoup, html.parser: {len(pages) / legacy:.0f} стр/с ({megabytes / legacy:.1f} МБ/с)")
+    print(f"lxml:                       {len(pages) / current:.0f} стр/с ({megabytes / current:.1f} МБ/с), "
+          f"ускорение {legacy / current:.1f}x")
+    print(f"Расхождений: {len(mismatches)}")
+    if mismatches:
+        i = mismatches[0]
+        print(f"  например, страница {i}: {reference[i]!r} != {results[i]!r}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Офлайн-бенчмарк этапов обработки: chembk и Google Patents заменены локальной заглушкой,
+переводчик и модель — подделками (bench/fakes.py), вход — синтетический (bench/synthetic.py).
+Каждый run_steps запускается в отдельном процессе, чтобы пиковая память считалась по этапу.
+
+Запуск: python -m bench.pipeline --sizes 100,1000,10000 --latency 0.02 --output bench_report.json
+Каталог прогона очищается перед каждым размером; с --warm кэши прошлых прогонов сохраняются.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (этап, входная таблица, выходная таблица)
+STAGES = [
+    ("csv_split", None, "CAS"),
+    ("proj_1", "CAS", "Synonyms"),
+    ("proj_2", "Synonyms", "Patents"),
+    ("proj_3", "Patents", "Angl_Abstract"),
+    ("proj_4", "Angl_Abstract", "Scores"),
+    ("proj_5", "Scores", "Best_score"),
+    ("filter_by_accuracy", "Best_score", "Filtered_score"),
+]
+INPUT_FILE = "data/Input.csv"
+
+
+def table_rows(name):
+    from datastore import read_table
+    if name is None:
+        import pandas as pd
+        return len(pd.read_csv(INPUT_FILE, sep=";", on_bad_lines="skip"))
+    return len(read_table(name, columns=[]))
+
+
+def run_child(stage, translator_latency, real_model):
+    """Запускает один этап в текущем процессе (рабочий каталог — каталог прогона) и печатает JSON."""
+    import importlib
+    from bench import fakes
+
+    with open("config.json", "r", encoding="utf-8") as file:
+        config = json.load(file)
+    fakes.install(config["patents_base_url"], translator_latency, fake_model=not real_model)
+
+    _, input_table, output_table = next(s for s in STAGES if s[0] == stage)
+    rows_in = table_rows(input_table)
+    module = importlib.import_module(stage)
+    sys.argv = [f"{stage}.py"] + ([INPUT_FILE] if stage == "csv_split" else []) + (["0"] if stage == "filter_by_accuracy" else [])
+    started = time.perf_counter()
+    module.run_steps()
+    seconds = time.perf_counter() - started
+    result = {
+        "stage": stage,
+        "seconds": round(seconds, 3),
+        "rows_in": rows_in,
+        "rows_out": table_rows(output_table),
+        "rows_per_sec": round(rows_in / seconds, 2) if seconds else None,
+        # ru_maxrss в Linux — в килобайтах
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    print(json.dumps(result))
+
+
+def prepare_workdir(path, rows, base_url, rate_limit, warm=False):
+    from bench.synthetic import generate
+
+    # Кэш, архив страниц, эмбеддинги и контрольные точки прошлого прогона сделали бы замер «тёплым»
+    if not warm and os.path.exists(path):
+        shutil.rmtree(path)
+    os.makedirs(os.path.join(path, "data"), exist_ok=True)
+    with open(os.path.join(ROOT, "config.json"), "r", encoding="utf-8") as file:
+        config = json.load(file)
+    config.update(
+        chembk_base_url=f"{base_url}/en/chem/",
+        patent_search_backend="xhr",
+        patents_base_url=base_url,
+        rate_limit_per_host=rate_limit,
+        rate_limit_burst=rate_limit,
+        cache_path="data/cache.sqlite",
+    )
+    with open(os.path.join(path, "config.json"), "w", encoding="utf-8") as file:
+        json.dump(config, file, ensure_ascii=False, indent=4)
+    generate(rows, os.path.join(ROOT, "data/Test.csv")).to_csv(os.path.join(path, INPUT_FILE), sep=";", index=False)
+
+
+def run_size(rows, workdir, server, args):
+    """Прогоняет все этапы на `rows` строках; каждый этап — отдельный процесс."""
+    path = os.path.join(workdir, f"rows_{rows}")
+    prepare_workdir(path, rows, server.base_url, args.rate_limit, args.warm)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([ROOT, os.environ.get("PYTHONPATH", "")]))
+    results = []
+    for stage, _, _ in STAGES:
+        requests_before = server.requests
+        cmd = [sys.executable, "-m", "bench.pipeline", "--child", stage, "--translator-latency", str(args.translator_latency)]
+        if args.real_model:
+            cmd.append("--real-model")
+        proc = subprocess.run(
+            cmd, cwd=path, env=env, text=True, stdout=subprocess.PIPE,
+            stderr=None if args.verbose else subprocess.DEVNULL,
+        )
+        if args.verbose:
+            print(proc.stdout)
+        lines = proc.stdout.strip().splitlines()
+        try:
+            result = json.loads(lines[-1])
+        except (IndexError, ValueError):
+            result = {"stage": stage, "error": f"код завершения {proc.returncode}"}
+        result.update(rows=rows, returncode=proc.returncode, http_requests=server.requests - requests_before)
+        results.append(result)
+        print(
+            f"{rows:>6} {stage:20} {result.get('seconds', '-'):>9} с {result.get('rows_per_sec', '-'):>10} строк/с "
+            f"{result.get('peak_rss_mb', '-'):>8} МБ  HTTP: {result['http_requests']}"
+        )
+        if proc.returncode != 0:
+            break
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="100,1000,10000", help="размеры входа через запятую")
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка заглушки, с")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов 503")
+    parser.add_argument("--max-concurrency", type=int, help="одновременных запросов к заглушке, сверх — 429")
+    parser.add_argument("--translator-latency", type=float, default=0.0, help="задержка переводчика на запрос, с")
+    parser.add_argument("--rate-limit", type=float, default=1000.0, help="лимит запросов в секунду к заглушке")
+    parser.add_argument("--real-model", action="store_true", help="использовать настоящую модель эмбеддингов")
+    parser.add_argument("--workdir", default="bench_runs", help="каталог для прогонов")
+    parser.add_argument("--warm", action="store_true", help="не очищать каталог прогона: кэши прошлых прогонов остаются")
+    parser.add_argument("--output", default="bench_report.json")
+    parser.add_argument("--verbose", action="store_true")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.translator_latency, args.real_model)
+        return
+
+    from bench.stubs import StubServer
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "latency": args.latency,
+        "error_rate": args.error_rate,
+        "max_concurrency": args.max_concurrency,
+        "translator_latency": args.translator_latency,
+        "rate_limit": args.rate_limit,
+        "model": "real" if args.real_model else "fake",
+        "caches": "warm" if args.warm else "cold",
+        "runs": [],
+    }
+    with StubServer(latency=args.latency, error_rate=args.error_rate, max_concurrency=args.max_concurrency) as server:
+        for rows in sizes:
+            report["runs"].extend(run_size(rows, args.workdir, server, args))
+
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+    print(f"✔ Отчёт сохранён в {args.output}")
+
+
+if __name__ == "__main__":
+    main()
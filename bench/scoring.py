@@ -0,0 +1,84 @@
+"""
+Бенчмарк расчёта скоров proj_4 на синтетических данных.
+Запуск: python -m bench.scoring --rows 10000
+"""
+import argparse
+import time
+
+import numpy as np
+import torch
+from sentence_transformers import util
+
+from scoring import SimilarityScorer, PHRASES_PER_QUERY
+
+
+def make_dataset(rows, patents_per_row, queries_per_row, dim, seed=0):
+    """Синтетический набор: строки с патентами и запросами, эмбеддинги случайные."""
+    rng = np.random.default_rng(seed)
+    n_abstracts = rows * patents_per_row // 2
+    n_queries = rows * queries_per_row // 2
+    matrix = rng.standard_normal((n_abstracts + n_queries * PHRASES_PER_QUERY, dim)).astype(np.float32)
+    abstracts = [f"abstract {i}" for i in range(n_abstracts)]
+    queries = [f"query {i}" for i in range(n_queries)]
+    abstract_rows = {a: i for i, a in enumerate(abstracts)}
+    phrase_rows = {
+        q: n_abstracts + np.arange(j * PHRASES_PER_QUERY, (j + 1) * PHRASES_PER_QUERY)
+        for j, q in enumerate(queries)
+    }
+    dataset = []
+    for _ in range(rows):
+        patents = {f"US{rng.integers(10 ** 7)}B2": abstracts[k] for k in rng.integers(n_abstracts, size=patents_per_row)}
+        row_queries = [queries[k] for k in rng.integers(n_queries, size=queries_per_row)]
+        dataset.append((patents, row_queries))
+    return matrix, abstract_rows, phrase_rows, dataset
+
+
+def legacy_scores(matrix, abstract_rows, phrase_rows, dataset):
+    """Прежний цикл: отдельный pytorch_cos_sim на каждую тройку (строка, патент, запрос)."""
+    abstract_embeddings = {a: torch.from_numpy(matrix[row]) for a, row in abstract_rows.items()}
+    query_embeddings = {q: torch.from_numpy(matrix[rows]) for q, rows in phrase_rows.items()}
+    all_scores = []
+    for patents, queries in dataset:
+        res_dict = {}
+        for patent_id, abstract in patents.items():
+            res_dict[patent_id] = {
+                q: util.pytorch_cos_sim(abstract_embeddings[abstract], query_embeddings[q]).squeeze().tolist()
+                for q in queries
+            }
+        all_scores.append(res_dict)
+    return all_scores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--legacy-rows", type=int, default=1000, help="Сколько строк считать старым способом (с экстраполяцией)")
+    parser.add_argument("--patents", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=6)
+    parser.add_argument("--dim", type=int, default=768)
+    args = parser.parse_args()
+
+    matrix, abstract_rows, phrase_rows, dataset = make_dataset(args.rows, args.patents, args.queries, args.dim)
+    scorer = SimilarityScorer(matrix, abstract_rows, phrase_rows)
+
+    start = time.perf_counter()
+    scores = [scorer.score_row(patents, queries) for patents, queries in dataset]
+    batched = time.perf_counter() - start
+
+    legacy_rows = min(args.legacy_rows, args.rows)
+    start = time.perf_counter()
+    reference = legacy_scores(matrix, abstract_rows, phrase_rows, dataset[:legacy_rows])
+    legacy = (time.perf_counter() - start) * args.rows / legacy_rows
+
+    drift = max(
+        abs(a - b)
+        for new, old in zip(scores, reference)
+        for p in old for q in old[p] for a, b in zip(new[p][q], old[p][q])
+    )
+    print(f"Строк: {args.rows}, патентов на строку: {args.patents}, запросов на строку: {args.queries}")
+    print(f"Цикл pytorch_cos_sim: {legacy:.2f} с (экстраполяция по {legacy_rows} строкам)")
+    print(f"SimilarityScorer:     {batched:.2f} с, ускорение {legacy / batched:.1f}x, макс. расхождение {drift:.2e}")
+
+
+if __name__ == "__main__":
+    main()
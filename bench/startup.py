@@ -0,0 +1,104 @@
+"""
+Время запуска этапов: импорт модуля каждого этапа в отдельном интерпретаторе
+с python -X importtime. Для каждого этапа печатается время импорта, полное время
+запуска процесса и самые тяжёлые прямые импорты; если импорт дольше бюджета,
+скрипт завершается с кодом 1 (проверка для CI).
+Этапы, для которых не установлена зависимость (например, PyQt5 для gui), пропускаются.
+Запуск: python -m bench.startup [--repeat 3] [--budget-ms 800] [--steps proj_1,proj_2]
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+
+from pipeline import STEPS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Бюджет времени импорта модуля этапа, мс (без запуска интерпретатора)
+STARTUP_BUDGET_MS = {
+    "csv_split": 700,
+    "proj_1": 700,
+    "proj_2": 700,
+    "proj_3": 700,
+    "proj_4": 700,
+    "proj_5": 700,
+    "filter_by_accuracy": 700,
+    "info": 700,
+    "embed_daemon": 300,
+    "gui": 1500,
+}
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def parse_importtime(stderr, module):
+    """Возвращает (время импорта модуля в мс, [(прямой импорт, мс)]) по выводу -X importtime."""
+    children = []
+    for line in stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        cumulative, depth, name = int(match.group(2)), (len(match.group(3)) - 1) // 2, match.group(4)
+        if depth == 0 and name == module:
+            return cumulative / 1000, sorted(children, key=lambda c: -c[1])
+        if depth == 0:
+            children = []
+        elif depth == 1:
+            children.append((name, cumulative / 1000))
+    return None, []
+
+
+def measure(module, repeat):
+    """Лучшее из repeat измерений: (импорт, мс; процесс, мс; прямые импорты; ошибка)."""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=ROOT, capture_output=True, text=True,
+        )
+        wall = (time.perf_counter() - started) * 1000
+        if proc.returncode != 0:
+            return None, wall, [], proc.stderr.strip().splitlines()[-1]
+        imported, children = parse_importtime(proc.stderr, module)
+        if best is None or imported < best[0]:
+            best = (imported, wall, children, None)
+    return best
+
+
+def main():
+    modules = [name for name, *_ in STEPS] + ["embed_daemon", "gui"]
+    parser = argparse.ArgumentParser(description="Время импорта модулей этапов")
+    parser.add_argument("--steps", default=",".join(modules))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--budget-ms", type=float, help="единый бюджет вместо STARTUP_BUDGET_MS")
+    parser.add_argument("--top", type=int, default=3, help="сколько тяжёлых импортов показать")
+    args = parser.parse_args()
+
+    over = []
+    for module in [name.strip() for name in args.steps.split(",") if name.strip()]:
+        budget = args.budget_ms or STARTUP_BUDGET_MS.get(module, 1000)
+        imported, wall, children, error = measure(module, args.repeat)
+        if error is not None:
+            if error.startswith("ModuleNotFoundError"):
+                print(f"{module:20} пропущен: {error}")
+                continue
+            over.append(module)
+            print(f"{module:20} ❗ ошибка импорта: {error}")
+            continue
+        heavy = ", ".join(f"{name} {ms:.0f}" for name, ms in children[:args.top])
+        mark = "✔" if imported <= budget else "❗"
+        if imported > budget:
+            over.append(module)
+        print(f"{module:20} {mark} импорт {imported:6.0f} мс (бюджет {budget:.0f}), процесс {wall:6.0f} мс; {heavy}")
+
+    if over:
+        print(f"Превышен бюджет: {', '.join(over)}")
+        return 1
+    print("✔ Все этапы в пределах бюджета")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
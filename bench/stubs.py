@@ -0,0 +1,246 @@
+"""
+Локальные заглушки внешних сайтов для офлайн-бенчмарков.
+Запуск: python -m bench.stubs --port 8765
+"""
+import argparse
+import copy
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+QUERY_REGEX = re.compile(r"^\((.*?)\) AND \((.*)\)$")
+
+CHEMBK_PAGE = """<!DOCTYPE html>
+<html><head><title>{cas}</title></head><body>
+<div class="container">
+<table class="table">
+<tr><td>Name</td><td>Compound {cas}</td></tr>
+<tr><td>Synonyms</td><td>{synonyms}</td></tr>
+<tr><td>CAS</td><td>{cas}</td></tr>
+<tr><td>Molecular Formula</td><td>C6H12O6</td></tr>
+</table>
+</div></body></html>"""
+
+
+def chembk_page(cas):
+    synonyms = "<br>".join(f"Synonym {i} of {cas}" for i in range(1, 7))
+    return CHEMBK_PAGE.format(cas=cas, synonyms=synonyms)
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as file:
+        return json.load(file)
+
+
+PATENTS_FIXTURE = load_fixture("patents_xhr_query.json")
+with open(os.path.join(FIXTURES, "patent_page.html"), encoding="utf-8") as _file:
+    PATENT_PAGE = _file.read()
+
+ABSTRACTS_EN = [
+    "A continuous process for the synthesis of {topic} in a microfluidic reactor with improved heat transfer.",
+    "The invention relates to a flow chemistry method for preparing {topic} with high selectivity and yield.",
+    "A method for producing {topic} comprising mixing the reagents in a microchannel and isolating the product.",
+]
+ABSTRACTS_CN = [
+    "本发明涉及一种在微通道反应器中连续制备{topic}的方法，具有传热效率高、收率高的优点。",
+    "本发明公开了一种{topic}的流动化学合成工艺，反应时间短，产品纯度高。",
+]
+
+
+def query_synonyms(terms):
+    """Термин и синонимы поискового запроса вида (term) AND ((syn1) OR (syn2) ...)."""
+    match = QUERY_REGEX.match(terms)
+    if not match:
+        return terms, [terms]
+    term, rest = match.groups()
+    if rest.startswith("(") and rest.endswith(")") and ") OR (" in rest:
+        return term, rest[1:-1].split(") OR (")
+    return term, [rest]
+
+
+def synonym_results(term, synonym):
+    """
+    Результаты отдельного запроса (term) AND (synonym): [(номер, синоним в заголовке или None)].
+    Число результатов — от 0 до 12, так что пакет синонимов иногда переполняется.
+    У каждого десятого синонима заголовки результатов его не упоминают.
+    """
+    seed = int(hashlib.md5(f"{term}|{synonym}".encode("utf-8")).hexdigest()[:8], 16)
+    countries = [item["patent"]["publication_number"][:2] for item in PATENTS_FIXTURE["results"]["cluster"][0]["result"]]
+    titled = synonym if seed % 10 else None
+    return [
+        (f"{countries[i % len(countries)]}{(seed + i * 7919) % 10 ** 8:08d}A1", titled)
+        for i in range(seed % 13)
+    ]
+
+
+def patents_response(query):
+    """
+    Ответ /xhr/query по образцу из fixtures. Результаты каждого синонима детерминированы
+    (synonym_results); запрос с OR возвращает их объединение вперемешку, не больше num.
+    В заголовок результата подставляется только синоним, которому он принадлежит,
+    поэтому распределение патентов по синонимам в QueryPlanner может и не удаться.
+    """
+    params = parse_qs(query)
+    term, synonyms = query_synonyms(params.get("q", [""])[0])
+    num = int(params.get("num", ["10"])[0])
+    merged = {}
+    per_synonym = [synonym_results(term, synonym) for synonym in synonyms]
+    for rank in range(max(map(len, per_synonym), default=0)):
+        for results in per_synonym:
+            if rank < len(results):
+                merged.setdefault(*results[rank])
+
+    payload = copy.deepcopy(PATENTS_FIXTURE)
+    templates = payload["results"]["cluster"][0]["result"]
+    items = []
+    for i, (number, synonym) in enumerate(list(merged.items())[:num]):
+        item = copy.deepcopy(templates[i % len(templates)])
+        item["id"] = f"patent/{number}/en"
+        item["rank"] = i
+        item["patent"]["publication_number"] = number
+        if synonym:
+            item["patent"]["title"] = f"{item['patent']['title']} {synonym}"
+        items.append(item)
+    payload["results"]["cluster"][0]["result"] = items
+    payload["results"]["total_num_results"] = len(items)
+    return payload
+
+
+def patent_page(number):
+    """
+    Страница патента по образцу из fixtures (её читает google_patent_scraper):
+    аннотация детерминированно зависит от номера, у CN-патентов — на китайском.
+    """
+    seed = int(hashlib.md5(number.encode("utf-8")).hexdigest()[:8], 16)
+    topic = f"compound {seed % 997}"
+    templates = ABSTRACTS_CN if number.startswith("CN") else ABSTRACTS_EN
+    abstract = templates[seed % len(templates)].format(topic=topic)
+    return PATENT_PAGE.format(number=number, title=f"Preparation of {topic}", abstract=abstract)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 нужен, чтобы клиенты могли переиспользовать соединения
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type="text/html; charset=utf-8"):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        server = self.server
+        server.count()
+        # Как у настоящих сайтов: при слишком большом числе одновременных запросов — 429
+        if not server.enter():
+            self._send(429, "Too Many Requests")
+            return
+        try:
+            self._respond()
+        finally:
+            server.leave()
+
+    def _respond(self):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        if server.error_rate and random.random() < server.error_rate:
+            self._send(503, "Service Unavailable")
+            return
+        if self.path.startswith("/xhr/query"):
+            params = parse_qs(urlsplit(self.path).query)
+            body = json.dumps(patents_response(params.get("url", [""])[0]))
+            self._send(200, body, "application/json")
+            return
+        if self.path.startswith("/patent/"):
+            # /patent/<номер>/en
+            self._send(200, patent_page(self.path.split("/")[2]))
+            return
+        if self.path.startswith("/en/chem/"):
+            cas = self.path.rsplit("/", 1)[-1]
+            if cas.startswith("0-"):
+                self._send(404, "Not Found")
+            else:
+                self._send(200, chembk_page(cas))
+            return
+        self._send(404, "Not Found")
+
+
+class StubServer(ThreadingHTTPServer):
+    """
+    HTTP-заглушка с настраиваемой задержкой ответа, долей ошибок 503
+    и пределом одновременных запросов, сверх которого отвечает 429.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.0, error_rate=0.0, max_concurrency=None):
+        super().__init__(("127.0.0.1", port), StubHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.max_concurrency = max_concurrency
+        self.active = 0
+        self.throttled = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def count(self):
+        with self._lock:
+            self.requests += 1
+
+    def enter(self):
+        with self._lock:
+            if self.max_concurrency and self.active >= self.max_concurrency:
+                self.throttled += 1
+                return False
+            self.active += 1
+            return True
+
+    def leave(self):
+        with self._lock:
+            self.active -= 1
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Локальные заглушки chembk и Google Patents")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--max-concurrency", type=int, help="больше одновременных запросов — ответ 429")
+    args = parser.parse_args()
+    server = StubServer(args.port, args.latency, args.error_rate, args.max_concurrency)
+    print(f"Заглушка запущена: {server.base_url}")
+    server.serve_forever()
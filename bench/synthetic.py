@@ -0,0 +1,73 @@
+"""
+Генератор синтетического входного файла нужного размера на основе data/Test.csv.
+Запуск: python -m bench.synthetic --rows 10000 --output data/Synthetic.csv
+"""
+import argparse
+import csv
+import random
+import re
+
+import pandas as pd
+
+TEMPLATE = "data/Test.csv"
+CAS_FORMATS = ["{name}, CAS {cas}", "{name} (CAS {cas})", "{name} CAS: {cas}"]
+
+
+def cas_number(body):
+    """CAS-номер с правильной контрольной цифрой для числа `body` (не меньше 100)."""
+    digits = str(body)
+    check = sum(int(d) * (i + 1) for i, d in enumerate(reversed(digits))) % 10
+    return f"{digits[:-2]}-{digits[-2:]}-{check}"
+
+
+def template_names(template=TEMPLATE):
+    """Названия продукции из образца: первая строка ячейки без CAS-номера."""
+    df = pd.read_csv(template, sep=";", quoting=csv.QUOTE_MINIMAL, on_bad_lines="skip")
+    names = []
+    for value in df["Наименование продукции"].dropna():
+        name = re.split(r"[,\s(]*CAS", str(value).splitlines()[0], flags=re.IGNORECASE)[0].strip("() ,")
+        if name:
+            names.append(name)
+    return df, names
+
+
+def generate(rows, template=TEMPLATE, seed=0, no_cas_share=0.1, duplicate_share=0.1):
+    """
+    Возвращает DataFrame в формате образца из `rows` строк: названия из образца с номером,
+    CAS-номер в одном из встречающихся форматов; часть строк без CAS и с повторами CAS.
+    """
+    rng = random.Random(seed)
+    df, names = template_names(template)
+    other_columns = [c for c in df.columns if c not in ("№", "Наименование продукции")]
+    records = []
+    used = []
+    for i in range(rows):
+        name = f"{rng.choice(names)} {i}"
+        roll = rng.random()
+        if roll < no_cas_share:
+            product = name
+        else:
+            if used and roll < no_cas_share + duplicate_share:
+                cas = rng.choice(used)
+            else:
+                cas = cas_number(rng.randrange(10 ** 4, 10 ** 9))
+                used.append(cas)
+            product = rng.choice(CAS_FORMATS).format(name=name, cas=cas)
+        source = df.iloc[i % len(df)]
+        records.append({"№": i + 1, "Наименование продукции": product, **{c: source[c] for c in other_columns}})
+    return pd.DataFrame(records, columns=list(df.columns))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--template", default=TEMPLATE)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="data/Synthetic.csv")
+    args = parser.parse_args()
+    generate(args.rows, args.template, args.seed).to_csv(args.output, sep=";", index=False)
+    print(f"✔ {args.rows} строк сохранено в {args.output}")
+
+
+if __name__ == "__main__":
+    main()
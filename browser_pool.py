@@ -0,0 +1,109 @@
+import asyncio
+import re
+import time
+
+from playwright.async_api import async_playwright, Error as PlaywrightError, TimeoutError as PlaywrightTimeoutError
+
+from failures import FetchError
+
+RESULT_SELECTOR = "h4.metadata.style-scope.search-result-item"
+PATENT_REGEX = re.compile(r'\b[A-Z]{2}[0-9]{6,}[A-Z0-9]*\b')
+BLOCKED_RESOURCES = {"image", "font", "media"}
+
+
+class BrowserPool:
+    """
+    Пул долгоживущих headless-браузеров Chromium (async Playwright).
+    Страницы переиспользуются между ссылками; одновременно открыто не больше
+    `browsers * pages_per_browser` страниц. Упавшая страница пересоздаётся,
+    отключившийся браузер перезапускается.
+    """
+
+    # В h4.metadata только номер и метаданные, без заголовка — QueryPlanner с ним не работает
+    titled_results = False
+
+    def __init__(self, browsers=1, pages_per_browser=4, goto_timeout=60000, wait_timeout=10000, metrics=None):
+        self.browsers = max(1, browsers)
+        self.metrics = metrics
+        self.pages_per_browser = max(1, pages_per_browser)
+        self.goto_timeout = goto_timeout
+        self.wait_timeout = wait_timeout
+        self._playwright = None
+        self._contexts = []
+        self._pages = None
+
+    async def __aenter__(self):
+        self._playwright = await async_playwright().start()
+        self._pages = asyncio.Queue()
+        for slot in range(self.browsers):
+            context = await self._launch()
+            self._contexts.append(context)
+            for _ in range(self.pages_per_browser):
+                self._pages.put_nowait((slot, await context.new_page()))
+        return self
+
+    async def __aexit__(self, *exc):
+        for context in self._contexts:
+            try:
+                await context.browser.close()
+            except PlaywrightError:
+                pass
+        await self._playwright.stop()
+
+    async def _launch(self):
+        browser = await self._playwright.chromium.launch(headless=True)
+        context = await browser.new_context()
+        await context.route("**/*", self._block_heavy_resources)
+        return context
+
+    @staticmethod
+    async def _block_heavy_resources(route):
+        if route.request.resource_type in BLOCKED_RESOURCES:
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def _recycle(self, slot, page):
+        """Заменяет сломанную страницу новой; при необходимости перезапускает браузер."""
+        try:
+            await page.close()
+        except PlaywrightError:
+            pass
+        context = self._contexts[slot]
+        if not context.browser.is_connected():
+            context = self._contexts[slot] = await self._launch()
+        return await context.new_page()
+
+    async def search_results(self, url):
+        """Возвращает список (номер патента, текст заголовка) со страницы результатов Google Patents."""
+        slot, page = await self._pages.get()
+        started = time.perf_counter()
+        ok = True
+        try:
+            # Таймаут загрузки страницы — ошибка получения (ниже, как и прочие PlaywrightError)
+            await page.goto(url, timeout=self.goto_timeout)
+            try:
+                await page.wait_for_selector(RESULT_SELECTOR, timeout=self.wait_timeout)
+            except PlaywrightTimeoutError:
+                # Страница загрузилась, но результатов нет: по запросу ничего не найдено
+                return []
+            blocks = await page.locator(RESULT_SELECTOR).all_text_contents()
+            result = []
+            for block in blocks:
+                found = PATENT_REGEX.findall(block)
+                if found:
+                    result.append((found[0], block))
+            return result
+        except PlaywrightError as e:
+            # print(f"[!] Ошибка при скрапинге {url!r}: {e}")
+            ok = False
+            page = await self._recycle(slot, page)
+            raise FetchError(f"{type(e).__name__}: {e}") from e
+        finally:
+            if self.metrics is not None:
+                self.metrics.call("patent_search", time.perf_counter() - started, ok)
+            self._pages.put_nowait((slot, page))
+
+    async def search(self, url):
+        """Возвращает номера патентов из результатов поиска по ссылке."""
+        return [number for number, _ in await self.search_results(url)]
@@ -0,0 +1,114 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import namedtuple
+
+DEFAULT_CACHE_PATH = "data/cache.sqlite"
+
+CacheEntry = namedtuple("CacheEntry", ["value", "negative", "updated"])
+
+
+def is_stale(entry, ttl_days, negative_ttl_days=None):
+    """Проверяет, устарела ли запись кэша (для отрицательных записей — свой TTL)."""
+    ttl = negative_ttl_days if entry.negative and negative_ttl_days is not None else ttl_days
+    if ttl is None:
+        return False
+    return time.time() - entry.updated > ttl * 86400
+
+
+class CacheStore:
+    """
+    Постоянное хранилище «ключ → JSON-значение» поверх SQLite.
+    Каждая запись хранит время обновления и признак отрицательного результата
+    (например, CAS-номер, для которого на сайте ничего не нашлось).
+    """
+
+    # Ограничение SQLite на число параметров в одном запросе
+    _CHUNK = 500
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, table="cache", compress=False):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.table = table
+        self.compress = compress
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value BLOB, negative INTEGER NOT NULL DEFAULT 0, updated REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _dump(self, value):
+        data = json.dumps(value, ensure_ascii=False).encode("utf-8")
+        return zlib.compress(data) if self.compress else data
+
+    def _load(self, blob):
+        if blob is None:
+            return None
+        data = zlib.decompress(blob) if self.compress else blob
+        return json.loads(data)
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys):
+        """Возвращает словарь {ключ: CacheEntry} только для найденных ключей."""
+        keys = list(dict.fromkeys(str(k) for k in keys))
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), self._CHUNK):
+                chunk = keys[i:i + self._CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, value, negative, updated FROM {self.table} WHERE key IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+                for key, blob, negative, updated in rows:
+                    found[key] = CacheEntry(self._load(blob), bool(negative), updated)
+        return found
+
+    def put(self, key, value, negative=False):
+        self.put_many([(key, value, negative)])
+
+    def put_many(self, items):
+        """Сохраняет записи вида (ключ, значение, negative) одной транзакцией."""
+        now = time.time()
+        rows = [(str(key), self._dump(value), int(bool(negative)), now) for key, value, negative in items]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, negative, updated) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+    def delete_many(self, keys):
+        keys = [str(k) for k in keys]
+        with self._lock:
+            self._conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", [(k,) for k in keys])
+            self._conn.commit()
+
+    def keys(self):
+        with self._lock:
+            return [row[0] for row in self._conn.execute(f"SELECT key FROM {self.table}")]
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
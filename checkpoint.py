@@ -0,0 +1,98 @@
+import hashlib
+import json
+
+from cache_store import CacheStore, DEFAULT_CACHE_PATH
+
+DEFAULT_CHUNK_ROWS = 100
+
+
+def row_key(stage, settings, values):
+    """Хэш входных данных строки вместе с настройками этапа, от которых зависит результат."""
+    payload = json.dumps([stage, settings, list(values)], ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class StageCheckpoint:
+    """
+    Построчные контрольные точки этапа. Результат строки сохраняется по хэшу её входных
+    столбцов и настроек, поэтому при повторном запуске обрабатываются только новые и
+    изменённые строки. Строки текущего запуска пишутся в отдельную таблицу и переносятся
+    в основную после успешного завершения; с resume=True используются и строки
+    прерванного запуска, без него они отбрасываются.
+    """
+
+    def __init__(self, stage, settings=None, path=DEFAULT_CACHE_PATH, resume=False):
+        self.stage = stage
+        self.settings = settings or {}
+        self.done = CacheStore(path, table=f"checkpoint_{stage}", compress=True)
+        self.pending = CacheStore(path, table=f"checkpoint_{stage}_pending", compress=True)
+        self.resume = resume
+        # Строк за время работы этапа: всего и взятых из контрольных точек
+        self.stats = {"rows": 0, "reused": 0}
+        interrupted = self.pending.keys()
+        if interrupted and not resume:
+            print(f"Контрольные точки {stage}: {len(interrupted)} строк прерванного запуска отброшены (продолжить: --resume)")
+            self.pending.delete_many(interrupted)
+
+    def load(self, keys):
+        """Возвращает {ключ: результат строки} для уже обработанных строк."""
+        found = {key: entry.value for key, entry in self.done.get_many(keys).items()}
+        if self.resume:
+            found.update((key, entry.value) for key, entry in self.pending.get_many(keys).items())
+        return found
+
+    def save(self, outputs):
+        self.pending.put_many((key, value, False) for key, value in outputs.items())
+
+    def commit(self):
+        """Переносит строки текущего запуска в основную таблицу."""
+        keys = self.pending.keys()
+        entries = self.pending.get_many(keys)
+        self.done.put_many((key, entry.value, False) for key, entry in entries.items())
+        self.pending.delete_many(keys)
+
+    def run(self, df, input_columns, output_columns, process, chunk_rows=DEFAULT_CHUNK_ROWS, is_complete=None):
+        """
+        Обрабатывает строки df без контрольной точки пакетами по chunk_rows строк:
+        process(часть df) должна вернуть её же с заполненными output_columns.
+        Результат каждого пакета сохраняется сразу, кроме строк, для которых
+        is_complete({столбец: значение}) ложно (например, с ошибками загрузки) —
+        они попадают в результат, но при следующем запуске обрабатываются снова.
+        is_complete получает все столбцы обработанной строки, а не только output_columns.
+        Возвращает df со всеми output_columns.
+        """
+        keys = [row_key(self.stage, self.settings, row) for row in df[input_columns].itertuples(index=False)]
+        results = self.load(keys)
+        todo = [i for i, key in enumerate(keys) if key not in results]
+        print(f"Контрольные точки {self.stage}: готово {len(keys) - len(todo)} из {len(keys)}, обрабатываем {len(todo)}")
+        self.stats["rows"] += len(keys)
+        self.stats["reused"] += len(keys) - len(todo)
+
+        for start in range(0, len(todo), chunk_rows):
+            rows = todo[start:start + chunk_rows]
+            processed = process(df.iloc[rows].copy())
+            outputs = {
+                keys[i]: {column: processed[column].iloc[j] for column in output_columns}
+                for j, i in enumerate(rows)
+            }
+            results.update(outputs)
+            if is_complete is not None:
+                outputs = {
+                    keys[i]: outputs[keys[i]] for j, i in enumerate(rows) if is_complete(processed.iloc[j].to_dict())
+                }
+            self.save(outputs)
+        self.commit()
+
+        df = df.copy()
+        for column in output_columns:
+            df[column] = [results[key][column] for key in keys]
+        return df
+
+    def report(self):
+        rows, reused = self.stats["rows"], self.stats["reused"]
+        share = reused / rows if rows else 0.0
+        return f"Контрольные точки: строк {rows}, готовых из прошлых запусков {reused} ({share:.1%}), обработано {rows - reused}"
+
+    def close(self):
+        self.done.close()
+        self.pending.close()
@@ -0,0 +1,179 @@
+"""
+Адаптивное ограничение числа одновременных запросов к каждому хосту (AIMD):
+пока ответы быстрые и успешные, лимит растёт примерно на единицу за «окно» запросов,
+на 429/503 и таймаутах — уменьшается в decrease_factor раз, но не чаще одного раза
+за окно. Лимит держится в пределах [floor, ceiling] из config.json.
+
+Контроллер общий для всех этапов процесса (shared_controller), поэтому proj_1, proj_2
+и proj_3 видят одно и то же состояние хоста. Слоты можно занимать и из потоков
+(acquire), и из корутин любого цикла asyncio (acquire_async).
+"""
+import asyncio
+import contextlib
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+# Статусы, означающие, что сервер просит снизить нагрузку
+THROTTLE_STATUSES = {429, 503}
+
+
+class HostLimit:
+    """Лимит одновременных запросов к одному хосту."""
+
+    def __init__(self, host, initial, floor=1, ceiling=32, decrease_factor=0.5, latency_tolerance=2.0):
+        self.host = host
+        self.floor = max(1, floor)
+        self.ceiling = max(self.floor, ceiling)
+        self.limit = float(min(self.ceiling, max(self.floor, initial)))
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        # Лучшая наблюдаемая задержка — ориентир «здорового» ответа
+        self.base_latency = None
+        self.stats = {"ok": 0, "slow": 0, "throttled": 0, "decreases": 0, "max_limit": self.limit}
+        self._decreased = 0.0
+        self._cond = threading.Condition()
+        self._waiters = deque()
+
+    def _try_acquire(self):
+        if self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return True
+        return False
+
+    def acquire(self):
+        with self._cond:
+            while not self._try_acquire():
+                self._cond.wait()
+
+    async def acquire_async(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._cond:
+                if self._try_acquire():
+                    return
+                waiter = loop.create_future()
+                self._waiters.append((loop, waiter))
+            await waiter
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._wake()
+
+    def _wake(self):
+        self._cond.notify_all()
+        while self._waiters:
+            loop, waiter = self._waiters.popleft()
+            try:
+                loop.call_soon_threadsafe(_resolve, waiter)
+            except RuntimeError:
+                # Цикл уже закрыт — ждать некому
+                pass
+
+    def record(self, seconds, throttled=False):
+        """Обратная связь по завершённому запросу: время ответа и признак перегрузки."""
+        with self._cond:
+            now = time.monotonic()
+            if throttled:
+                self.stats["throttled"] += 1
+                # Одна перегрузка на окно: ответы, отправленные до снижения, лимит больше не режут
+                if now - self._decreased >= (self.base_latency or seconds):
+                    self.limit = max(self.floor, self.limit * self.decrease_factor)
+                    self._decreased = now
+                    self.stats["decreases"] += 1
+                return
+            if self.base_latency is None or seconds < self.base_latency:
+                self.base_latency = seconds
+            if seconds > self.base_latency * self.latency_tolerance and seconds > 0.05:
+                # Задержка выросла — сервер или канал уже загружены, лимит не растёт
+                self.stats["slow"] += 1
+                return
+            self.stats["ok"] += 1
+            previous = int(self.limit)
+            self.limit = min(self.ceiling, self.limit + 1 / self.limit)
+            self.stats["max_limit"] = max(self.stats["max_limit"], self.limit)
+            if int(self.limit) > previous:
+                self._wake()
+
+    def report(self):
+        return (
+            f"{self.host}: лимит {int(self.limit)} (макс. {int(self.stats['max_limit'])}, "
+            f"диапазон {self.floor}–{self.ceiling}), перегрузок {self.stats['throttled']}, "
+            f"снижений {self.stats['decreases']}"
+        )
+
+
+def _resolve(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class ConcurrencyController:
+    """Набор HostLimit по хостам; настройки отдельных хостов — в "concurrency_hosts"."""
+
+    def __init__(self, initial=4, floor=1, ceiling=32, decrease_factor=0.5, latency_tolerance=2.0, hosts=None):
+        self.defaults = {
+            "initial": initial, "floor": floor, "ceiling": ceiling,
+            "decrease_factor": decrease_factor, "latency_tolerance": latency_tolerance,
+        }
+        self.host_settings = hosts or {}
+        self.ceiling = max([ceiling] + [s.get("ceiling", 0) for s in self.host_settings.values()])
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def host(self, url):
+        host = urlsplit(url).netloc or url
+        with self._lock:
+            if host not in self._hosts:
+                settings = dict(self.defaults, **self.host_settings.get(host, {}))
+                self._hosts[host] = HostLimit(host, **settings)
+            return self._hosts[host]
+
+    @contextlib.contextmanager
+    def slot(self, url):
+        limit = self.host(url)
+        limit.acquire()
+        try:
+            yield limit
+        finally:
+            limit.release()
+
+    @contextlib.asynccontextmanager
+    async def slot_async(self, url):
+        limit = self.host(url)
+        await limit.acquire_async()
+        try:
+            yield limit
+        finally:
+            limit.release()
+
+    def report(self):
+        with self._lock:
+            return "; ".join(limit.report() for limit in self._hosts.values())
+
+
+_CONTROLLERS = {}
+
+
+def shared_controller(config):
+    """
+    Контроллер, общий для всех этапов процесса. С "adaptive_concurrency": false
+    возвращает None — этапы работают с постоянным числом потоков max_workers.
+    """
+    if not config.get("adaptive_concurrency", True):
+        return None
+    settings = (
+        config.get("concurrency_initial") or config.get("max_workers") or 4,
+        config.get("concurrency_floor", 1),
+        config.get("concurrency_ceiling", 32),
+        config.get("concurrency_decrease_factor", 0.5),
+        config.get("concurrency_latency_tolerance", 2.0),
+    )
+    hosts = config.get("concurrency_hosts") or {}
+    key = settings + (tuple(sorted((h, tuple(sorted(s.items()))) for h, s in hosts.items())),)
+    if key not in _CONTROLLERS:
+        _CONTROLLERS[key] = ConcurrencyController(*settings, hosts=hosts)
+    return _CONTROLLERS[key]
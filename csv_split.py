@@ -1,7 +1,40 @@
 import pandas as pd
+import numpy as np
+import json
 import re
 import sys
 import csv
+import metrics
+from datastore import TableWriter
+
+# Название и CAS-номер в одной ячейке: "Название, CAS 13463-67-7" или "Название (CAS 13463-67-7)"
+CAS_PATTERN = r'(.+?)[,\s]*CAS[:\s]*([\d\-]+)|(.+?)\s*\(CAS\s*([\d\-]+)\)'
+OUTPUT_COLUMNS = ["Наименование продукции", "CAS", "Synonyms", "Name"]
+
+
+def split_name_cas(values):
+    """
+    Разделяет название продукции и CAS-номер для столбца целиком (str.extract вместо
+    построчного apply). Возвращает (названия, CAS-номера); где CAS нет — исходное значение и NaN.
+    """
+    parts = values.astype("string").str.extract(CAS_PATTERN, flags=re.IGNORECASE)
+    names = parts[0].fillna(parts[2]).str.strip("() ,")
+    cas_numbers = parts[1].fillna(parts[3]).str.strip()
+    return names.fillna(values), cas_numbers
+
+
+def valid_cas(cas_numbers):
+    """
+    Проверяет формат и контрольную цифру CAS-номеров: последняя цифра равна сумме
+    остальных цифр, умноженных на номер позиции справа, по модулю 10.
+    """
+    cas_numbers = cas_numbers.fillna("").astype(str)
+    well_formed = cas_numbers.str.fullmatch(r"\d{2,7}-\d{2}-\d").to_numpy(dtype=bool)
+    digits = cas_numbers.where(well_formed, "00-00-0").str.replace("-", "", regex=False).str.zfill(10)
+    codes = np.frombuffer("".join(digits).encode("ascii"), dtype=np.uint8).reshape(-1, 10) - ord("0")
+    checksum = codes[:, :9].astype(np.int64) @ np.arange(9, 0, -1)
+    return well_formed & (checksum % 10 == codes[:, 9])
+
 
 def run_steps():
     if len(sys.argv) > 1:
@@ -9,43 +42,52 @@ def run_steps():
     else:
         file_path = "data/Test.csv"
 
+    with open("config.json", "r", encoding="utf-8") as file:
+        chunk_rows = json.load(file).get("csv_split_chunk_rows", 100000)
+
+    read_options = dict(sep=";", quoting=csv.QUOTE_MINIMAL, on_bad_lines='skip')
     try:
-        df = pd.read_csv(file_path, sep=";", quoting=csv.QUOTE_MINIMAL, on_bad_lines='skip')
+        header = pd.read_csv(file_path, nrows=0, **read_options)
     except Exception as e:
         print(f"Ошибка при чтении файла: {e}")
         sys.exit(1)
 
     required_columns = ["Наименование продукции"]
-    if not all(col in df.columns for col in required_columns):
+    if not all(col in header.columns for col in required_columns):
         print(f"Ошибка: в файле отсутствуют нужные столбцы: {required_columns}")
         sys.exit(1)
 
-    df = df[["Наименование продукции"]]
-    df["CAS"] = None
-    df["Synonyms"] = None
-    df["Name"] = None
-
-    def split_name_cas(cell_value):
-        """
-        Разделяет название продукции и CAS-номер, если они находятся в одной строке.
-        """
-        if not isinstance(cell_value, str) or not cell_value.strip():
-            return cell_value, None
-
-        match = re.search(r'(.+?)[,\s]*CAS[:\s]*([\d\-]+)|(.+?)\s*\(CAS\s*([\d\-]+)\)', cell_value, re.IGNORECASE)
-        
-        if match:
-            name = match.group(1) or match.group(3)
-            cas_number = match.group(2) or match.group(4)
-            return name.strip("() ,"), cas_number.strip()
+    # Файл читается частями и только нужный столбец; каждая часть сразу дописывается в таблицу CAS
+    total = invalid = 0
+    stage_metrics = metrics.get("csv_split")
+    writer = TableWriter("CAS")
+    try:
+        for chunk in pd.read_csv(file_path, usecols=required_columns, chunksize=chunk_rows, **read_options):
+            names, cas_numbers = split_name_cas(chunk["Наименование продукции"])
+            found = cas_numbers.notna().to_numpy()
+            valid = valid_cas(cas_numbers[found])
+            invalid += int((~valid).sum())
+            total += len(chunk)
 
-        return cell_value, None
+            df = pd.DataFrame({
+                "Наименование продукции": names[found][valid].astype(object),
+                "CAS": cas_numbers[found][valid].astype(object),
+            })
+            df["Synonyms"] = None
+            df["Name"] = None
+            writer.write(df)
+            stage_metrics.add_items(len(chunk))
+    except Exception as e:
+        print(f"Ошибка при чтении файла: {e}")
+        sys.exit(1)
+    finally:
+        writer.close(OUTPUT_COLUMNS)
 
-    df[['Наименование продукции', 'CAS']] = df['Наименование продукции'].apply(split_name_cas).apply(pd.Series)
-    df_with_cas = df[df["CAS"].notna()]
-    df_with_cas.to_csv("data/CAS.csv", index=False, sep=";")
-    print(f"✔ Файл CAS.csv сохранен ({len(df_with_cas)} строк).")
+    if invalid:
+        print(f"Пропущено CAS-номеров с неверным форматом или контрольной цифрой: {invalid}")
+    metrics.finish("csv_split")
+    print(f"✔ Файл CAS сохранен ({writer.rows} строк из {total}).")
 
 
 if __name__ == '__main__':
-    run_steps()
\ No newline at end of file
+    run_steps()
@@ -0,0 +1,233 @@
+import ast
+import json
+import math
+import os
+
+import pandas as pd
+
+DATA_DIR = "data"
+
+# Столбцы со списками строк
+LIST_COLUMNS = {"Synonyms", "query", "url", "patents", "querys"}
+# Столбцы-словари и тип их значений
+MAP_COLUMNS = {
+    "abstracts": "string",
+    "top_1_score": "double",
+    "top_5_patents": "double",
+    "new_score": "list<double>",
+    "score": "map<list<double>>",
+}
+
+
+# Таблицы в памяти при запуске этапов одним процессом (см. pipeline.py): None — выключено
+_memory = None
+_persist = True
+_persist_tables = set()
+
+
+def use_memory(persist=True, persist_tables=()):
+    """
+    Включает передачу таблиц между этапами в памяти. С persist=False на диск
+    записываются только таблицы из persist_tables.
+    """
+    global _memory, _persist, _persist_tables
+    _memory = {}
+    _persist = persist
+    _persist_tables = set(persist_tables)
+
+
+def release_memory():
+    global _memory
+    _memory = None
+
+
+def load_settings():
+    """Формат хранения промежуточных таблиц из config.json: "parquet" (по умолчанию) или "csv"."""
+    try:
+        with open("config.json", "r", encoding="utf-8") as file:
+            config = json.load(file)
+    except (OSError, ValueError):
+        config = {}
+    return config.get("storage_format", "parquet"), bool(config.get("csv_export", False))
+
+
+def table_path(name, ext):
+    return os.path.join(DATA_DIR, f"{name}.{ext}")
+
+
+def _arrow_type(column):
+    import pyarrow as pa
+
+    if column in LIST_COLUMNS:
+        return pa.list_(pa.string())
+    value_types = {
+        "string": pa.string(),
+        "double": pa.float64(),
+        "list<double>": pa.list_(pa.float64()),
+        "map<list<double>>": pa.map_(pa.string(), pa.list_(pa.float64())),
+    }
+    return pa.map_(pa.string(), value_types[MAP_COLUMNS[column]])
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def _typed_value(column, value):
+    if _is_missing(value):
+        return [] if column in LIST_COLUMNS else {}
+    if column in LIST_COLUMNS:
+        return [str(v) for v in value]
+    return value
+
+
+def _parse_text(column, value):
+    """Разбор значения из CSV: JSON, затем repr Python, затем строка через запятую (старые файлы)."""
+    if _is_missing(value) or value == "":
+        return [] if column in LIST_COLUMNS else {}
+    if not isinstance(value, str):
+        return value
+    for parse in (json.loads, ast.literal_eval):
+        try:
+            return parse(value)
+        except (ValueError, SyntaxError):
+            continue
+    if column in LIST_COLUMNS:
+        return [part.strip() for part in value.split(",") if part.strip()]
+    return {}
+
+
+def _arrow_table(df, schema=None):
+    import pyarrow as pa
+
+    arrays = []
+    for column in df.columns:
+        if column in LIST_COLUMNS or column in MAP_COLUMNS:
+            values = [_typed_value(column, v) for v in df[column].tolist()]
+            arrays.append(pa.array(values, type=_arrow_type(column)))
+        else:
+            arrays.append(pa.Array.from_pandas(df[column].reset_index(drop=True)))
+    table = pa.Table.from_arrays(arrays, names=[str(c) for c in df.columns])
+    return table.cast(schema) if schema is not None else table
+
+
+def _csv_frame(df):
+    out = df.copy()
+    for column in out.columns:
+        if column in LIST_COLUMNS or column in MAP_COLUMNS:
+            out[column] = [json.dumps(_typed_value(column, v), ensure_ascii=False) for v in out[column]]
+    return out
+
+
+class TableWriter:
+    """
+    Запись таблицы этапа по частям, например при потоковой обработке большого файла:
+    каждая часть дописывается в parquet отдельной группой строк (в CSV — в конец файла).
+    """
+
+    def __init__(self, name, csv=False):
+        self.name = name
+        self.rows = 0
+        self.storage_format, csv_export = load_settings()
+        self.to_disk = _memory is None or _persist or name in _persist_tables or csv
+        self.to_csv = self.to_disk and (self.storage_format == "csv" or csv_export or csv)
+        self.to_parquet = self.to_disk and self.storage_format == "parquet"
+        self._chunks = [] if _memory is not None else None
+        self._parquet = None
+        self._columns = None
+        if self.to_disk:
+            os.makedirs(DATA_DIR, exist_ok=True)
+
+    def write(self, df):
+        if self._columns is None:
+            self._columns = list(df.columns)
+        if self._chunks is not None:
+            self._chunks.append(df.copy())
+        if self.to_parquet:
+            if self._parquet is None:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+
+                table = _arrow_table(df)
+                # Столбцы без значений в первой части считаются строковыми, чтобы схема подошла остальным
+                schema = pa.schema([
+                    field.with_type(pa.string()) if pa.types.is_null(field.type) else field for field in table.schema
+                ])
+                self._parquet = pq.ParquetWriter(table_path(self.name, "parquet"), schema)
+            self._parquet.write_table(_arrow_table(df, self._parquet.schema))
+        if self.to_csv:
+            _csv_frame(df).to_csv(
+                table_path(self.name, "csv"), sep=";", encoding="utf-8", index=False,
+                mode="w" if self.rows == 0 else "a", header=self.rows == 0,
+            )
+        self.rows += len(df)
+
+    def close(self, columns=None):
+        """Завершает запись; если частей не было, сохраняет пустую таблицу со столбцами `columns`."""
+        if self._columns is None:
+            self.write(pd.DataFrame(columns=columns or []))
+        if self._parquet is not None:
+            self._parquet.close()
+            self._parquet = None
+        if self._chunks is not None:
+            _memory[self.name] = pd.concat(self._chunks, ignore_index=True)
+            self._chunks = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_table(df, name, csv=False):
+    """
+    Сохраняет таблицу этапа. В формате parquet списки и словари хранятся как
+    list/map-типы Arrow; CSV пишется, если он выбран форматом, включён csv_export
+    или запрошен явно (csv=True), — в нём списки и словари сериализуются в JSON.
+    """
+    with TableWriter(name, csv) as writer:
+        writer.write(df)
+
+
+def read_table(name, columns=None):
+    """
+    Читает таблицу этапа; `columns` — список нужных столбцов (остальные не читаются и не разбираются).
+    Если parquet-файла нет, читается CSV (в том числе созданный прежними версиями).
+    """
+    if _memory is not None and name in _memory:
+        df = _memory[name]
+        return (df[columns] if columns is not None else df).copy()
+
+    storage_format, _ = load_settings()
+    parquet_path = table_path(name, "parquet")
+    csv_path = table_path(name, "csv")
+    if os.path.exists(parquet_path) and (storage_format == "parquet" or not os.path.exists(csv_path)):
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(parquet_path, columns=columns)
+        typed = [c for c in table.column_names if c in LIST_COLUMNS or c in MAP_COLUMNS]
+        df = table.drop_columns(typed).to_pandas()
+        for column in typed:
+            df[column] = table.column(column).to_pylist(maps_as_pydicts="strict")
+        return df[table.column_names]
+
+    df = pd.read_csv(csv_path, sep=";", encoding="utf-8", on_bad_lines="skip", usecols=columns)
+    for column in df.columns:
+        if column in LIST_COLUMNS or column in MAP_COLUMNS:
+            df[column] = [_parse_text(column, v) for v in df[column]]
+    return df
+
+
+def patch_rows(df, positions, patched, columns):
+    """
+    Возвращает копию df, в которой у строк с порядковыми номерами `positions` значения
+    столбцов `columns` заменены значениями из `patched` (строки patched — в том же порядке).
+    """
+    df = df.copy()
+    for column in columns:
+        values = list(df[column])
+        for position, value in zip(positions, patched[column]):
+            values[position] = value
+        df[column] = values
+    return df
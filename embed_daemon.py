@@ -0,0 +1,287 @@
+"""
+Сервис кодирования: держит модель эмбеддингов загруженной и принимает запросы
+на кодирование через Unix-сокет. Запросы, пришедшие от нескольких клиентов, пока
+модель занята, объединяются в один пакет. proj_4 подключается к сервису, если он
+запущен с той же моделью, и загружает модель сам в противном случае.
+
+Запуск: python embed_daemon.py [--socket data/embed.sock]
+
+Протокол: каждое сообщение — 4 байта длины (big-endian) и тело. Запрос — JSON
+{"op": "info"} или {"op": "encode", "texts": [...]}; ответ — JSON-заголовок,
+а на encode ещё и сообщение с матрицей float32 размера header["shape"].
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import struct
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from tqdm import tqdm
+
+from embedding_store import model_key
+
+DEFAULT_SOCKET_PATH = "data/embed.sock"
+# Сколько текстов клиент отправляет одним запросом
+CLIENT_CHUNK = 512
+# Сколько текстов сервис кодирует за один проход (объединённые запросы)
+MAX_BATCH_TEXTS = 2048
+# Сколько ждать запросов других клиентов, если модель свободна
+MERGE_WINDOW = 0.01
+
+_HEADER = struct.Struct(">I")
+
+
+def is_supported():
+    return hasattr(socket, "AF_UNIX")
+
+
+def _recv_exactly(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ConnectionError("Сервис кодирования закрыл соединение")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def _send_message(sock, payload):
+    sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def _recv_message(sock):
+    size, = _HEADER.unpack(_recv_exactly(sock, _HEADER.size))
+    return _recv_exactly(sock, size)
+
+
+class EmbeddingClient:
+    """Клиент сервиса кодирования с тем же encode(), что у EncodingEngine."""
+
+    def __init__(self, path, timeout=None):
+        self.path = path
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.settimeout(timeout)
+        self._sock.connect(path)
+
+    def _call(self, request):
+        _send_message(self._sock, json.dumps(request, ensure_ascii=False).encode("utf-8"))
+        header = json.loads(_recv_message(self._sock))
+        if not header.get("ok"):
+            raise ConnectionError(f"Сервис кодирования: {header.get('error')}")
+        return header
+
+    def info(self):
+        return self._call({"op": "info"})
+
+    def encode(self, texts, show_progress_bar=True):
+        """Возвращает массив эмбеддингов float32 в порядке `texts`."""
+        texts = list(texts)
+        parts = []
+        for start in tqdm(range(0, len(texts), CLIENT_CHUNK), desc="Кодирование (сервис)", disable=not show_progress_bar):
+            header = self._call({"op": "encode", "texts": texts[start:start + CLIENT_CHUNK]})
+            parts.append(np.frombuffer(_recv_message(self._sock), dtype=np.float32).reshape(header["shape"]))
+        if not parts:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.concatenate(parts)
+
+    def close(self):
+        self._sock.close()
+
+
+def connect(path, model, timeout=None):
+    """
+    Возвращает EmbeddingClient, если по пути path работает сервис с моделью model
+    (ключ embedding_store.model_key), иначе None.
+    """
+    if not path or not is_supported() or not os.path.exists(path):
+        return None
+    try:
+        client = EmbeddingClient(path, timeout)
+    except OSError:
+        return None
+    try:
+        served = client.info()["model"]
+    except (OSError, ValueError, KeyError):
+        client.close()
+        return None
+    if served != model:
+        print(f"Сервис кодирования {path} работает с моделью {served}, а нужна {model}")
+        client.close()
+        return None
+    return client
+
+
+class EmbeddingDaemon:
+    """Сервер: принимает запросы, объединяет их в пакеты и кодирует в отдельном потоке."""
+
+    def __init__(self, engine, model, path=DEFAULT_SOCKET_PATH, max_batch_texts=MAX_BATCH_TEXTS,
+                 merge_window=MERGE_WINDOW):
+        self.engine = engine
+        self.model = model
+        self.path = path
+        self.max_batch_texts = max_batch_texts
+        self.merge_window = merge_window
+        self.stats = {"requests": 0, "batches": 0, "texts": 0, "unique": 0, "seconds": 0.0}
+        # Модель кодирует один пакет за раз, цикл asyncio тем временем принимает новые запросы
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._queue = None
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    size, = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+                    request = json.loads(await reader.readexactly(size))
+                except asyncio.IncompleteReadError:
+                    break
+                if request.get("op") == "info":
+                    reply, data = {"ok": True, "model": self.model, "stats": self.stats}, None
+                elif request.get("op") == "encode":
+                    future = asyncio.get_running_loop().create_future()
+                    await self._queue.put((request["texts"], future))
+                    try:
+                        embeddings = await future
+                        reply, data = {"ok": True, "shape": list(embeddings.shape)}, embeddings.tobytes()
+                    except Exception as e:
+                        reply, data = {"ok": False, "error": f"{type(e).__name__}: {e}"}, None
+                else:
+                    reply, data = {"ok": False, "error": f"неизвестная операция {request.get('op')!r}"}, None
+                payload = json.dumps(reply, ensure_ascii=False).encode("utf-8")
+                writer.write(_HEADER.pack(len(payload)) + payload)
+                if data is not None:
+                    writer.write(_HEADER.pack(len(data)) + data)
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def batches(self):
+        """Собирает запросы в пакеты: всё, что накопилось в очереди, но не больше max_batch_texts текстов."""
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self._queue.get()]
+            size = len(pending[0][0])
+            deadline = loop.time() + self.merge_window
+            while size < self.max_batch_texts:
+                if self._queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    item = self._queue.get_nowait()
+                pending.append(item)
+                size += len(item[0])
+
+            # Одинаковые тексты разных клиентов кодируются один раз
+            unique = list(dict.fromkeys(text for texts, _ in pending for text in texts))
+            started = time.perf_counter()
+            try:
+                encoded = await loop.run_in_executor(self._executor, self.engine.encode, unique, False)
+                encoded = np.asarray(encoded, dtype=np.float32)
+            except Exception as e:
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            rows = {text: i for i, text in enumerate(unique)}
+            for texts, future in pending:
+                if not future.done():
+                    future.set_result(encoded[[rows[t] for t in texts]] if texts else np.empty((0, encoded.shape[1]), np.float32))
+            self.stats["requests"] += len(pending)
+            self.stats["batches"] += 1
+            self.stats["texts"] += size
+            self.stats["unique"] += len(unique)
+            self.stats["seconds"] += time.perf_counter() - started
+
+    async def serve(self):
+        """Работает до SIGINT/SIGTERM."""
+        self._queue = asyncio.Queue()
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        server = await asyncio.start_unix_server(self.handle, path=self.path)
+        batcher = asyncio.create_task(self.batches())
+        print(f"✔ Сервис кодирования {self.model} слушает {self.path}")
+        try:
+            async with server:
+                await stop.wait()
+        finally:
+            batcher.cancel()
+
+    def report(self):
+        s = self.stats
+        return (
+            f"Запросов: {s['requests']}, пакетов: {s['batches']}, текстов: {s['texts']} "
+            f"(уникальных {s['unique']}), кодирование {s['seconds']:.1f} с"
+        )
+
+
+def main(argv=None):
+    from encoder import EncodingEngine
+    from proj_4 import MODEL_NAME
+
+    with open("config.json", "r", encoding="utf-8") as file:
+        config = json.load(file)
+    parser = argparse.ArgumentParser(description="Сервис кодирования эмбеддингов через Unix-сокет")
+    parser.add_argument("--socket", default=config.get("embedding_socket") or DEFAULT_SOCKET_PATH)
+    parser.add_argument("--max-batch-texts", type=int, default=MAX_BATCH_TEXTS)
+    args = parser.parse_args(argv)
+
+    if not is_supported():
+        print("❗ Unix-сокеты недоступны на этой платформе")
+        return 1
+    model_name = config.get("embedding_model", MODEL_NAME)
+    revision = config.get("embedding_model_revision")
+    mode = config.get("encoding_mode", "fp32")
+    model = model_key(model_name, revision, mode if mode != "fp32" else None)
+    if os.path.exists(args.socket):
+        try:
+            client = EmbeddingClient(args.socket, timeout=5)
+        except OSError:
+            # Подключиться не удалось: сокет остался от завершившегося процесса
+            os.remove(args.socket)
+        else:
+            # Сокет занят работающим сервисом — с этой или другой моделью; его нельзя оставлять без сокета
+            try:
+                served = client.info().get("model")
+            except (OSError, ValueError):
+                served = None
+            finally:
+                client.close()
+            print(f"❗ Сервис кодирования уже запущен: {args.socket} (модель {served or 'неизвестна'}, нужна {model})")
+            return 1
+    directory = os.path.dirname(args.socket)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    engine = EncodingEngine(
+        model_name, revision, mode, config.get("encoding_processes", 1), config.get("encoding_batch_size", 64)
+    )
+    started = time.perf_counter()
+    engine.encode(["warm-up"], show_progress_bar=False)
+    print(f"Модель {model} загружена за {time.perf_counter() - started:.1f} с")
+
+    daemon = EmbeddingDaemon(engine, model, args.socket, args.max_batch_texts)
+    try:
+        asyncio.run(daemon.serve())
+    finally:
+        engine.close()
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+        print(daemon.report())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+
+from cache_store import CacheStore
+
+DEFAULT_STORE_DIR = "data/embeddings"
+
+
+def text_hash(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def model_key(model_name, revision=None, variant=None):
+    """
+    Имя каталога хранилища: эмбеддинги разных моделей, версий и режимов кодирования
+    (например, int8) не смешиваются.
+    """
+    key = model_name if not revision else f"{model_name}@{revision}"
+    if variant:
+        key = f"{key}+{variant}"
+    return re.sub(r"[^\w.@+-]+", "_", key)
+
+
+class EmbeddingStore:
+    """
+    Постоянное хранилище эмбеддингов: индекс «хэш текста → номер строки» в SQLite
+    и матрица float32/float16 в бинарном файле, который читается через memmap.
+    Новые векторы дописываются в конец файла, уже посчитанные не пересчитываются.
+    """
+
+    def __init__(self, model_name, revision=None, root=DEFAULT_STORE_DIR, dtype="float32", variant=None):
+        self.path = os.path.join(root, model_key(model_name, revision, variant))
+        os.makedirs(self.path, exist_ok=True)
+        self.meta_path = os.path.join(self.path, "meta.json")
+        self.vectors_path = os.path.join(self.path, "vectors.bin")
+        self.index = CacheStore(os.path.join(self.path, "index.sqlite"), table="rows")
+        self.meta = {"model": model_name, "revision": revision, "variant": variant, "dtype": dtype, "dim": None}
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as file:
+                self.meta = json.load(file)
+        if np.dtype(self.meta["dtype"]) != np.dtype(dtype):
+            raise ValueError(
+                f"Хранилище эмбеддингов {self.path} создано с типом {self.meta['dtype']}, а задан {dtype}: "
+                f"верните прежний embedding_dtype или удалите каталог хранилища"
+            )
+        self.dtype = np.dtype(self.meta["dtype"])
+        self._matrix = None
+        self._truncate_partial_row()
+
+    def _truncate_partial_row(self):
+        """
+        Обрезает недописанную строку в конце vectors.bin (сбой во время add): иначе следующие
+        векторы легли бы со сдвигом и все строки после неё читались бы неверно.
+        """
+        if not self.dim or not os.path.exists(self.vectors_path):
+            return
+        row_bytes = self.dim * self.dtype.itemsize
+        size = os.path.getsize(self.vectors_path)
+        if size % row_bytes:
+            print(f"❗ {self.vectors_path}: обрезана недописанная строка ({size % row_bytes} байт)")
+            with open(self.vectors_path, "r+b") as file:
+                file.truncate(size - size % row_bytes)
+
+    @property
+    def dim(self):
+        return self.meta["dim"]
+
+    def __len__(self):
+        if not self.dim or not os.path.exists(self.vectors_path):
+            return 0
+        return os.path.getsize(self.vectors_path) // (self.dim * self.dtype.itemsize)
+
+    @property
+    def matrix(self):
+        """Матрица всех эмбеддингов (memmap, только чтение)."""
+        rows = len(self)
+        if self._matrix is None or self._matrix.shape[0] != rows:
+            if rows == 0:
+                return np.empty((0, self.dim or 0), dtype=self.dtype)
+            self._matrix = np.memmap(self.vectors_path, dtype=self.dtype, mode="r", shape=(rows, self.dim))
+        return self._matrix
+
+    def missing(self, texts):
+        """Возвращает уникальные тексты, для которых ещё нет эмбеддинга."""
+        unique = list(dict.fromkeys(texts))
+        found = self.index.get_many(text_hash(t) for t in unique)
+        return [t for t in unique if text_hash(t) not in found]
+
+    def add(self, texts, embeddings):
+        """Дописывает эмбеддинги новых текстов в конец матрицы."""
+        embeddings = np.asarray(embeddings, dtype=self.dtype)
+        if len(texts) == 0:
+            return
+        if self.dim is None:
+            self.meta["dim"] = int(embeddings.shape[1])
+            with open(self.meta_path, "w", encoding="utf-8") as file:
+                json.dump(self.meta, file, ensure_ascii=False, indent=4)
+        start = len(self)
+        # Сначала данные, потом индекс: после сбоя в файле могут остаться лишние строки, но не битые ссылки;
+        # недописанная последняя строка обрезается при следующем открытии хранилища
+        with open(self.vectors_path, "ab") as file:
+            file.write(np.ascontiguousarray(embeddings).tobytes())
+        self.index.put_many((text_hash(t), start + i, False) for i, t in enumerate(texts))
+
+    def rows(self, texts):
+        """Номера строк матрицы для текстов (-1, если эмбеддинга нет)."""
+        found = self.index.get_many(text_hash(t) for t in texts)
+        return np.array([found[h].value if h in found else -1 for h in map(text_hash, texts)], dtype=np.int64)
+
+    def get(self, texts):
+        """Эмбеддинги текстов в виде массива float32 (все тексты должны быть в хранилище)."""
+        rows = self.rows(texts)
+        if (rows < 0).any():
+            raise KeyError("Нет эмбеддинга для части текстов")
+        return np.asarray(self.matrix[rows], dtype=np.float32)
+
+    def close(self):
+        self.index.close()
@@ -0,0 +1,111 @@
+import numpy as np
+from tqdm import tqdm
+
+ENCODING_MODES = ("fp32", "int8", "onnx")
+
+
+def load_model(model_name, revision=None, mode="fp32"):
+    """
+    Загружает SentenceTransformer в выбранном режиме:
+    fp32 — как есть, int8 — динамическая int8-квантизация Linear-слоёв torch,
+    onnx — ONNX Runtime бэкенд sentence_transformers (нужны optimum и onnxruntime).
+    """
+    from sentence_transformers import SentenceTransformer
+
+    if mode not in ENCODING_MODES:
+        raise ValueError(f"Неизвестный режим кодирования: {mode}")
+    if mode == "onnx":
+        return SentenceTransformer(model_name, revision=revision, device="cpu", backend="onnx")
+
+    model = SentenceTransformer(model_name, revision=revision, device="cpu")
+    if mode == "int8":
+        import torch
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+
+def length_batches(texts, batch_size=64, max_batch_chars=32000):
+    """
+    Группирует индексы текстов в пакеты по возрастанию длины: короткие фразы
+    собираются в большие пакеты, длинные аннотации — в пакеты поменьше, чтобы
+    не тратить время на паддинг.
+    """
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    batches = []
+    current = []
+    for i in order:
+        # Паддинг выравнивает пакет по самому длинному (последнему) тексту
+        width = len(texts[i])
+        if current and (len(current) >= batch_size or width * (len(current) + 1) > max_batch_chars):
+            batches.append(current)
+            current = []
+        current.append(i)
+    if current:
+        batches.append(current)
+    return batches
+
+
+class EncodingEngine:
+    """
+    Кодирование текстов на CPU: пакеты по длине, при processes > 1 —
+    пул процессов sentence_transformers по числу ядер. Модель загружается лениво.
+    """
+
+    def __init__(self, model_name, revision=None, mode="fp32", processes=1, batch_size=64, max_batch_chars=32000):
+        self.model_name = model_name
+        self.revision = revision
+        self.mode = mode
+        self.processes = max(1, processes or 1)
+        self.batch_size = batch_size
+        self.max_batch_chars = max_batch_chars
+        self._model = None
+        self._pool = None
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = load_model(self.model_name, self.revision, self.mode)
+        return self._model
+
+    def encode(self, texts, show_progress_bar=True):
+        """Возвращает массив эмбеддингов float32 в порядке `texts`."""
+        texts = list(texts)
+        embeddings = None
+        batches = length_batches(texts, self.batch_size, self.max_batch_chars)
+
+        if self.processes > 1 and len(texts) > self.batch_size:
+            if self._pool is None:
+                self._pool = self.model.start_multi_process_pool(["cpu"] * self.processes)
+            order = [i for batch in batches for i in batch]
+            encoded = self.model.encode_multi_process([texts[i] for i in order], self._pool, batch_size=self.batch_size)
+            embeddings = np.empty_like(encoded)
+            embeddings[order] = encoded
+            return embeddings.astype(np.float32, copy=False)
+
+        for batch in tqdm(batches, desc="Кодирование", disable=not show_progress_bar):
+            encoded = self.model.encode([texts[i] for i in batch], batch_size=len(batch), convert_to_numpy=True)
+            if embeddings is None:
+                embeddings = np.empty((len(texts), encoded.shape[1]), dtype=np.float32)
+            embeddings[batch] = encoded
+        if embeddings is None:
+            return np.empty((0, 0), dtype=np.float32)
+        return embeddings
+
+    def close(self):
+        if self._pool is not None:
+            self._model.stop_multi_process_pool(self._pool)
+            self._pool = None
+
+
+_ENGINES = {}
+
+
+def shared_engine(model_name, revision=None, mode="fp32", processes=1, batch_size=64):
+    """
+    Движок кодирования, общий для всех запусков в одном процессе (например, в pipeline.py):
+    модель загружается один раз и остаётся в памяти между запусками.
+    """
+    key = (model_name, revision, mode, processes, batch_size)
+    if key not in _ENGINES:
+        _ENGINES[key] = EncodingEngine(*key)
+    return _ENGINES[key]
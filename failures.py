@@ -0,0 +1,77 @@
+"""
+Журнал неудачных единиц работы сетевых этапов: CAS-номеров (proj_1), ссылок поиска (proj_2)
+и номеров патентов (proj_3). Каждая запись хранит класс ошибки, текст, число попыток и время
+первой ошибки; успешная повторная обработка удаляет запись. Журнал лежит в той же базе
+SQLite, что и кэши (таблица failures_<этап>).
+
+Режим --retry-failures у proj_1, proj_2 и proj_3 повторяет только единицы из журнала
+и подставляет результаты в уже сохранённую выходную таблицу этапа.
+"""
+import time
+from collections import Counter
+
+from cache_store import CacheStore, DEFAULT_CACHE_PATH
+
+
+class FetchError(Exception):
+    """Ошибка загрузки, которую нельзя путать с пустым результатом (например, HTTP 503)."""
+
+
+def error_class(error):
+    """Класс ошибки для журнала: имя исключения или начало строки вида "HTTP 503" / "TimeoutError: ..."."""
+    if isinstance(error, BaseException):
+        if isinstance(error, FetchError) and error.args:
+            return error_class(str(error.args[0]))
+        return type(error).__name__
+    return str(error).split(":", 1)[0] if error else "UnknownError"
+
+
+class FailureLedger:
+    """Постоянный журнал ошибок одного этапа."""
+
+    def __init__(self, stage, path=DEFAULT_CACHE_PATH):
+        self.stage = stage
+        self.store = CacheStore(path, table=f"failures_{stage}")
+
+    def record_many(self, failures):
+        """Записывает ошибки вида (единица, класс ошибки, текст); повторная ошибка увеличивает число попыток."""
+        failures = {str(unit): (cls, message) for unit, cls, message in failures}
+        if not failures:
+            return
+        known = self.store.get_many(failures)
+        now = time.time()
+        self.store.put_many(
+            (unit, {
+                "error_class": cls,
+                "error": str(message)[:500],
+                "attempts": (known[unit].value["attempts"] if unit in known else 0) + 1,
+                "first_seen": known[unit].value["first_seen"] if unit in known else now,
+            }, False)
+            for unit, (cls, message) in failures.items()
+        )
+
+    def resolve_many(self, units):
+        """Удаляет записи единиц, которые обработаны успешно."""
+        units = [str(unit) for unit in units]
+        if units:
+            self.store.delete_many(units)
+
+    def units(self):
+        return self.store.keys()
+
+    def __len__(self):
+        return len(self.store)
+
+    def summary(self):
+        """Число записей по классам ошибок, например "HTTP 503: 4, TimeoutError: 1"."""
+        entries = self.store.get_many(self.store.keys())
+        counts = Counter(entry.value["error_class"] for entry in entries.values())
+        return ", ".join(f"{cls}: {count}" for cls, count in counts.most_common())
+
+    def report(self):
+        if not len(self):
+            return f"Журнал ошибок {self.stage}: пуст"
+        return f"Журнал ошибок {self.stage}: {len(self)} ({self.summary()}); повторить: --retry-failures"
+
+    def close(self):
+        self.store.close()
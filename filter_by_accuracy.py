@@ -1,19 +1,26 @@
 import pandas as pd
 import json
 import sys
+import metrics
+from datastore import read_table, write_table
 
 def run_steps():
+    stage_metrics = metrics.get("filter_by_accuracy")
     threshold = float(sys.argv[1]) if len(sys.argv) > 1 else 0.40
-    df = pd.read_csv("data/Best_score.csv", sep=";", encoding="utf-8")
+    # Filtered_score сохраняет строки Best_score целиком, поэтому таблица читается со всеми столбцами
+    df = read_table("Best_score")
     df["best_score"] = pd.to_numeric(df["best_score"], errors="coerce")
     filtered_df = df[df["best_score"] >= threshold]
 
 
-    filtered_df.to_csv("data/Filtered_score.csv", sep=";", encoding="utf-8", index=False)
+    write_table(filtered_df, "Filtered_score")
     print(f"\n✔ Отфильтровано по порогу {threshold:.2f} — осталось {len(filtered_df)} записей.")
 
     final = filtered_df[["Наименование продукции", "top_5_patents"]]
-    final.to_csv("data/Final.csv", sep=";", encoding="utf-8", index=False)
+    # Итоговый файл всегда выгружается и в CSV
+    write_table(final, "Final", csv=True)
+    stage_metrics.add_items(len(df))
+    metrics.finish("filter_by_accuracy")
     
 if __name__ == '__main__':
     run_steps()
\ No newline at end of file
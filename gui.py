@@ -3,26 +3,68 @@ os.environ.pop("XDG_SESSION_TYPE", None)
 os.environ["QT_QPA_PLATFORM"] = "xcb"
 
 import sys
-import subprocess
 import json
+import contextlib
 from datetime import datetime
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
     QTextEdit, QLabel, QFileDialog, QSplitter, QListWidget,
-    QListWidgetItem, QSlider, QLineEdit, QSpinBox, QFrame
+    QListWidgetItem, QSlider, QLineEdit, QSpinBox, QFrame,
+    QTableWidget, QTableWidgetItem, QHeaderView
 )
-from PyQt5.QtCore import QThread, pyqtSignal, Qt
-
-STEPS = [
-    ("File Splitting", "csv_split.py"),
-    ("Retrieve CAS Information", "proj_1.py"),
-    ("Patent Search", "proj_2.py"),
-    ("Annotations and Translation", "proj_3.py"),
-    ("Scoring", "proj_4.py"),
-    ("Final Selection", "proj_5.py"),
-    ("Filter by Accuracy", "filter_by_accuracy.py"),
-    ("Visualization", "info.py")
-]
+from PyQt5.QtCore import QThread, QTimer, pyqtSignal, Qt
+import metrics
+from pipeline import STEPS, run_pipeline
+
+DASHBOARD_COLUMNS = ["Stage", "Status", "Items", "Items/s", "Cache hit", "Retries", "Errors", "Calls (p50/p95 ms)", "Peak MB"]
+
+class SignalWriter:
+    """Файлоподобный объект: построчно передаёт вывод этапов (print и tqdm) в сигнал."""
+
+    def __init__(self, emit):
+        self.emit = emit
+        self.buffer = ""
+
+    def write(self, text):
+        self.buffer += text.replace("\r", "\n")
+        *lines, self.buffer = self.buffer.split("\n")
+        for line in lines:
+            if line.strip():
+                self.emit(line.rstrip())
+        return len(text)
+
+    def flush(self):
+        pass
+
+class MetricsTail:
+    """Читает события, дописанные в файл метрик после создания объекта."""
+
+    def __init__(self, path):
+        self.path = path
+        self.offset = os.path.getsize(path) if path and os.path.exists(path) else 0
+        self.buffer = b""
+
+    def read(self):
+        if not self.path or not os.path.exists(self.path):
+            return []
+        with open(self.path, "rb") as file:
+            file.seek(self.offset)
+            data = file.read()
+            self.offset = file.tell()
+        # Последняя строка может быть ещё не дописана
+        *lines, self.buffer = (self.buffer + data).split(b"\n")
+        events = []
+        for line in lines:
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                pass
+        return events
+
+def format_calls(calls):
+    return ", ".join(
+        f"{kind}: {c['count']} ({c['p50_ms']:.0f}/{c['p95_ms']:.0f})" for kind, c in calls.items() if c["count"]
+    )
 
 class ScriptRunner(QThread):
     output_signal = pyqtSignal(str)
@@ -35,18 +77,10 @@ class ScriptRunner(QThread):
         self.workers = workers
 
     def run(self):
-        for label, script in self.tasks:
-            self.output_signal.emit(f"▶️ {label}...")
-            cmd = [sys.executable, script]
-            if script == "csv_split.py" and self.file_path:
-                cmd.append(self.file_path)
-            if script == "filter_by_accuracy.py":
-                cmd.append(str(self.accuracy))
-            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
-            for line in proc.stdout:
-                self.output_signal.emit(line.rstrip())
-            proc.wait()
-        self.output_signal.emit("✔ All steps completed")
+        # Этапы выполняются в этом же процессе (pipeline.py), таблицы передаются в памяти
+        writer = SignalWriter(self.output_signal.emit)
+        with contextlib.redirect_stdout(writer), contextlib.redirect_stderr(writer):
+            run_pipeline([step for _, step in self.tasks], self.file_path, self.accuracy)
 
 class MainWindow(QWidget):
     def __init__(self):
@@ -59,6 +93,8 @@ class MainWindow(QWidget):
             QPushButton:hover { background: #357ab8; }
             QListWidget { background: #3b3b3b; border: none; }
             QTextEdit { background: #1e1e1e; border: none; padding: 4px; }
+            QTableWidget { background: #1e1e1e; border: none; gridline-color: #444; }
+            QHeaderView::section { background: #3b3b3b; color: #ddd; border: none; padding: 4px; }
             QSlider::groove:horizontal { background: #555; height: 6px; border-radius: 3px; }
             QSlider::handle:horizontal { background: #4a90e2; width: 14px; margin: -4px 0; border-radius: 7px; }
             QLineEdit, QSpinBox { background: #3b3b3b; border: 1px solid #555; border-radius: 4px; padding: 4px; color: #ddd; }
@@ -73,10 +109,10 @@ class MainWindow(QWidget):
         sb_layout.setSpacing(15)
         sb_layout.addWidget(QLabel("Processing Steps:"))
         self.steps_list = QListWidget()
-        for label, script in STEPS:
+        for step, label, _, _ in STEPS:
             item = QListWidgetItem(label)
             item.setCheckState(Qt.Unchecked)
-            item.script = script
+            item.step = step
             self.steps_list.addItem(item)
         sb_layout.addWidget(self.steps_list)
 
@@ -161,11 +197,23 @@ class MainWindow(QWidget):
         self.main_output.setReadOnly(True)
         ct_layout.addWidget(self.main_output)
 
-        ct_layout.addWidget(QLabel("Progress:"))
-        self.script_output = QTextEdit()
-        self.script_output.setReadOnly(True)
-        self.script_output.setFixedHeight(50)
-        ct_layout.addWidget(self.script_output)
+        # Сводка по этапам строится по событиям из файла метрик (metrics.py)
+        ct_layout.addWidget(QLabel("Stages:"))
+        self.dashboard = QTableWidget(0, len(DASHBOARD_COLUMNS))
+        self.dashboard.setHorizontalHeaderLabels(DASHBOARD_COLUMNS)
+        self.dashboard.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.dashboard.horizontalHeader().setStretchLastSection(True)
+        self.dashboard.verticalHeader().setVisible(False)
+        self.dashboard.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.dashboard.setFixedHeight(220)
+        ct_layout.addWidget(self.dashboard)
+        self.progress_label = QLabel("")
+        ct_layout.addWidget(self.progress_label)
+        self.stage_rows = {}
+        self.metrics_tail = None
+        self.metrics_timer = QTimer(self)
+        self.metrics_timer.setInterval(500)
+        self.metrics_timer.timeout.connect(self.poll_metrics)
 
         splitter.addWidget(content)
         splitter.setSizes([300,700])
@@ -192,18 +240,22 @@ class MainWindow(QWidget):
         for idx in range(self.steps_list.count()):
             item = self.steps_list.item(idx)
             if item.checkState() == Qt.Checked:
-                tasks.append((item.text(), item.script))
+                tasks.append((item.text(), item.step))
         if not tasks:
             self.main_output.append("❗ No steps selected")
             return
-        if any(s == "csv_split.py" for _,s in tasks) and not hasattr(self, 'file_path'):
+        if any(s == "csv_split" for _,s in tasks) and not hasattr(self, 'file_path'):
             self.main_output.append("❗ Please select a file before running")
             return
         acc = self.accuracy_slider.value() / 100.0
         workers = self.workers_spin.value()
         self.start_time = datetime.now()
         self.main_output.append(f"⏱ Start: {self.start_time.strftime('%H:%M:%S')}")
-        self.script_output.clear()
+        self.progress_label.clear()
+        self.dashboard.setRowCount(0)
+        self.stage_rows = {}
+        self.metrics_tail = MetricsTail(metrics.metrics_path())
+        self.metrics_timer.start()
         self.runner = ScriptRunner(tasks, getattr(self, 'file_path', None), acc, workers)
         self.runner.output_signal.connect(self.route_output)
         self.runner.finished.connect(self.on_finished)
@@ -213,10 +265,40 @@ class MainWindow(QWidget):
         if text.startswith("▶️") or text.startswith("❗") or text.startswith("✔"):
             self.main_output.append(text)
         else:
-            # self.script_output.setPlainText(text)
-            self.script_output.append(text)
+            # Прогресс-бары и прочий вывод этапов не копятся: показывается только последняя строка
+            self.progress_label.setText(text)
+
+    def poll_metrics(self):
+        if self.metrics_tail is None:
+            return
+        for event in self.metrics_tail.read():
+            if event.get("stage"):
+                self.update_stage(event)
+
+    def update_stage(self, event):
+        stage = event["stage"]
+        if stage not in self.stage_rows:
+            self.stage_rows[stage] = self.dashboard.rowCount()
+            self.dashboard.insertRow(self.stage_rows[stage])
+        labels = {step: label for step, label, _, _ in STEPS}
+        values = [labels.get(stage, stage), event.get("status", "running")]
+        if event["event"] != "start":
+            hit_ratio = event.get("cache_hit_ratio")
+            values += [
+                str(event["items"]),
+                f"{event['items_per_sec']:.1f}",
+                f"{hit_ratio:.0%}" if hit_ratio is not None else "-",
+                str(sum(event["retries"].values())),
+                str(sum(event["errors"].values())),
+                format_calls(event["calls"]),
+                str(event.get("peak_rss_mb") or "-"),
+            ]
+        for column, value in enumerate(values):
+            self.dashboard.setItem(self.stage_rows[stage], column, QTableWidgetItem(value))
 
     def on_finished(self):
+        self.metrics_timer.stop()
+        self.poll_metrics()
         end_time = datetime.now()
         delta = end_time - self.start_time
         total_seconds = int(delta.total_seconds())
@@ -229,11 +311,16 @@ class MainWindow(QWidget):
         )
 
     def save_config(self):
-        cfg = {
+        # Остальные ключи config.json (настройки кэша и т.п.) сохраняются как есть
+        try:
+            cfg = json.load(open('config.json','r',encoding='utf-8'))
+        except:
+            cfg = {}
+        cfg.update({
             'first_part_terms': [k.strip() for k in self.keywords.text().split(',') if k.strip()],
             'accuracy_threshold': self.accuracy_slider.value() / 100.0,
             'max_workers': self.workers_spin.value()
-        }
+        })
         with open('config.json','w',encoding='utf-8') as f:
             json.dump(cfg, f, indent=4, ensure_ascii=False)
         self.main_output.append(f"✔ The settings are saved: {cfg}")
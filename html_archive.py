@@ -0,0 +1,57 @@
+import os
+import threading
+import zlib
+
+from cache_store import CacheStore
+
+DEFAULT_ARCHIVE_DIR = "data/html_archive"
+
+
+class HtmlArchive:
+    """
+    Архив загруженных страниц: сжатый HTML дописывается в конец pages.bin и никогда
+    не перезаписывается, индекс «ключ (CAS) → смещение и длина записи» лежит в SQLite.
+    При повторной загрузке страницы индекс указывает на новую запись, старая остаётся в файле.
+    По архиву страницы можно разобрать заново без обращения к сети (proj_1 --reparse).
+    """
+
+    def __init__(self, root=DEFAULT_ARCHIVE_DIR):
+        os.makedirs(root, exist_ok=True)
+        self.pages_path = os.path.join(root, "pages.bin")
+        self.index = CacheStore(os.path.join(root, "index.sqlite"), table="pages")
+        self._lock = threading.Lock()
+
+    def add_many(self, pages):
+        """Дописывает страницы вида (ключ, url, html) и обновляет индекс."""
+        entries = []
+        with self._lock, open(self.pages_path, "ab") as file:
+            for key, url, html in pages:
+                data = zlib.compress(html.encode("utf-8"))
+                entries.append((key, {"offset": file.tell(), "length": len(data), "url": url}, False))
+                file.write(data)
+        self.index.put_many(entries)
+
+    def get_many(self, keys):
+        """Возвращает {ключ: html} для ключей, которые есть в архиве."""
+        found = self.index.get_many(keys)
+        if not found:
+            return {}
+        pages = {}
+        with open(self.pages_path, "rb") as file:
+            # Чтение по возрастанию смещения — почти последовательный проход по файлу
+            for key, entry in sorted(found.items(), key=lambda item: item[1].value["offset"]):
+                file.seek(entry.value["offset"])
+                pages[key] = zlib.decompress(file.read(entry.value["length"])).decode("utf-8")
+        return pages
+
+    def keys(self):
+        return self.index.keys()
+
+    def __len__(self):
+        return len(self.index)
+
+    def size_bytes(self):
+        return os.path.getsize(self.pages_path) if os.path.exists(self.pages_path) else 0
+
+    def close(self):
+        self.index.close()
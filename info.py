@@ -1,17 +1,14 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 import numpy as np
 
-import pandas as pd
-import json
+from datastore import read_table
 
 def run_steps():
-    df = pd.read_csv("data/Filtered_score.csv", sep=";", encoding="utf-8")
+    # matplotlib и seaborn нужны только для окна с графиками
+    import matplotlib.pyplot as plt
+    import seaborn as sns
 
-    # Преобразуем строковые поля обратно в словари/списки
-    for col in ["score", "new_score", "top_1_score", "top_5_patents"]:
-        df[col] = df[col].apply(json.loads)
+    # Для графиков нужен только best_score
+    df = read_table("Filtered_score", columns=["best_score"])
     fig, axes = plt.subplots(2, 2, figsize=(14, 10))
 
     # Гистограмма
@@ -0,0 +1,206 @@
+"""
+Метрики этапов обработки. Каждый этап получает свой StageMetrics (metrics.get("proj_1"))
+и отмечает в нём обработанные строки, внешние вызовы (время, ошибки, повторы) и обращения
+к кэшу. События пишутся в JSONL-файл (по одному JSON-объекту в строке, путь — "metrics_path"
+в config.json, пустая строка отключает запись):
+
+    {"time": ..., "event": "start" | "progress" | "end", "stage": "proj_1", ...}
+
+События "progress" пишутся не чаще раза в EMIT_INTERVAL секунд, "end" — по завершении этапа
+со статусом "done" или "failed". GUI читает этот файл и показывает сводку по этапам.
+"""
+import contextlib
+import json
+import os
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_METRICS_PATH = "data/metrics.jsonl"
+# Верхние границы корзин гистограммы задержек, мс; последняя корзина — всё, что дольше
+LATENCY_BUCKETS_MS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+EMIT_INTERVAL = 1.0
+
+_lock = threading.Lock()
+_stages_lock = threading.Lock()
+_stages = {}
+_path = None
+
+
+def metrics_path():
+    """Путь к файлу метрик из config.json (читается один раз за процесс)."""
+    global _path
+    if _path is None:
+        try:
+            with open("config.json", "r", encoding="utf-8") as file:
+                _path = json.load(file).get("metrics_path", DEFAULT_METRICS_PATH)
+        except (OSError, ValueError):
+            _path = DEFAULT_METRICS_PATH
+    return _path
+
+
+def peak_rss_mb():
+    """Пиковый объём памяти процесса в МБ (ru_maxrss в Linux — в килобайтах)."""
+    if resource is None:
+        return None
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def emit(event, stage, **fields):
+    """Дописывает событие в файл метрик."""
+    path = metrics_path()
+    if not path:
+        return
+    record = {"time": round(time.time(), 3), "event": event, "stage": stage, **fields}
+    line = json.dumps(record, ensure_ascii=False) + "\n"
+    with _lock:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as file:
+            file.write(line)
+
+
+class Histogram:
+    """Гистограмма задержек с фиксированными корзинами LATENCY_BUCKETS_MS."""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        ms = seconds * 1000
+        index = next((i for i, bound in enumerate(LATENCY_BUCKETS_MS) if ms <= bound), len(LATENCY_BUCKETS_MS))
+        self.counts[index] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def quantile(self, q):
+        """Приближённый квантиль: верхняя граница корзины, в которую он попадает."""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS_MS + [self.max], self.counts):
+            seen += count
+            if seen >= target:
+                return round(min(bound, self.max), 1)
+        return round(self.max, 1)
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count, 1) if self.count else None,
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "max_ms": round(self.max, 1),
+            "counts": self.counts,
+        }
+
+
+class StageMetrics:
+    """Счётчики одного этапа; безопасны для вызова из нескольких потоков."""
+
+    def __init__(self, stage):
+        self.stage = stage
+        self.started = time.perf_counter()
+        self.items = 0
+        self.calls = {}
+        self.errors = {}
+        self.retries = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.gauges = {}
+        self._emitted = self.started
+        self._lock = threading.Lock()
+        emit("start", stage, buckets_ms=LATENCY_BUCKETS_MS)
+
+    def add_items(self, count):
+        with self._lock:
+            self.items += count
+        self._maybe_emit()
+
+    def call(self, kind, seconds, ok=True):
+        """Отмечает внешний вызов вида `kind` (например, "chembk", "translate")."""
+        with self._lock:
+            self.calls.setdefault(kind, Histogram()).add(seconds)
+            if not ok:
+                self.errors[kind] = self.errors.get(kind, 0) + 1
+        self._maybe_emit()
+
+    @contextlib.contextmanager
+    def timed(self, kind):
+        """Замеряет время блока как внешний вызов; исключение считается ошибкой вызова."""
+        started = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            self.call(kind, time.perf_counter() - started, ok)
+
+    def retry(self, kind, count=1):
+        with self._lock:
+            self.retries[kind] = self.retries.get(kind, 0) + count
+
+    def gauge(self, name, value):
+        """Текущее значение величины, например лимита одновременных запросов к хосту."""
+        with self._lock:
+            self.gauges[name] = value
+
+    def cache(self, hits, misses):
+        with self._lock:
+            self.cache_hits += hits
+            self.cache_misses += misses
+
+    def snapshot(self):
+        with self._lock:
+            elapsed = time.perf_counter() - self.started
+            lookups = self.cache_hits + self.cache_misses
+            return {
+                "elapsed": round(elapsed, 3),
+                "items": self.items,
+                "items_per_sec": round(self.items / elapsed, 2) if elapsed else 0.0,
+                "cache_hits": self.cache_hits,
+                "cache_misses": self.cache_misses,
+                "cache_hit_ratio": round(self.cache_hits / lookups, 3) if lookups else None,
+                "retries": dict(self.retries),
+                "errors": dict(self.errors),
+                "calls": {kind: histogram.as_dict() for kind, histogram in self.calls.items()},
+                "gauges": dict(self.gauges),
+                "peak_rss_mb": peak_rss_mb(),
+            }
+
+    def _maybe_emit(self):
+        now = time.perf_counter()
+        with self._lock:
+            if now - self._emitted < EMIT_INTERVAL:
+                return
+            self._emitted = now
+        emit("progress", self.stage, **self.snapshot())
+
+    def close(self, status="done"):
+        emit("end", self.stage, status=status, **self.snapshot())
+
+
+def get(stage):
+    """Метрики этапа; создаются (и пишут событие "start") при первом обращении."""
+    with _stages_lock:
+        if stage not in _stages:
+            _stages[stage] = StageMetrics(stage)
+        return _stages[stage]
+
+
+def finish(stage, status="done"):
+    """Завершает метрики этапа (событие "end"); повторный вызов ничего не делает."""
+    with _stages_lock:
+        metrics = _stages.pop(stage, None)
+    if metrics is not None:
+        metrics.close(status)
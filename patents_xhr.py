@@ -0,0 +1,67 @@
+import html
+import json
+import re
+from urllib.parse import quote, urlsplit
+
+from async_fetch import AsyncFetcher
+from failures import FetchError
+
+PATENTS_URL = "https://patents.google.com"
+TAG_REGEX = re.compile(r"<[^>]+>")
+
+
+def xhr_query_url(url, base_url=PATENTS_URL):
+    """Преобразует ссылку поиска Google Patents в ссылку JSON-эндпоинта, который вызывает сама страница."""
+    query = urlsplit(url).query
+    return f"{base_url.rstrip('/')}/xhr/query?url={quote(query, safe='')}&exp="
+
+
+def parse_results(payload):
+    """Возвращает список (номер патента, текст результата) из ответа /xhr/query."""
+    results = []
+    for cluster in payload.get("results", {}).get("cluster", []):
+        for item in cluster.get("result", []):
+            patent = item.get("patent", {})
+            number = patent.get("publication_number")
+            if number:
+                text = " ".join(filter(None, [number, patent.get("title"), patent.get("snippet")]))
+                results.append((number, html.unescape(TAG_REGEX.sub("", text))))
+    return results
+
+
+class XhrSearch:
+    """
+    Поиск патентов без браузера: запрашивает JSON-результаты поиска напрямую.
+    Интерфейс совпадает с BrowserPool (search / search_results).
+    """
+
+    # Текст результата содержит заголовок и фрагмент аннотации — по нему QueryPlanner распределяет патенты
+    titled_results = True
+
+    def __init__(self, max_workers=10, rate_per_host=5.0, burst=None, base_url=PATENTS_URL, metrics=None,
+                 controller=None):
+        self.base_url = base_url
+        self._fetcher = AsyncFetcher(
+            max_connections=max_workers, rate_per_host=rate_per_host, burst=burst,
+            metrics=metrics, call_name="patent_search", controller=controller,
+        )
+
+    async def __aenter__(self):
+        await self._fetcher.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._fetcher.__aexit__(*exc)
+
+    async def search_results(self, url):
+        response = await self._fetcher.fetch(xhr_query_url(url, self.base_url))
+        # Ошибка загрузки — не пустой результат: её нельзя кэшировать как «патентов нет»
+        if response.text is None or response.status != 200:
+            raise FetchError(response.error or f"HTTP {response.status}")
+        try:
+            return parse_results(json.loads(response.text))
+        except (ValueError, AttributeError) as e:
+            raise FetchError(f"BadResponse: {e}") from e
+
+    async def search(self, url):
+        return [number for number, _ in await self.search_results(url)]
@@ -0,0 +1,207 @@
+"""
+Запуск этапов обработки в одном процессе.
+Этапы образуют граф по таблицам, которые они читают и пишут; таблицы передаются
+между этапами в памяти, модули (pandas, torch, модель) загружаются один раз.
+
+Пример: python pipeline.py --input data/Test.csv --steps csv_split,proj_1,proj_2 --no-persist
+"""
+import argparse
+import contextlib
+import importlib
+import json
+import subprocess
+import sys
+import time
+from graphlib import TopologicalSorter
+
+import datastore
+import metrics
+
+# (модуль, подпись, входные таблицы, выходные таблицы)
+STEPS = [
+    ("csv_split", "File Splitting", [], ["CAS"]),
+    ("proj_1", "Retrieve CAS Information", ["CAS"], ["Synonyms"]),
+    ("proj_2", "Patent Search", ["Synonyms"], ["Patents"]),
+    ("proj_3", "Annotations and Translation", ["Patents"], ["Angl_Abstract"]),
+    ("proj_4", "Scoring", ["Angl_Abstract"], ["Scores"]),
+    ("proj_5", "Final Selection", ["Scores"], ["Best_score"]),
+    ("filter_by_accuracy", "Filter by Accuracy", ["Best_score"], ["Filtered_score", "Final"]),
+    ("info", "Visualization", ["Filtered_score"], []),
+]
+# Окно matplotlib должно работать в главном потоке своего процесса
+SUBPROCESS_STEPS = {"info"}
+# Таблицы, которые пишутся на диск и без сохранения промежуточных результатов
+PERSISTENT_TABLES = {"Filtered_score", "Final"}
+RESUMABLE_STEPS = {"proj_2", "proj_3"}
+# Этапы с журналом ошибок (failures.py) и режимом --retry-failures
+RETRYABLE_STEPS = {"proj_1", "proj_2", "proj_3"}
+# Этапы, которые в потоковом режиме выполняются вместе (см. streaming.py)
+STREAMABLE_STEPS = ["proj_1", "proj_2", "proj_3", "proj_4"]
+
+
+def order_steps(names):
+    """Упорядочивает выбранные этапы по зависимостям между их таблицами."""
+    known = {step[0] for step in STEPS}
+    unknown = [name for name in names if name not in known]
+    if unknown:
+        raise ValueError(f"Неизвестные этапы: {', '.join(unknown)}")
+    producers = {table: step[0] for step in STEPS for table in step[3]}
+    graph = {
+        name: {producers[table] for table in inputs if producers.get(table) in names}
+        for name, _, inputs, _ in STEPS
+        if name in names
+    }
+    return list(TopologicalSorter(graph).static_order())
+
+
+def step_args(name, file_path=None, threshold=None, resume=False, retry_failures=False):
+    """Аргументы командной строки, которые этап ожидает в sys.argv."""
+    if name == "csv_split" and file_path:
+        return [file_path]
+    if name == "filter_by_accuracy" and threshold is not None:
+        return [str(threshold)]
+    args = []
+    if name in RESUMABLE_STEPS and resume:
+        args.append("--resume")
+    if name in RETRYABLE_STEPS and retry_failures:
+        args.append("--retry-failures")
+    return args
+
+
+@contextlib.contextmanager
+def step_argv(name, args):
+    saved = sys.argv
+    sys.argv = [f"{name}.py", *args]
+    try:
+        yield
+    finally:
+        sys.argv = saved
+
+
+def run_step(name, args):
+    if name in SUBPROCESS_STEPS:
+        proc = subprocess.Popen(
+            [sys.executable, f"{name}.py", *args], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
+        )
+        for line in proc.stdout:
+            print(line.rstrip())
+        if proc.wait() != 0:
+            raise RuntimeError(f"{name}.py завершился с кодом {proc.returncode}")
+        return
+    module = importlib.import_module(name)
+    with step_argv(name, args):
+        module.run_steps()
+
+
+def group_streamed(names):
+    """
+    Заменяет цепочку выбранных потоковых этапов, идущих подряд в STREAMABLE_STEPS
+    (например, proj_2 и proj_3), одним этапом "stream" на месте первого из них.
+    Этапы вне цепочки выполняются обычным образом: с --steps proj_1,proj_3 этапу proj_3
+    нужна таблица Patents, а не строки Synonyms из proj_1.
+    """
+    positions = sorted(STREAMABLE_STEPS.index(name) for name in names if name in STREAMABLE_STEPS)
+    runs = []
+    for position in positions:
+        if runs and runs[-1][-1] == position - 1:
+            runs[-1].append(position)
+        else:
+            runs.append([position])
+    longest = max(runs, key=len, default=[])
+    if len(longest) < 2:
+        return names, []
+    streamed = [STREAMABLE_STEPS[position] for position in longest]
+    grouped = [name for name in names if name not in streamed[1:]]
+    grouped[grouped.index(streamed[0])] = "stream"
+    return grouped, streamed
+
+
+def run_pipeline(names, file_path=None, threshold=None, resume=False, persist=True, stream=False, retry_failures=False):
+    """
+    Выполняет этапы в порядке зависимостей. Таблицы передаются между этапами в памяти;
+    с persist=False на диск пишутся только итоговые таблицы. Таблицы, которые
+    не создаются выбранными этапами, читаются с диска. При ошибке этапа
+    следующие этапы не запускаются. С stream=True этапы proj_1–proj_4 выполняются
+    одновременно, строки передаются между ними пакетами. С retry_failures=True сетевые этапы
+    повторяют только записи своих журналов ошибок; в потоковом режиме так работает proj_1,
+    а proj_2 и proj_3 повторяют строки с ошибками, которые не попали в контрольные точки.
+    Возвращает [(этап, секунды, успех)].
+    """
+    labels = {step[0]: step[1] for step in STEPS}
+    # Этапы в отдельном процессе читают таблицы с диска
+    keep = PERSISTENT_TABLES | {table for step in STEPS if step[0] in SUBPROCESS_STEPS for table in step[2]}
+    datastore.use_memory(persist, keep)
+    timings = []
+    try:
+        steps = order_steps(names)
+        ordered, streamed = group_streamed(steps) if stream else (steps, [])
+        labels["stream"] = "Streaming: " + ", ".join(labels[name] for name in streamed)
+        separate = [name for name in ordered if name in STREAMABLE_STEPS]
+        if stream and separate:
+            print(f"Без потокового режима (не идут подряд в {', '.join(STREAMABLE_STEPS)}): {', '.join(separate)}")
+        # Начало запуска в файле метрик: GUI сбрасывает по нему сводку этапов
+        metrics.emit("run", None, steps=steps)
+        for name in ordered:
+            print(f"▶️ {labels[name]}...")
+            started = time.perf_counter()
+            stages = streamed if name == "stream" else [name]
+            for stage in stages:
+                metrics.get(stage)
+            try:
+                if name == "stream":
+                    import streaming
+                    streaming.run_stream(streamed, resume, retry_failures=retry_failures)
+                else:
+                    run_step(name, step_args(name, file_path, threshold, resume, retry_failures))
+            except (Exception, SystemExit) as e:
+                for stage in stages:
+                    metrics.finish(stage, "failed")
+                timings.append((name, time.perf_counter() - started, False))
+                print(f"❗ {labels[name]}: ошибка {e!r}, следующие этапы не запускаются")
+                break
+            for stage in stages:
+                metrics.finish(stage)
+            timings.append((name, time.perf_counter() - started, True))
+        else:
+            print("✔ All steps completed")
+    finally:
+        datastore.release_memory()
+    print("; ".join(f"{name}: {seconds:.1f} с" for name, seconds, _ in timings))
+    return timings
+
+
+def main(argv=None):
+    all_steps = [step[0] for step in STEPS]
+    parser = argparse.ArgumentParser(description="Запуск этапов обработки без GUI")
+    parser.add_argument("--steps", default=",".join(s for s in all_steps if s not in SUBPROCESS_STEPS),
+                        help=f"этапы через запятую: {', '.join(all_steps)}")
+    parser.add_argument("--input", help="входной CSV для csv_split")
+    parser.add_argument("--threshold", type=float, help="порог для filter_by_accuracy (по умолчанию из config.json)")
+    parser.add_argument("--resume", action="store_true", help="продолжить прерванные этапы")
+    parser.add_argument("--no-persist", action="store_true", help="не сохранять промежуточные таблицы на диск")
+    parser.add_argument("--stream", action="store_true", help="потоковый режим для proj_1–proj_4")
+    parser.add_argument("--retry-failures", action="store_true",
+                        help="повторить только ошибки из журналов proj_1–proj_3")
+    parser.add_argument("--list", action="store_true", help="показать этапы и выйти")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, label, inputs, outputs in STEPS:
+            print(f"{name:20} {label:30} {', '.join(inputs) or '-'} → {', '.join(outputs) or '-'}")
+        return 0
+
+    threshold = args.threshold
+    if threshold is None:
+        with open("config.json", "r", encoding="utf-8") as file:
+            threshold = json.load(file).get("accuracy_threshold")
+    names = [name.strip() for name in args.steps.split(",") if name.strip()]
+    unknown = [name for name in names if name not in all_steps]
+    if unknown:
+        parser.error(f"неизвестные этапы: {', '.join(unknown)}")
+    timings = run_pipeline(names, args.input, threshold, args.resume, not args.no_persist, args.stream,
+                           args.retry_failures)
+    return 0 if timings and all(ok for _, _, ok in timings) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
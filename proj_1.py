@@ -1,64 +1,260 @@
 import pandas as pd
-import requests
 import json
-from bs4 import BeautifulSoup
+import sys
+from lxml import etree, html as lxml_html
 from tqdm import tqdm
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import json
+import metrics
+from async_fetch import fetch_pages
+from concurrency import shared_controller
+from failures import FailureLedger, error_class
+from cache_store import CacheStore, DEFAULT_CACHE_PATH, is_stale
+from datastore import read_table, write_table
+from html_archive import HtmlArchive, DEFAULT_ARCHIVE_DIR
+
+CHEMBK_URL = "https://www.chembk.com/en/chem/"
+
+
+def parse_chemical_page(html):
+    """Извлекает название и синонимы из страницы chembk (BeautifulSoup, "chembk_parser": "bs4")."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+
+    name = ''
+    synonyms = ''
+
+    table = soup.find('table', class_='table')
+    if table:
+        for row in table.find_all('tr'):
+            cols = row.find_all('td')
+            if len(cols) >= 2:
+                key = cols[0].get_text(strip=True)
+                value = cols[1]
+                if key == 'Name':
+                    name = value.get_text(strip=True)
+                elif key == 'Synonyms':
+                    synonyms_raw = value.decode_contents()
+                    parts = BeautifulSoup(synonyms_raw, 'html.parser').stripped_strings
+                    synonyms = ", ".join(parts)
+
+    return name, synonyms
+
+
+_UTF8_PARSER = lxml_html.HTMLParser(encoding="utf-8")
+_INFO_TABLE = etree.XPath("//table[contains(concat(' ', normalize-space(@class), ' '), ' table ')]")
+_ROWS = etree.XPath(".//tr")
+_CELLS = etree.XPath(".//td")
+_TEXTS = etree.XPath(".//text()", smart_strings=False)
+
+
+def _stripped_strings(element):
+    return [text.strip() for text in _TEXTS(element) if text.strip()]
+
+
+def parse_chemical_page_lxml(html):
+    """То же, что parse_chemical_page, но на lxml: разбор на C и без повторного разбора ячейки синонимов."""
+    if not html or not html.strip():
+        return '', ''
+    tables = _INFO_TABLE(lxml_html.document_fromstring(html.encode("utf-8"), parser=_UTF8_PARSER))
+
+    name = ''
+    synonyms = ''
+    if tables:
+        for row in _ROWS(tables[0]):
+            cols = _CELLS(row)
+            if len(cols) >= 2:
+                key = "".join(_stripped_strings(cols[0]))
+                if key == 'Name':
+                    name = "".join(_stripped_strings(cols[1]))
+                elif key == 'Synonyms':
+                    synonyms = ", ".join(_stripped_strings(cols[1]))
+
+    return name, synonyms
+
+
+PAGE_PARSERS = {"bs4": parse_chemical_page, "lxml": parse_chemical_page_lxml}
+
+
+def get_chemical_info(cas_numbers, base_url=CHEMBK_URL, max_workers=10, rate_per_host=5.0, burst=None,
+                      stage_metrics=None, controller=None, on_error=None,
+                      parse_page=parse_chemical_page_lxml, archive=None):
+    """
+    Загружает страницы chembk для списка CAS-номеров и возвращает кортежи (CAS, Name, Synonyms).
+    Для CAS-номеров, которых нет на сайте, Name и Synonyms пустые; при ошибке загрузки — None,
+    а ошибка передаётся в on_error(CAS, класс ошибки, текст).
+    Загруженные страницы сохраняются в archive (HtmlArchive), если он задан.
+    """
+    on_error = on_error or (lambda *args: None)
+    urls = [f"{base_url}{cas}" for cas in cas_numbers]
+    with tqdm(total=len(urls), desc="Обработка CAS-номеров") as bar:
+        pages = fetch_pages(
+            urls,
+            on_done=lambda _: bar.update(1),
+            max_connections=max_workers,
+            rate_per_host=rate_per_host,
+            burst=burst,
+            metrics=stage_metrics,
+            call_name="chembk",
+            controller=controller,
+        )
+
+    if archive is not None:
+        archive.add_many(
+            (cas, page.url, page.text) for cas, page in zip(cas_numbers, pages)
+            if page.text is not None and page.status < 400
+        )
+
+    results = []
+    for cas_number, page in zip(cas_numbers, pages):
+        if page.status == 404:
+            results.append((cas_number, '', ''))
+        elif page.text is None or page.status >= 400:
+            # print(f"Ошибка для {cas_number}: {page.error}")
+            error = page.error or f"HTTP {page.status}"
+            on_error(cas_number, error_class(error), error)
+            results.append((cas_number, None, None))
+        else:
+            try:
+                results.append((cas_number, *parse_page(page.text)))
+            except Exception as e:
+                on_error(cas_number, error_class(e), e)
+                results.append((cas_number, None, None))
+    return results
+
+
+class SynonymLookup:
+    """
+    Этап поиска названия и синонимов по CAS-номерам: сначала кэш, затем chembk.
+    process() обрабатывает любую часть таблицы, поэтому этап работает и целиком, и потоково.
+    С retry_failures=True с сайта загружаются только CAS-номера из журнала ошибок
+    и ещё не встречавшиеся (без записи в кэше), остальные берутся из кэша. С reparse=True сеть не используется: страницы берутся
+    из архива (html_archive.py) и разбираются заново, кэш обновляется результатами разбора.
+    """
+
+    def __init__(self, config, refresh_stale=False, retry_failures=False, reparse=False):
+        self.max_workers = config.get("max_workers")
+        self.ttl_days = config.get("cas_cache_ttl_days", 30)
+        self.negative_ttl_days = config.get("cas_negative_ttl_days", 7)
+        self.refresh_stale = refresh_stale or config.get("cas_cache_mode") == "refresh_stale"
+        self.base_url = config.get("chembk_base_url", CHEMBK_URL)
+        self.rate_per_host = config.get("rate_limit_per_host", 5.0)
+        self.rate_burst = config.get("rate_limit_burst")
+        self.cache = CacheStore(config.get("cache_path", DEFAULT_CACHE_PATH), table="cas")
+        self.ledger = FailureLedger("proj_1", config.get("cache_path", DEFAULT_CACHE_PATH))
+        self.retry_only = set(self.ledger.units()) if retry_failures else None
+        # lxml быстрее, но сверен с BeautifulSoup только на синтетических страницах; переключать после
+        # python -m bench.parse --archive data/html_archive без расхождений
+        self.parse_page = PAGE_PARSERS[config.get("chembk_parser", "bs4")]
+        # Пустой "html_archive_dir" отключает сохранение страниц
+        archive_dir = config.get("html_archive_dir", DEFAULT_ARCHIVE_DIR)
+        self.reparse = reparse
+        self.archive = HtmlArchive(archive_dir or DEFAULT_ARCHIVE_DIR) if archive_dir or reparse else None
+        self.metrics = metrics.get("proj_1")
+        # Число одновременных запросов к chembk подбирается по ответам сайта (concurrency.py)
+        self.controller = shared_controller(config)
+
+    def process(self, df):
+        rows = len(df)
+        unique_cas = df['CAS'].dropna().unique()
+
+        # Кэш: без --refresh-stale запрашиваются только ни разу не виденные CAS-номера,
+        # с ним — ещё и записи старше TTL (для «пустых» ответов TTL короче)
+        cached = self.cache.get_many(unique_cas)
+        failed = []
+        if self.reparse:
+            results = self.parse_archived(unique_cas, failed)
+        else:
+            to_fetch = [
+                cas for cas in unique_cas
+                if str(cas) not in cached
+                or (self.refresh_stale and is_stale(cached[str(cas)], self.ttl_days, self.negative_ttl_days))
+            ]
+            if self.retry_only is not None:
+                # Устаревшие записи кэша не обновляются, а новые CAS-номера без записи в кэше загружаются
+                to_fetch = [cas for cas in to_fetch if str(cas) in self.retry_only or str(cas) not in cached]
+            print(f"Кэш CAS: {len(unique_cas) - len(to_fetch)} из {len(unique_cas)} найдено, запрашиваем {len(to_fetch)}")
+            self.metrics.cache(len(unique_cas) - len(to_fetch), len(to_fetch))
+
+            results = get_chemical_info(
+                to_fetch, self.base_url, self.max_workers, self.rate_per_host, self.rate_burst,
+                self.metrics, self.controller, lambda *failure: failed.append(failure),
+                self.parse_page, self.archive,
+            )
+        self.ledger.record_many(failed)
+
+        # Ошибки сети (None) не кэшируются, чтобы повторить запрос при следующем запуске
+        self.cache.put_many(
+            (cas, {"name": name, "synonyms": synonyms}, not name and not synonyms)
+            for cas, name, synonyms in results
+            if name is not None
+        )
+        # Для CAS-номеров, которые не запрашивались или не загрузились, берём значение из кэша
+        fetched = {cas for cas, name, _ in results if name is not None}
+        self.ledger.resolve_many(fetched)
+        results = [r for r in results if r[0] in fetched]
+        for cas in unique_cas:
+            entry = cached.get(str(cas))
+            if cas not in fetched and entry is not None:
+                results.append((cas, entry.value["name"], entry.value["synonyms"]))
+
+        result_df = pd.DataFrame(results, columns=['CAS', 'Name', 'Synonyms'])
+
+        df = df.drop(columns=['Name', 'Synonyms'], errors='ignore')
+        df = df.merge(result_df, on='CAS', how='left')
+        df = df[~((df['Name'].isna() | (df['Name'] == '')) & (df['Synonyms'].isna() | (df['Synonyms'] == '')))]
+        # Синонимы хранятся списком, а не строкой через запятую
+        df['Synonyms'] = df['Synonyms'].map(
+            lambda value: [s.strip() for s in value.split(",") if s.strip()] if isinstance(value, str) else []
+        )
+        self.metrics.add_items(rows)
+        return df
+
+    def parse_archived(self, unique_cas, failed):
+        """Разбирает сохранённые страницы; CAS-номера без страницы в архиве берутся из кэша."""
+        pages = self.archive.get_many(unique_cas)
+        print(f"Архив страниц: {len(pages)} из {len(unique_cas)} CAS-номеров, разбор без обращения к сети")
+        self.metrics.cache(len(pages), len(unique_cas) - len(pages))
+        results = []
+        with self.metrics.timed("parse"):
+            for cas in unique_cas:
+                html = pages.get(str(cas))
+                if html is None:
+                    continue
+                try:
+                    results.append((cas, *self.parse_page(html)))
+                except Exception as e:
+                    failed.append((cas, error_class(e), e))
+        return results
+
+    def report(self):
+        return self.ledger.report()
+
+    def close(self):
+        if self.archive is not None:
+            self.archive.close()
+        self.ledger.close()
+        self.cache.close()
+
 
 def run_steps():
     with open("config.json", "r", encoding="utf-8") as file:
             config = json.load(file)
-            max_workers_ = config.get("max_workers")
-            # print(max_workers_)
-
-    def get_chemical_info(cas_number):
-        url = f"https://www.chembk.com/en/chem/{cas_number}"
-        headers = {
-            "User-Agent": "Mozilla/5.0"
-        }
-        try:
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            name = ''
-            synonyms = ''
-
-            table = soup.find('table', class_='table')
-            if table:
-                for row in table.find_all('tr'):
-                    cols = row.find_all('td')
-                    if len(cols) >= 2:
-                        key = cols[0].get_text(strip=True)
-                        value = cols[1]
-                        if key == 'Name':
-                            name = value.get_text(strip=True)
-                        elif key == 'Synonyms':
-                            synonyms_raw = value.decode_contents()
-                            parts = BeautifulSoup(synonyms_raw, 'html.parser').stripped_strings
-                            synonyms = ", ".join(parts)
-
-            return cas_number, name, synonyms
-        except Exception as e:
-            # print(f"Ошибка для {cas_number}: {e}")
-            return cas_number, None, None
-
-    df = pd.read_csv("data/CAS.csv", sep=";", encoding="utf-8", on_bad_lines='skip')
-    unique_cas = df['CAS'].dropna().unique()
-    results = []
-    with ThreadPoolExecutor(max_workers=max_workers_) as executor:
-        futures = {executor.submit(get_chemical_info, cas): cas for cas in unique_cas}
-        for future in tqdm(as_completed(futures), total=len(futures), desc="Обработка CAS-номеров"):
-            results.append(future.result())
-
-    result_df = pd.DataFrame(results, columns=['CAS', 'Name', 'Synonyms'])
-
-    df = df.drop(columns=['Name', 'Synonyms'], errors='ignore')
-    df = df.merge(result_df, on='CAS', how='left')
-    df = df[~((df['Name'].isna() | (df['Name'] == '')) & (df['Synonyms'].isna() | (df['Synonyms'] == '')))]
-    df.to_csv("data/Synonyms.csv", sep=";", encoding="utf-8", index=False)
-    print("✔ Файл Synonyms.csv успешно сохранен!")
+
+    df = read_table("CAS")
+    stage = SynonymLookup(
+        config,
+        refresh_stale="--refresh-stale" in sys.argv,
+        retry_failures="--retry-failures" in sys.argv,
+        reparse="--reparse" in sys.argv,
+    )
+    df = stage.process(df)
+    print(stage.report())
+    stage.close()
+    if stage.controller is not None and stage.controller.report():
+        print(f"Параллельность: {stage.controller.report()}")
+    write_table(df, "Synonyms")
+    metrics.finish("proj_1")
+    print("✔ Файл Synonyms успешно сохранен!")
 
 if __name__ == '__main__':
     run_steps()
\ No newline at end of file
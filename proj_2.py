@@ -1,112 +1,343 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
-from bs4 import BeautifulSoup
 from tqdm import tqdm
 import pandas as pd
+import metrics
+import asyncio
 import json
 import re
-import json
-def run_steps():
-    with open("config.json", "r", encoding="utf-8") as file:
-            config = json.load(file)
-            max_workers_ = config.get("max_workers")
-            # print(max_workers_)
+import sys
+from patents_xhr import XhrSearch, PATENTS_URL
+from concurrency import shared_controller
+from failures import FailureLedger, error_class
+from cache_store import CacheStore, DEFAULT_CACHE_PATH, is_stale
+from query_planner import QueryPlanner
+from datastore import read_table, write_table, patch_rows
+from checkpoint import StageCheckpoint
+
+SEARCH_URL = "https://patents.google.com/?q="
+
+
+def generate_link(query, num=None):
+    """Генерирует ссылку на Google Patents по поисковому запросу."""
+    link = f"{SEARCH_URL}{query.replace(' ', '+')}&oq={query.replace(' ', '+')}"
+    return f"{link}&num={num}" if num and num > 10 else link
 
-    def generate_queries(cas, name, synonyms):
-        synonyms = synonyms[:5]
-        with open("config.json", "r", encoding="utf-8") as file:
-            config = json.load(file)
-            first_part_terms = config.get("first_part_terms", [])
-        second_part_terms = list(filter(None, [name] + synonyms))
-        return [f"({first}) AND ({second})" for first in first_part_terms for second in second_part_terms]
 
-    def generate_links(queries):
-        """Генерирует ссылки на Google Patents по заданным поисковым запросам."""
-        base_url = "https://patents.google.com/?q="
-        return [f"{base_url}{query.replace(' ', '+')}&oq={query.replace(' ', '+')}" for query in queries]
+def search_backend_class(config):
+    """
+    Класс бэкенда поиска по настройке "patent_search_backend":
+    "browser" — рендеринг страницы в Chromium, "xhr" — JSON-эндпоинт без браузера.
+    """
+    if config.get("patent_search_backend", "browser") == "xhr":
+        return XhrSearch
+    from browser_pool import BrowserPool
+    return BrowserPool
 
-    def scrape_single_url(url):
-        from playwright.sync_api import sync_playwright
-        import re
 
-        try:
-            with sync_playwright() as p:
-                browser = p.chromium.launch(headless=True)
-                page = browser.new_page()
-                page.goto(url, timeout=60000)
-                page.wait_for_selector("h4.metadata.style-scope.search-result-item", timeout=10000)
+def make_search_backend(config, stage_metrics=None):
+    """Создаёт бэкенд поиска, выбранный в config.json (см. search_backend_class)."""
+    max_workers = config.get("max_workers") or 10
+    backend_class = search_backend_class(config)
+    if backend_class is XhrSearch:
+        return XhrSearch(
+            max_workers,
+            config.get("rate_limit_per_host", 5.0),
+            config.get("rate_limit_burst"),
+            config.get("patents_base_url", PATENTS_URL),
+            stage_metrics,
+            shared_controller(config),
+        )
 
-                blocks = page.locator("h4.metadata.style-scope.search-result-item").all_text_contents()
+    browsers = config.get("browser_count", 1)
+    return backend_class(browsers, -(-max_workers // browsers), metrics=stage_metrics)
 
-                patent_regex = re.compile(r'\b[A-Z]{2}[0-9]{6,}[A-Z0-9]*\b')
+
+async def scrape_urls(urls, backend, on_error=None):
+    """
+    Собирает номера патентов по списку ссылок Google Patents через открытый бэкенд поиска.
+    Возвращает список результатов в том же порядке, что и `urls`; при ошибке поиска
+    результат ссылки пустой, а ошибка передаётся в on_error(ссылка, класс ошибки, текст).
+    """
+    with tqdm(total=len(urls), desc="Выбираем патенты:") as bar:
+        async def scrape_single_url(url):
+            try:
+                result = await backend.search(url)
+            except Exception as e:
+                # print(f"[!] Ошибка при скрапинге {url!r}: {e}")
                 result = []
-                for block in blocks:
-                    found = patent_regex.findall(block)
-                    if found:
-                        result.append(found[0])
-                browser.close()
-                return result
-        except Exception as e:
-            # print(f"[!] Ошибка при скрапинге {url!r}: {e}")
-            return []
+                if on_error:
+                    on_error(url, error_class(e), e)
+            bar.update(1)
+            return result
+
+        return await asyncio.gather(*(scrape_single_url(url) for url in urls))
+
+
+async def search_planned(groups, backend, config, on_error=None):
+    """
+    Выполняет группы запросов пакетами через QueryPlanner на открытом бэкенде поиска. Группа — это
+    (term, {синоним: ссылка}) для синонимов одного продукта, чтобы патенты не приписывались чужим продуктам.
+    Возвращает словарь {ссылка: номера патентов}, множество ссылок с точным результатом
+    (только их можно кэшировать) и число выполненных поисковых запросов. Ошибки передаются в on_error(ссылка, класс ошибки, текст) для каждой ссылки неудачного пакета.
+    """
+    planner = QueryPlanner(
+        backend,
+        generate_link,
+        config.get("max_query_url_length", 2000),
+        config.get("max_synonyms_per_query", 6),
+        config.get("results_per_query", 10),
+    )
+    with tqdm(total=len(groups), desc="Выбираем патенты:") as bar:
+        async def search_group(term, urls):
+            def batch_failed(synonyms, error):
+                if on_error:
+                    for synonym in synonyms:
+                        on_error(urls[synonym], error_class(error), error)
+
+            found, certain = await planner.search(term, list(urls), on_error=batch_failed)
+            bar.update(1)
+            return (
+                {urls[synonym]: patents for synonym, patents in found.items()},
+                {urls[synonym] for synonym in certain},
+            )
+
+        results = {}
+        exact = set()
+        for found, certain in await asyncio.gather(*(search_group(term, urls) for term, urls in groups)):
+            results.update(found)
+            exact.update(certain)
+        return results, exact, planner.requests
+
+
+def get_valid_first_word(sentence):
+    """
+    Возвращает первое слово, если оно состоит только из цифр и заглавных латинских букв.
+    Иначе возвращает None.
+    """
+    words = sentence.split()
+    if not words:
+        return None
+
+    first_word = words[0]
+    if re.fullmatch(r"[A-Z0-9]+", first_word):
+        return first_word
+    else:
+        return None
+
 
+def get_valid_first_word_for_list(list):
+    ans = []
+    for sentence in list:
+        ans.append(get_valid_first_word(sentence))
+    return ans
 
-    from concurrent.futures import ThreadPoolExecutor
 
-    def process_urls(url_list, row_number):
-        patents = []
-        with ThreadPoolExecutor(max_workers=max_workers_) as executor:
-            results = list(executor.map(scrape_single_url, url_list))
-            for res in results:
-                patents.extend(res)
-        return patents
+def remove_duplicates_and_none(items):
+    """
+    Убирает из списка все дубликаты и None.
+    """
+    return list(dict.fromkeys(item for item in items if item is not None))
 
 
+class PatentSearch:
+    """
+    Этап поиска патентов: запросы «термин AND синоним» для каждой строки, кэш запросов,
+    планировщик и построчные контрольные точки. process() обрабатывает любую часть таблицы.
+    Ссылки, поиск по которым завершился ошибкой, не кэшируются и попадают в журнал ошибок;
+    retry_failures() повторяет только их.
+    """
 
-    def get_valid_first_word(sentence):
+    def __init__(self, config, resume=False):
+        self.config = config
+        self.first_part_terms = config.get("first_part_terms", [])
+        # Запрос → (первая часть, вторая часть); нужен планировщику для объединения синонимов
+        self.query_parts = {}
+        self.cache = CacheStore(config.get("cache_path", DEFAULT_CACHE_PATH), table="queries")
+        self.ttl_days = config.get("query_cache_ttl_days", 30)
+        self.negative_ttl_days = config.get("query_cache_negative_ttl_days", 1)
+        self.stats = {"all": 0, "unique": 0, "scraped": 0}
+        # Результат строки сохраняется сразу после обработки её пакета: после сбоя или при
+        # добавлении строк во входной файл заново ищутся только новые и изменённые строки
+        self.checkpoint = StageCheckpoint(
+            "proj_2",
+            {"first_part_terms": self.first_part_terms},
+            config.get("cache_path", DEFAULT_CACHE_PATH),
+            resume=resume,
+        )
+        self.checkpoint_rows = config.get("checkpoint_rows", 100)
+        self.ledger = FailureLedger("proj_2", config.get("cache_path", DEFAULT_CACHE_PATH))
+        self.failed_urls = set()
+        self.metrics = metrics.get("proj_2")
+        # Бэкенд поиска (браузеры Chromium или HTTP-сессия) открывается при первом поиске
+        # в собственном цикле событий этапа и закрывается в close(), а не на каждую часть строк
+        self._loop = None
+        self._backend = None
+        # Планировщику нужен текст результатов с заголовками, иначе патенты не распределить по синонимам
+        self.use_planner = bool(config.get("query_planner", False))
+        if self.use_planner and not search_backend_class(config).titled_results:
+            self.use_planner = False
+            print(
+                "❗ query_planner работает только с \"patent_search_backend\": \"xhr\" — в результатах "
+                "браузера нет заголовков; запросы выполняются по одному"
+            )
+        # Результаты, распределённые планировщиком по совпадениям в тексте, хранятся отдельно от точных:
+        # повторный запуск берёт их из кэша, а с выключенным планировщиком они не используются
+        self.planned_cache = (
+            CacheStore(config.get("cache_path", DEFAULT_CACHE_PATH), table="planned_queries")
+            if self.use_planner else None
+        )
+
+    def _search_backend(self):
+        if self._backend is None:
+            self._loop = asyncio.new_event_loop()
+            backend = make_search_backend(self.config, self.metrics)
+            self._loop.run_until_complete(backend.__aenter__())
+            self._backend = backend
+        return self._backend
+
+    def generate_queries(self, cas, name, synonyms):
+        synonyms = synonyms[:5]
+        second_part_terms = list(filter(None, [name] + synonyms))
+        queries = []
+        for first in self.first_part_terms:
+            for second in second_part_terms:
+                query = f"({first}) AND ({second})"
+                self.query_parts[query] = (first, second)
+                queries.append(query)
+        return queries
+
+    def search_rows(self, rows):
         """
-        Возвращает первое слово, если оно состоит только из цифр и заглавных латинских букв.
-        Иначе возвращает None.
+        Ищет патенты для части строк. Запросы дедуплицируются; каждый уникальный запрос
+        загружается не больше одного раза и сохраняется в кэше «ссылка → номера патентов».
         """
-        words = sentence.split()
-        if not words:
-            return None
-
-        first_word = words[0]
-        if re.fullmatch(r"[A-Z0-9]+", first_word):
-            return first_word
-        else:
-            return None
-        
-    def get_valid_first_word_for_list(list):
-        ans = []
-        for sentence in list:
-            ans.append(get_valid_first_word(sentence))
-        return ans
-
-    def remove_duplicates_and_none(items):
+        config = self.config
+        all_urls = [url for urls in rows["url"] for url in urls]
+        unique_urls = list(dict.fromkeys(all_urls))
+        cached = self.cache.get_many(unique_urls)
+        if self.planned_cache is not None:
+            cached.update(self.planned_cache.get_many([url for url in unique_urls if url not in cached]))
+        to_scrape = [
+            url for url in unique_urls
+            if url not in cached or is_stale(cached[url], self.ttl_days, self.negative_ttl_days)
+        ]
+
+        scraped = {}
+        failed = {}
+        backend = self._search_backend() if to_scrape else None
+
+        def on_error(url, cls, message):
+            failed.setdefault(url, (cls, message))
+
+        if to_scrape and self.use_planner:
+            # Каждая незагруженная ссылка попадает в группу первой строки, где она встретилась
+            pending = set(to_scrape)
+            groups = []
+            for queries in rows["query"]:
+                by_term = {}
+                for query in queries:
+                    url = generate_link(query)
+                    if url in pending:
+                        pending.discard(url)
+                        term, synonym = self.query_parts[query]
+                        by_term.setdefault(term, {})[synonym] = url
+                groups.extend(by_term.items())
+            scraped, certain, requests_made = self._loop.run_until_complete(
+                search_planned(groups, backend, config, on_error)
+            )
+            print(f"Планировщик: {requests_made} поисковых запросов вместо {len(to_scrape)}")
+        elif to_scrape:
+            scraped = dict(zip(to_scrape, self._loop.run_until_complete(scrape_urls(to_scrape, backend, on_error))))
+            certain = set(scraped)
+        # В кэш «ссылка → патенты» попадают только результаты, точно соответствующие ссылке,
+        # распределённые планировщиком — в planned_queries до получения точного результата
+        done = {url: patents for url, patents in scraped.items() if url not in failed}
+        self.cache.put_many((url, patents, not patents) for url, patents in done.items() if url in certain)
+        if self.planned_cache is not None:
+            self.planned_cache.put_many((url, patents, not patents) for url, patents in done.items() if url not in certain)
+            self.planned_cache.delete_many([url for url in done if url in certain])
+        self.ledger.record_many((url, cls, message) for url, (cls, message) in failed.items())
+        self.ledger.resolve_many(url for url in scraped if url not in failed)
+        self.failed_urls.update(failed)
+        results = {url: entry.value for url, entry in cached.items()}
+        results.update(scraped)
+        rows["patents"] = [[patent for url in urls for patent in results[url]] for urls in rows["url"]]
+
+        self.stats["all"] += len(all_urls)
+        self.stats["unique"] += len(unique_urls)
+        self.stats["scraped"] += len(to_scrape)
+        self.metrics.cache(len(all_urls) - len(to_scrape), len(to_scrape))
+        self.metrics.add_items(len(rows))
+        # rows.to_csv("data/Patents_do.csv", sep=";", encoding="utf-8", index=False)
+        rows['patents'] = rows['patents'].apply(get_valid_first_word_for_list)
+        rows['patents'] = rows['patents'].apply(remove_duplicates_and_none)
+        return rows
+
+    def process(self, df):
+        df = df.copy()
+        df["query"] = [
+            self.generate_queries(cas, name, synonyms)
+            for cas, name, synonyms in zip(df["CAS"], df["Name"], df["Synonyms"])
+        ]
+        df["url"] = [[generate_link(query) for query in queries] for queries in df["query"]]
+        # Строки с ошибками поиска должны повторяться при следующем запуске — они не сохраняются;
+        # пустой результат без ошибок сохраняется, как и любой другой
+        return self.checkpoint.run(
+            df, ["CAS", "Name", "Synonyms"], ["patents"], self.search_rows, self.checkpoint_rows,
+            is_complete=lambda row: not self.failed_urls.intersection(row["url"]),
+        )
+
+    def retry_failures(self, df):
         """
-        Убирает из списка все дубликаты и None.
+        Повторяет поиск только для строк сохранённой таблицы Patents, в которых есть ссылки
+        из журнала ошибок, и подставляет новые результаты в эти строки.
         """
-        return list({item for item in items if item is not None})
-
-    # //////////////////////
-    df = pd.read_csv("data/Synonyms.csv", sep=";", encoding="utf-8", on_bad_lines='skip')
-    df["Synonyms"] = df["Synonyms"].apply(lambda x: x.split(",") if isinstance(x, str) else [])
-    df["query"] = df.apply(lambda row: generate_queries(row["CAS"], row["Name"], row["Synonyms"]), axis=1)
-    df["url"] = df["query"].apply(generate_links)
-
-    tqdm.pandas(desc="Выбираем патенты:")
-    df["patents"] = df.progress_apply(lambda row: process_urls(row["url"], row.name + 1), axis=1)
-    # df.to_csv("data/Patents_do.csv", sep=";", encoding="utf-8", index=False)
-    df['patents'] = df['patents'].apply(get_valid_first_word_for_list)
-    df['patents'] = df['patents'].apply(remove_duplicates_and_none)
-    df.to_csv("data/Patents.csv", sep=";", encoding="utf-8", index=False)
+        failed = set(self.ledger.units())
+        positions = [i for i, urls in enumerate(df["url"]) if failed.intersection(urls)]
+        print(f"Журнал ошибок proj_2: {len(failed)} ссылок, затронуто строк: {len(positions)} из {len(df)}")
+        if not positions:
+            return df
+        patched = self.process(df.iloc[positions])
+        return patch_rows(df, positions, patched, ["patents"])
+
+    def report(self):
+        hits = self.stats["all"] - self.stats["scraped"]
+        hit_rate = hits / self.stats["all"] if self.stats["all"] else 0.0
+        # Запросы считаются только для строк, которых не было в контрольных точках
+        report = (
+            f"{self.checkpoint.report()}\n"
+            f"Запросов: {self.stats['all']}, уникальных: {self.stats['unique']}, загружено: {self.stats['scraped']}, "
+            f"из кэша и дубликатов: {hits} ({hit_rate:.1%})"
+        )
+        controller = shared_controller(self.config)
+        if controller is not None:
+            report += f"\nПараллельность: {controller.report()}"
+        return f"{report}\n{self.ledger.report()}"
+
+    def close(self):
+        if self._backend is not None:
+            self._loop.run_until_complete(self._backend.__aexit__(None, None, None))
+            self._loop.close()
+            self._backend = self._loop = None
+        self.ledger.close()
+        self.checkpoint.close()
+        self.cache.close()
+        if self.planned_cache is not None:
+            self.planned_cache.close()
+
+
+def run_steps():
+    with open("config.json", "r", encoding="utf-8") as file:
+            config = json.load(file)
+
+    stage = PatentSearch(config, resume="--resume" in sys.argv)
+    if "--retry-failures" in sys.argv:
+        df = stage.retry_failures(read_table("Patents"))
+    else:
+        df = stage.process(read_table("Synonyms"))
+    print(stage.report())
+    stage.close()
+    write_table(df, "Patents")
+    metrics.finish("proj_2")
 
     print("\n✔ Выбор патентов завершён")
 
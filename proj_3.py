@@ -1,133 +1,328 @@
 import pandas as pd
-import ast
 import sys
 import time
 import random
-import concurrent.futures
 from tqdm import tqdm
-from google_patent_scraper import scraper_class
-from deep_translator import GoogleTranslator
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import metrics
+from cache_store import CacheStore, DEFAULT_CACHE_PATH
+from translation import BatchTranslator
+from scheduler import PipelineScheduler
+from concurrency import shared_controller, THROTTLE_STATUSES
+from failures import FailureLedger, error_class
+from patents_xhr import PATENTS_URL
+from datastore import read_table, write_table, patch_rows
+from checkpoint import StageCheckpoint
 import urllib.error
 import http.client
 import json
 
-def run_steps():
-    with open("config.json", "r", encoding="utf-8") as file:
-            config = json.load(file)
-            max_workers_ = config.get("max_workers")
-            # print(max_workers_)
+NOT_FOUND = "Аннотация не найдена"
+FETCH_ERRORS = {"Ошибка получения аннотации", "Ошибка после всех попыток"}
+
+# Загрузчик google_patent_scraper импортируется при первой загрузке аннотаций:
+# если все аннотации уже в хранилище, он не нужен
+scraper_class = None
+
+
+def load_scraper_class():
+    global scraper_class
+    if scraper_class is None:
+        from google_patent_scraper import scraper_class
+    return scraper_class
+
+
+def is_throttled(error):
+    """Ошибка загрузки, по которой видно, что сервер перегружен или ограничивает запросы."""
+    if isinstance(error, urllib.error.HTTPError):
+        return error.code in THROTTLE_STATUSES
+    if isinstance(error, urllib.error.URLError):
+        return isinstance(error.reason, TimeoutError)
+    return isinstance(error, TimeoutError)
+
+
+def get_patent_abstracts(patent_list, max_retries=5, stage_metrics=None, controller=None, on_error=None):
+    """
+    Получает аннотации для списка патентов с обработкой ошибок.
+    Время каждой попытки загрузки пакета отмечается в stage_metrics как вызов "patent_pages".
+    С `controller` каждая попытка занимает слот хоста Google Patents и сообщает ему результат.
+    scraper_class сам перехватывает HTTP-ошибки отдельных патентов и оставляет их статус
+    в scrape_status: 404 означает, что патента нет, остальные статусы повторяются
+    в следующей попытке только для этих патентов. Если загрузить патенты так и не удалось,
+    вызывается on_error(патенты, класс ошибки, текст).
+    """
+    on_error = on_error or (lambda *args: None)
+    if not patent_list or not isinstance(patent_list, list):
+        return {patent: "Ошибка получения аннотации" for patent in patent_list}
 
-    def safe_eval(x):
-        """Безопасное преобразование строки в список"""
+    todo = list(dict.fromkeys(patent for patent in patent_list if patent))
+    if not todo:
+        return {patent: "Аннотация не найдена (пустой список)" for patent in patent_list}
+
+    results = {patent: NOT_FOUND for patent in patent_list if not patent}
+    errors = {}
+    for attempt in range(max_retries):
+        scraper = load_scraper_class()(return_abstract=True)
+        for patent in todo:
+            scraper.add_patents(patent)
+        host_limit = controller.host(PATENTS_URL) if controller is not None else None
+        if host_limit is not None:
+            host_limit.acquire()
+        started = time.perf_counter()
         try:
-            return ast.literal_eval(x) if isinstance(x, str) and x.startswith("[") else []
-        except (SyntaxError, ValueError):
-            return []
+            scraper.scrape_all_patents()
+            errors = {}
+            for patent in todo:
+                status = scraper.scrape_status.get(patent, "Success")
+                if status == "Success":
+                    results[patent] = scraper.parsed_patents.get(patent, {}).get("abstract_text", NOT_FOUND)
+                elif status == 404:
+                    results[patent] = NOT_FOUND
+                else:
+                    errors[patent] = f"HTTP {status}"
+            seconds = time.perf_counter() - started
+            if stage_metrics is not None:
+                stage_metrics.call("patent_pages", seconds, ok=not errors)
+            if host_limit is not None:
+                throttled = any(
+                    scraper.scrape_status.get(patent) in THROTTLE_STATUSES for patent in errors
+                )
+                # Время пакета делится на число патентов, чтобы пакеты разного размера были сравнимы
+                host_limit.record(seconds if throttled else seconds / len(todo), throttled=throttled)
+            todo = list(errors)
+            if not todo:
+                return {patent: results.get(patent, NOT_FOUND) for patent in patent_list}
+            if stage_metrics is not None:
+                stage_metrics.retry("patent_pages")
+        except (urllib.error.HTTPError, urllib.error.URLError, http.client.IncompleteRead) as e:
+            # print(f" Ошибка загрузки аннотаций (попытка {attempt+1}/{max_retries}): {e}")
+            if stage_metrics is not None:
+                stage_metrics.call("patent_pages", time.perf_counter() - started, ok=False)
+                stage_metrics.retry("patent_pages")
+            if host_limit is not None and is_throttled(e):
+                host_limit.record(time.perf_counter() - started, throttled=True)
+            errors = {patent: e for patent in todo}
+        except Exception as e:
+            # print(f" Критическая ошибка получения аннотаций: {e}")
+            if stage_metrics is not None:
+                stage_metrics.call("patent_pages", time.perf_counter() - started, ok=False)
+            on_error(todo, error_class(e), e)
+            results.update((patent, "Ошибка получения аннотации") for patent in todo)
+            return {patent: results[patent] for patent in patent_list}
+        finally:
+            if host_limit is not None:
+                host_limit.release()
+        if attempt + 1 < max_retries:
+            time.sleep(random.uniform(1, 3))  # Ожидание перед повтором
+
+    for patent, error in errors.items():
+        on_error([patent], error_class(error), error)
+        results[patent] = "Ошибка после всех попыток"
+    return {patent: results[patent] for patent in patent_list}
+
+
+class AbstractTranslation:
+    """
+    Этап получения аннотаций: хранилище «патент → аннотация и перевод», конвейер
+    загрузка → перевод и построчные контрольные точки. process() обрабатывает любую часть таблицы.
+    Патенты, аннотацию которых не удалось загрузить или перевести, попадают в журнал ошибок;
+    retry_failures() повторяет только их.
+    """
+
+    def __init__(self, config, resume=False):
+        max_workers_ = config.get("max_workers")
+        cache_path = config.get("cache_path", DEFAULT_CACHE_PATH)
+        self.batch_size = config.get("abstract_batch_size", 25)
+        self.checkpoint_rows = config.get("checkpoint_rows", 100)
+        # Хранилище «номер патента → исходная аннотация и перевод» общее для всех строк и запусков
+        self.store = CacheStore(cache_path, table="abstracts", compress=True)
+        self.records = {}
+        self.failed_patents = set()
+        self.ledger = FailureLedger("proj_3", cache_path)
+        self.metrics = metrics.get("proj_3")
+        # Один конвейер: перевод пакета начинается сразу после его загрузки;
+        # параллельность загрузки и перевода ограничена отдельно
+        self.translator = BatchTranslator(
+            CacheStore(cache_path, table="translations"), max_workers=1, metrics=self.metrics
+        )
+        # С адаптивной параллельностью потоков загрузки хватает на верхний предел,
+        # а сколько из них одновременно обращаются к сайту, решает контроллер
+        self.controller = shared_controller(config)
+        fetch_workers = config.get("fetch_workers", max_workers_)
+        if self.controller is not None:
+            fetch_workers = max(fetch_workers or 1, self.controller.ceiling)
+        self.scheduler = PipelineScheduler(
+            fetch_workers,
+            config.get("translate_workers", max_workers_),
+            "Загрузка аннотаций",
+            "Перевод аннотаций",
+        )
+        self.checkpoint = StageCheckpoint("proj_3", path=cache_path, resume=resume)
+
+    def fetch_abstracts(self, batch):
+        """
+        Фаза загрузки: аннотации из хранилища берутся как есть, отсутствующие
+        загружаются одним scraper_class на пакет. Ошибки загрузки в хранилище не попадают.
+        """
+        records = self.records
+        missing = [patent for patent in batch if patent not in records]
+        failed = []
 
-    def get_patent_abstracts(patent_list, max_retries=5):
+        def on_error(patents, cls, message):
+            failed.extend((patent, cls, message) for patent in patents)
+
+        fetched = get_patent_abstracts(missing, 5, self.metrics, self.controller, on_error) if missing else {}
+        self.ledger.record_many(failed)
+        # У ненайденной аннотации переводить нечего: запись сразу окончательная
+        loaded = {
+            patent: {"original": text, "english": text if text == NOT_FOUND else None}
+            for patent, text in fetched.items()
+            if text not in FETCH_ERRORS
+        }
+        self.store.put_many((patent, record, record["original"] == NOT_FOUND) for patent, record in loaded.items())
+        abstracts = {patent: records[patent] for patent in batch if patent in records}
+        abstracts.update((patent, loaded.get(patent, text)) for patent, text in fetched.items())
+        return abstracts
+
+    def translate_abstracts(self, abstracts):
         """
-        Получает аннотации для списка патентов с обработкой ошибок.
+        Фаза перевода: переводит аннотации пакета, у которых ещё нет английской версии,
+        и сохраняет перевод в хранилище. Возвращает {патент: английский текст или текст ошибки}.
         """
-        if not patent_list or not isinstance(patent_list, list):
-            return {patent: "Ошибка получения аннотации" for patent in patent_list}
-
-        scraper = scraper_class(return_abstract=True)
-
-        for patent in patent_list:
-            if patent:
-                scraper.add_patents(patent)
-
-        if not scraper.list_of_patents:
-            return {patent: "Аннотация не найдена (пустой список)" for patent in patent_list}
-
-        for attempt in range(max_retries):
-            try:
-                scraper.scrape_all_patents()
-                return {
-                    patent: scraper.parsed_patents.get(patent, {}).get("abstract_text", "Аннотация не найдена")
-                    for patent in patent_list
-                }
-            except (urllib.error.HTTPError, urllib.error.URLError, http.client.IncompleteRead) as e:
-                # print(f" Ошибка загрузки аннотаций (попытка {attempt+1}/{max_retries}): {e}")
-                time.sleep(random.uniform(1, 3))  # Ожидание перед повтором
-            except Exception as e:
-                # print(f" Критическая ошибка получения аннотаций: {e}")
-                return {patent: "Ошибка получения аннотации" for patent in patent_list}
-
-        return {patent: "Ошибка после всех попыток" for patent in patent_list}
-
-    def process_patents_dataframe(df, column_name="patents", max_workers=max_workers_):
+        translator = self.translator
+        pending = {
+            patent: record for patent, record in abstracts.items()
+            if isinstance(record, dict) and record["english"] is None and record["original"] != NOT_FOUND
+        }
+        translations = translator.translate_many(record["original"] for record in pending.values())
+        result = {}
+        self.failed_patents.update(p for p, record in pending.items() if record["original"] in translator.failed)
+        for patent, record in abstracts.items():
+            if not isinstance(record, dict):
+                result[patent] = record
+                continue
+            if record["english"] is None:
+                record = dict(record, english=translations.get(record["original"], record["original"]))
+            result[patent] = record["english"]
+        # Неудачные переводы не сохраняются, чтобы повторить их при следующем запуске
+        self.store.put_many(
+            (patent, dict(record, english=result[patent]), record["original"] == NOT_FOUND)
+            for patent, record in pending.items()
+            if record["original"] not in translator.failed
+        )
+        untranslated = [p for p, record in pending.items() if record["original"] in translator.failed]
+        self.ledger.record_many(
+            (patent, error_class(translator.errors.get(pending[patent]["original"])), translator.errors.get(pending[patent]["original"]))
+            for patent in untranslated
+        )
+        self.ledger.resolve_many(
+            patent for patent, record in abstracts.items() if isinstance(record, dict) and patent not in untranslated
+        )
+        return result
+
+    def process_rows(self, rows):
+        """Загружает и переводит аннотации патентов для части строк."""
+        batch_size = self.batch_size
+        unique_patents = list(dict.fromkeys(p for patents in rows["patents"] for p in patents if p))
+        stored = self.store.get_many(unique_patents)
+        self.records = {patent: entry.value for patent, entry in stored.items()}
+        missing = [p for p in unique_patents if p not in stored]
+        untranslated = [
+            p for p, record in self.records.items() if record["english"] is None and record["original"] != NOT_FOUND
+        ]
+        print(f"Патентов: {len(unique_patents)}, в хранилище: {len(stored)}, загружаем: {len(missing)}")
+        self.metrics.cache(len(stored), len(missing))
+
+        jobs = [batch for patents in (missing, untranslated) for batch in
+                (patents[i:i + batch_size] for i in range(0, len(patents), batch_size))]
+        abstracts = {}
+        with tqdm(total=len(jobs), desc="Обработка патентов") as bar:
+            for result in self.scheduler.run(
+                jobs, self.fetch_abstracts, self.translate_abstracts, on_done=lambda _: bar.update(1)
+            ):
+                abstracts.update(result)
+        # Записи без перевода сюда попадают только «не найдено» прежних версий — для них это и есть текст
+        abstracts.update(
+            (p, record["english"] if record["english"] is not None else record["original"])
+            for p, record in self.records.items() if p not in abstracts
+        )
+
+        # Ошибки загрузки остаются в результате как текст ошибки, как и раньше
+        rows["abstracts"] = [
+            {patent: abstracts.get(patent, "Ошибка получения аннотации") for patent in patents}
+            for patents in rows["patents"]
+        ]
+        self.metrics.add_items(len(rows))
+        return rows
+
+    def is_complete(self, row):
+        """Строки с ошибками загрузки или перевода не сохраняются в контрольной точке."""
+        return not any(
+            text in FETCH_ERRORS or text == "Ошибка получения аннотации" or patent in self.failed_patents
+            for patent, text in row["abstracts"].items()
+        )
+
+    def process(self, df):
+        return self.checkpoint.run(df, ["patents"], ["abstracts"], self.process_rows, self.checkpoint_rows, self.is_complete)
+
+    def retry_failures(self, df, previous):
         """
-        Применяет get_patent_abstracts к каждому списку патентов с многопоточной обработкой.
+        Повторяет загрузку и перевод только для строк с патентами из журнала ошибок,
+        а также для строк, список патентов которых изменился с прошлого запуска
+        (например, после proj_2 --retry-failures). Остальные аннотации берутся из
+        сохранённой таблицы previous (Angl_Abstract).
         """
-        def process_row(index_patents):
-            index, patents = index_patents
-            print(f"🔍 Обработка строки {index + 1} из {len(df)}...")
-            if not isinstance(patents, list) or not patents:
-                return {}
-            return get_patent_abstracts(patents)
-
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers_) as executor:
-            try:
-                results = list(tqdm(
-                    executor.map(process_row, zip(df.index, df[column_name])),
-                    total=len(df),
-                    desc="Обработка патентов"
-                ))
-            except Exception as e:
-                # print(f" Ошибка в многопоточном обработчике патентов: {e}")
-                results = [{}] * len(df)  # Возвращаем пустые данные, чтобы продолжить работу
-
-        df["abstracts"] = results
-        return df
-
-    def translate_text(text):
-        """Перевод текста с обработкой ошибок"""
-        try:
-            if not text or text == "Аннотация не найдена":
-                return text
-            translated = GoogleTranslator(source="auto", target="en").translate(text)
-            return translated if translated else text
-        except Exception as e:
-            # print(f" Ошибка перевода: {e}")
-            return text
+        if len(previous) != len(df):
+            print("Журнал ошибок proj_3: таблица Angl_Abstract не соответствует Patents, обрабатываем все строки")
+            return self.process(df)
+        failed = set(self.ledger.units())
+        positions = [
+            i for i, (patents, before) in enumerate(zip(df["patents"], previous["patents"]))
+            if failed.intersection(patents) or list(patents) != list(before)
+        ]
+        print(f"Журнал ошибок proj_3: {len(failed)} патентов, затронуто строк: {len(positions)} из {len(df)}")
+        df = df.assign(abstracts=list(previous["abstracts"]))
+        if not positions:
+            return df
+        patched = self.process(df.iloc[positions])
+        return patch_rows(df, positions, patched, ["abstracts"])
 
-    def translate_abstracts(abstract_dict):
-        """Перевод всех аннотаций с обработкой ошибок"""
-        try:
-            with ThreadPoolExecutor(max_workers=max_workers_) as executor:
-                future_to_key = {executor.submit(translate_text, text): key for key, text in abstract_dict.items()}
-                translated_dict = {}
-                for future in as_completed(future_to_key):
-                    key = future_to_key[future]
-                    translated_dict[key] = future.result()
-            return translated_dict
-        except Exception as e:
-            # print(f" Ошибка при переводе аннотаций: {e}")
-            return abstract_dict
+    def report(self):
+        report = f"{self.checkpoint.report()}\n{self.translator.report()}\n{self.scheduler.report()}"
+        if self.controller is not None:
+            report += f"\nПараллельность: {self.controller.report()}"
+        return f"{report}\n{self.ledger.report()}"
 
+    def close(self):
+        self.ledger.close()
+        self.checkpoint.close()
+        self.translator.cache.close()
+        self.store.close()
 
-    # ////////////////////
-    try:
-        df = pd.read_csv("data/Patents.csv", sep=";", encoding="utf-8", on_bad_lines="skip")
-        df["patents"] = df["patents"].apply(safe_eval)
-        process_patents_dataframe(df)
 
-        # output_file = "data/Abstract.csv"
-        # df.to_csv(output_file, sep=";", encoding="utf-8", index=False)
-        # print(f"\n✔ Обработка завершена! Данные сохранены в '{output_file}'.")
+def run_steps():
+    with open("config.json", "r", encoding="utf-8") as file:
+            config = json.load(file)
 
-        tqdm.pandas(desc="Перевод аннотаций")
-        df["abstracts"] = df["abstracts"].progress_apply(translate_abstracts)
+    # ////////////////////
+    try:
+        stage = AbstractTranslation(config, resume="--resume" in sys.argv)
+        if "--retry-failures" in sys.argv:
+            df = stage.retry_failures(read_table("Patents"), read_table("Angl_Abstract"))
+        else:
+            df = stage.process(read_table("Patents"))
+        print(stage.report())
+        stage.close()
 
-        output_file = "data/Angl_Abstract.csv"
-        df.to_csv(output_file, sep=";", encoding="utf-8", index=False)
-        print(f"\n✔ Аннотации получены и переведены! Данные сохранены в '{output_file}'.")
+        write_table(df, "Angl_Abstract")
+        metrics.finish("proj_3")
+        print("\n✔ Аннотации получены и переведены! Данные сохранены в 'Angl_Abstract'.")
 
     except Exception as e:
+        metrics.finish("proj_3", "failed")
         print(f"\n Критическая ошибка обработки файла: {e}")
+        # Ошибка должна дойти до pipeline.py, иначе следующие этапы запустятся на неполных данных
+        raise
     # ////////////////////
 
 if __name__ == '__main__':
-    run_steps()
\ No newline at end of file
+    run_steps()
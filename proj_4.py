@@ -1,92 +1,138 @@
 import pandas as pd
-import ast
-import torch
 import json
 from tqdm import tqdm
-from sentence_transformers import SentenceTransformer, util
 from itertools import chain
-
-def run_steps():
-    def string_to_list(s: str):
-        return [item.strip() for item in s.split(",") if item.strip()]
-
-    def string_to_dict(s: str):
-        try:
-            return ast.literal_eval(s)
-        except (SyntaxError, ValueError):
-            return {}
-
-    def generate_synthesis_phrases(query):
-        return [
-            f"The present invention generally relates to {query} and methods of making {query}.",
-            f"More specifically, the present invention relates to a method for producing {query}.",
-            f"A process for synthesizing {query} is described.",
-            f"The invention provides a method for the preparation of {query}.",
-            f"This patent discloses a synthesis method for {query}."
+import metrics
+from embedding_store import EmbeddingStore, model_key
+from scoring import SimilarityScorer
+from encoder import shared_engine
+from embed_daemon import connect, EmbeddingClient, DEFAULT_SOCKET_PATH
+from score_store import write_scores
+from datastore import read_table, write_table
+
+MODEL_NAME = 'AI-Growth-Lab/PatentSBERTa'
+
+def generate_synthesis_phrases(query):
+    return [
+        f"The present invention generally relates to {query} and methods of making {query}.",
+        f"More specifically, the present invention relates to a method for producing {query}.",
+        f"A process for synthesizing {query} is described.",
+        f"The invention provides a method for the preparation of {query}.",
+        f"This patent discloses a synthesis method for {query}."
+    ]
+
+class SimilarityScoring:
+    """
+    Этап расчёта скоров: эмбеддинги новых текстов дописываются в EmbeddingStore,
+    скоры каждой строки считаются SimilarityScorer. process() обрабатывает любую часть
+    таблицы и накапливает блоки скоров в порядке строк; write_scores() сохраняет их в .npz.
+    Если запущен сервис кодирования (embed_daemon.py) с той же моделью, тексты кодирует он.
+    """
+
+    def __init__(self, config):
+        self.model_name = config.get("embedding_model", MODEL_NAME)
+        self.model_revision = config.get("embedding_model_revision")
+        self.encoding_mode = config.get("encoding_mode", "fp32")
+        self.encoding_processes = config.get("encoding_processes", 1)
+        self.encoding_batch_size = config.get("encoding_batch_size", 64)
+        self.socket_path = config.get("embedding_socket", DEFAULT_SOCKET_PATH)
+        # Эмбеддинги хранятся на диске; кодируются только тексты, которых ещё нет в хранилище,
+        # а модель загружается, только если такие тексты есть
+        variant = self.encoding_mode if self.encoding_mode != "fp32" else None
+        self.store = EmbeddingStore(
+            self.model_name, self.model_revision, dtype=config.get("embedding_dtype", "float32"), variant=variant
+        )
+        self.engine = None
+        self.metrics = metrics.get("proj_4")
+        self.score_blocks = []
+        self.patents_per_row = []
+        self.queries_per_row = []
+
+    def process(self, dataset, show_progress_bar=True):
+        store = self.store
+        dataset = dataset.copy()
+        dataset['querys'] = [
+            [name] + synonyms if pd.notna(name) else synonyms
+            for name, synonyms in zip(dataset['Name'], dataset['Synonyms'])
         ]
 
-    # print("Загрузка данных")
-    dataset = pd.read_csv("data/Angl_Abstract.csv", sep=";", encoding="utf-8", on_bad_lines="skip", engine="python")
-    dataset['Synonyms'] = dataset['Synonyms'].apply(string_to_list)
-    dataset['querys'] = dataset.apply(lambda row: [row['Name']] + row['Synonyms'] if pd.notna(row['Name']) else row['Synonyms'], axis=1)
-    dataset['abstracts'] = dataset['abstracts'].apply(string_to_dict)
-    dataset['score'] = None
-
-    # print("Загрузка модели")
-    model = SentenceTransformer('AI-Growth-Lab/PatentSBERTa')
-
-    # print("Подготовка эмбеддингов")
-
-    all_abstracts = list(set(chain.from_iterable([list(d.values()) for d in dataset['abstracts']])))
-    abstract_embeddings = dict(zip(
-        all_abstracts,
-        model.encode(all_abstracts, convert_to_tensor=True, show_progress_bar=True)
-    ))
-
-    query_embedding_cache = {}
-
-    for query_list in tqdm(dataset["querys"], desc="Запросы"):
-        for q in query_list:
-            if q not in query_embedding_cache:
-                phrases = generate_synthesis_phrases(q)
-                embs = model.encode(phrases, convert_to_tensor=True)
-                query_embedding_cache[q] = embs
+        all_abstracts = list(set(chain.from_iterable([list(d.values()) for d in dataset['abstracts']])))
+        all_queries = list(dict.fromkeys(chain.from_iterable(dataset["querys"])))
+        all_phrases = [phrase for q in all_queries for phrase in generate_synthesis_phrases(q)]
+
+        new_texts = store.missing(all_abstracts + all_phrases)
+        print(f"Эмбеддинги: новых текстов {len(new_texts)} из {len(all_abstracts) + len(all_phrases)}")
+        self.metrics.cache(len(all_abstracts) + len(all_phrases) - len(new_texts), len(new_texts))
+        if new_texts:
+            with self.metrics.timed("encode"):
+                embeddings = self.encode(new_texts, show_progress_bar)
+            store.add(new_texts, embeddings)
+
+        abstract_rows = {a: row for a, row in zip(all_abstracts, store.rows(all_abstracts)) if row >= 0}
+        phrase_rows = store.rows(all_phrases).reshape(-1, 5)
+        query_rows = {q: rows for q, rows in zip(all_queries, phrase_rows) if (rows >= 0).all()}
+        scorer = SimilarityScorer(store.matrix, abstract_rows, query_rows)
+
+        patents_per_row = [list(patents) for patents in dataset["abstracts"]]
+        queries_per_row = [list(dict.fromkeys(queries)) for queries in dataset["querys"]]
+        for abstracts, patents, queries in tqdm(
+            zip(dataset["abstracts"], patents_per_row, queries_per_row), total=len(dataset),
+            desc="Обработка записей", disable=not show_progress_bar,
+        ):
+            self.score_blocks.append(scorer.score_matrix([abstracts[p] for p in patents], queries))
+        self.patents_per_row.extend(patents_per_row)
+        self.queries_per_row.extend(queries_per_row)
+        self.metrics.add_items(len(dataset))
+        return dataset
+
+    def local_engine(self):
+        return shared_engine(
+            self.model_name, self.model_revision, self.encoding_mode,
+            self.encoding_processes, self.encoding_batch_size,
+        )
+
+    def encode(self, texts, show_progress_bar=True):
+        """Кодирует тексты сервисом кодирования, если он запущен, иначе моделью в этом процессе."""
+        if self.engine is None:
+            variant = self.encoding_mode if self.encoding_mode != "fp32" else None
+            self.engine = connect(self.socket_path, model_key(self.model_name, self.model_revision, variant))
+            if self.engine is not None:
+                print(f"Эмбеддинги: кодирует сервис {self.socket_path}")
+            else:
+                self.engine = self.local_engine()
+        if isinstance(self.engine, EmbeddingClient):
+            try:
+                return self.engine.encode(texts, show_progress_bar)
+            except OSError as e:
+                print(f"Сервис кодирования недоступен ({e}), загружаем модель в этом процессе")
+                self.engine.close()
+                self.engine = self.local_engine()
+        return self.engine.encode(texts, show_progress_bar)
+
+    def write_scores(self, path="data/Scores.npz"):
+        write_scores(path, self.score_blocks, self.patents_per_row, self.queries_per_row)
+
+    def close(self):
+        if self.engine is not None:
+            self.engine.close()
+        self.store.close()
 
-    def calculate_synthesis_score(query, abstract):
-        if not abstract:
-            return [0.0] * 5 
 
-        abstract_emb = abstract_embeddings.get(abstract)
-        synthesis_embs = query_embedding_cache.get(query)
-
-        if abstract_emb is None or synthesis_embs is None:
-            return [0.0] * 5
-
-        similarities = util.pytorch_cos_sim(abstract_emb, synthesis_embs)
-        return similarities.squeeze().tolist()
-
-
-    # print("Расчет скоров")
-    all_scores = []
-
-    for i in tqdm(range(len(dataset)), desc="Обработка записей"):
-        res_dict = {}
-        queries = dataset.loc[i, "querys"]
-        patents = dataset.loc[i, "abstracts"]
-        for patent_id, abstract in patents.items():
-            inner_scores = {}
-            for q in queries:
-                score = calculate_synthesis_score(q, abstract)
-                inner_scores[q] = score
-            res_dict[patent_id] = inner_scores
-        all_scores.append(res_dict)
+def run_steps():
+    with open("config.json", "r", encoding="utf-8") as file:
+            config = json.load(file)
 
-    dataset["score"] = all_scores
+    # print("Загрузка данных")
+    dataset = read_table("Angl_Abstract")
+    stage = SimilarityScoring(config)
+    dataset = stage.process(dataset)
+    stage.close()
 
-    dataset["score"] = dataset["score"].apply(json.dumps)
-    output_file = "data/Scores.csv"
-    dataset.to_csv(output_file, sep=";", encoding="utf-8", index=False)
-    print(f"\n✔ Готово! Данные сохранены в: {output_file}")
+    # Скоры пишутся в бинарный Scores.npz (плоский массив + смещения строк), таблица Scores хранит остальные столбцы
+    stage.write_scores("data/Scores.npz")
+    write_table(dataset, "Scores")
+    metrics.finish("proj_4")
+    print("\n✔ Готово! Данные сохранены в: Scores и data/Scores.npz")
 
 if __name__ == '__main__':
-    run_steps()
\ No newline at end of file
+    run_steps()
@@ -1,89 +1,53 @@
 import pandas as pd
-import torch
-import ast
-import json
-from tqdm.auto import tqdm
+import numpy as np
+from tqdm import tqdm
+import metrics
+from score_store import ScoreArtifact
+from datastore import read_table, write_table
 
 def run_steps():
-    # Enable tqdm support for pandas
-    tqdm.pandas()
-
-    def convert_to_dict(data_str):
-        if isinstance(data_str, str):
-            data_str = data_str.replace("tensor(", "torch.tensor(")
-            return eval(data_str)
-        return data_str
-
-    def func(data):
-        merged_tensors = {}
-
-        for key, values in data.items():
-            tensors = []
-            for v in values.values():
-                if isinstance(v, torch.Tensor):
-                    tensors.append(v)
-                elif isinstance(v, list):
-                    tensors.append(torch.tensor(v))
-                elif isinstance(v, float):
-                    tensors.append(torch.tensor([v]))
-                else:
-                    raise ValueError(f"Неожданный тип: {type(v)} = {v}")
-            merged_tensors[key] = torch.cat(tensors, dim=0)
-
-        list_dict = {key: value.cpu().flatten().tolist() for key, value in merged_tensors.items()}
-        return list_dict
-
-    def sort_dict(zxc):
-        for key in zxc:
-            zxc[key].sort()
-        return zxc
-
-    def top1(zxc):
-        for key in zxc:
-            zxc[key] = zxc[key][-1]
-        return zxc
-
-    def get_top_5(data):
-        """
-        Функция принимает словарь и возвращает 5 наибольших значений с указанием патентов.
-        :param data: Словарь, где ключи — патенты, а значения — числа.
-        :return: Словарь с 5 наибольшими значениями.
-        """
-        return dict(sorted(data.items(), key=lambda item: item[1], reverse=True)[:5])
-
-    def get_top_1(data):
-        if not data:
-            return None
-        return list(sorted(data.items(), key=lambda item: item[1], reverse=True)[:1])[0][1]
-
+    stage_metrics = metrics.get("proj_5")
     # Load dataset
-    dataset = pd.read_csv("data/Scores.csv", sep=";", encoding="utf-8")
-    # Parse JSON-encoded score column
-
-    dataset['score'] = dataset['score'].apply(json.loads)
-    # Convert string representations to actual dicts
-
-    dataset['score'] = dataset['score'].apply(convert_to_dict)
-    # Apply processing functions with progress bars
-
-    dataset['new_score'] = dataset['score'].progress_apply(func)
-    dataset['new_score'] = dataset['new_score'].apply(sort_dict)
-    dataset['top_1_score'] = dataset['new_score'].progress_apply(top1)
-    dataset['top_5_patents'] = dataset['top_1_score'].progress_apply(get_top_5)
-    dataset['best_score'] = dataset['top_5_patents'].progress_apply(get_top_1)
-
-    # Serialize columns back to JSON strings
-
-    dataset['score'] = dataset['score'].apply(json.dumps)
-    dataset['new_score'] = dataset['new_score'].apply(json.dumps)
-    dataset['top_1_score'] = dataset['top_1_score'].apply(json.dumps)
-    dataset['top_5_patents'] = dataset['top_5_patents'].apply(json.dumps)
-
-    # Save to CSV
-    output_file = "data/Best_score.csv"
-    dataset.to_csv(output_file, sep=";", encoding="utf-8", index=False)
-
-    print(f"\n✔ Обработка завершена! Данные сохранены в '{output_file}'.")
+    dataset = read_table("Scores")
+    # Скоры читаются из бинарного Scores.npz, строки в том же порядке, что и в таблице Scores
+    scores = ScoreArtifact("data/Scores.npz")
+    if len(scores) != len(dataset):
+        raise ValueError(f"Scores.npz содержит {len(scores)} строк, а таблица Scores — {len(dataset)}")
+
+    # Максимум по всем запросам и фразам для каждого патента и 5 лучших патентов каждой строки
+    patent_rows, patent_max = scores.patent_max()
+    top_rows, top_patents, top_values = scores.top_k(5)
+    top_bounds = np.searchsorted(top_rows, np.arange(len(scores) + 1))
+
+    score_col, new_score_col, top_1_col, top_5_col, best_col = [], [], [], [], []
+    for i in tqdm(range(len(scores)), desc="Отбор патентов"):
+        patents = scores.row_patents(i)
+        block = scores.row_block(i)
+        start, end = scores.patent_offsets[i], scores.patent_offsets[i + 1]
+        valid = ~np.isnan(patent_max[start:end])
+        sorted_scores = np.sort(block.reshape(len(patents), -1), axis=1).tolist()
+
+        row_top = slice(top_bounds[i], top_bounds[i + 1])
+        top_5 = dict(zip(scores.patent_ids[top_patents[row_top]].tolist(), top_values[row_top].tolist()))
+
+        score_col.append(scores.nested(i))
+        new_score_col.append({p: s for p, s, ok in zip(patents, sorted_scores, valid) if ok})
+        top_1_col.append({p: s for p, s, ok in zip(patents, patent_max[start:end].tolist(), valid) if ok})
+        top_5_col.append(top_5)
+        best_col.append(next(iter(top_5.values()), None))
+
+    dataset['score'] = score_col
+    dataset['new_score'] = new_score_col
+    dataset['top_1_score'] = top_1_col
+    dataset['top_5_patents'] = top_5_col
+    dataset['best_score'] = best_col
+
+    # Словари сохраняются как map-столбцы (в CSV — как JSON)
+    write_table(dataset, "Best_score")
+    stage_metrics.add_items(len(dataset))
+    metrics.finish("proj_5")
+
+    print("\n✔ Обработка завершена! Данные сохранены в 'Best_score'.")
 
 if __name__ == '__main__':
-    run_steps()
\ No newline at end of file
+    run_steps()
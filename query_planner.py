@@ -0,0 +1,125 @@
+import asyncio
+import re
+
+WORD_REGEX = re.compile(r"\w+")
+
+
+def batch_query(term, synonyms):
+    """Объединяет синонимы в один запрос: (term) AND ((syn1) OR (syn2) ...)."""
+    if len(synonyms) == 1:
+        return f"({term}) AND ({synonyms[0]})"
+    return f"({term}) AND (" + " OR ".join(f"({s})" for s in synonyms) + ")"
+
+
+def plan_batches(term, synonyms, link_builder, max_url_length=2000, max_synonyms=6):
+    """
+    Жадно упаковывает синонимы в пакеты так, чтобы ссылка на запрос
+    не превышала `max_url_length`, а в пакете было не больше `max_synonyms` синонимов.
+    """
+    batches = []
+    current = []
+    for synonym in synonyms:
+        candidate = current + [synonym]
+        too_long = len(link_builder(batch_query(term, candidate), len(candidate))) > max_url_length
+        if current and (too_long or len(candidate) > max_synonyms):
+            batches.append(current)
+            current = [synonym]
+        else:
+            current = candidate
+    if current:
+        batches.append(current)
+    return batches
+
+
+def matches(synonym, text):
+    """
+    Синоним считается найденным, если все его слова встречаются в тексте результата
+    целыми словами: короткие части вроде "na" или "1" не совпадают с частью другого слова.
+    """
+    words = WORD_REGEX.findall(synonym.lower())
+    text_words = set(WORD_REGEX.findall(text.lower()))
+    return bool(words) and all(word in text_words for word in words)
+
+
+class QueryPlanner:
+    """
+    Выполняет поиск пакетами синонимов вместо отдельного запроса на каждый синоним
+    и распределяет найденные патенты обратно по синонимам.
+
+    Если пакет вернул полную страницу (`results_per_query` на синоним), часть результатов
+    могла не поместиться — такой пакет делится пополам и запрашивается заново.
+
+    Патент приписывается только тем синонимам, которые найдены в тексте результата.
+    Если хотя бы один результат пакета не совпал ни с одним синонимом, распределение
+    неоднозначно: он мог принадлежать любому синониму, поэтому все синонимы пакета
+    запрашиваются по отдельности. Точным считается только результат отдельного запроса
+    синонима: он совпадает с тем, что вернула бы его собственная ссылка.
+    """
+
+    def __init__(self, backend, link_builder, max_url_length=2000, max_synonyms=6, results_per_query=10):
+        self.backend = backend
+        self.link_builder = link_builder
+        self.max_url_length = max_url_length
+        self.max_synonyms = max_synonyms
+        self.results_per_query = results_per_query
+        self.requests = 0
+
+    async def _search_batch(self, term, batch):
+        """Возвращает {синоним: (номера патентов, результат точный)}."""
+        budget = self.results_per_query * len(batch)
+        self.requests += 1
+        results = await self.backend.search_results(self.link_builder(batch_query(term, batch), budget))
+        if len(results) >= budget and len(batch) > 1:
+            middle = len(batch) // 2
+            left, right = await asyncio.gather(
+                self._search_batch(term, batch[:middle]),
+                self._search_batch(term, batch[middle:]),
+            )
+            return {**left, **right}
+
+        if len(batch) == 1:
+            return {batch[0]: ([number for number, _ in results], True)}
+
+        found = {synonym: [] for synonym in batch}
+        for number, text in results:
+            matched = [synonym for synonym in batch if matches(synonym, text)]
+            if not matched:
+                # Патент без совпадений мог быть результатом любого синонима пакета
+                result = {}
+                for single in await asyncio.gather(*(self._search_batch(term, [synonym]) for synonym in batch)):
+                    result.update(single)
+                return result
+            for synonym in matched:
+                found[synonym].append(number)
+        # Отдельный запрос синонима вернул бы только первую страницу — results_per_query результатов
+        return {synonym: (patents[:self.results_per_query], False) for synonym, patents in found.items()}
+
+    async def search(self, term, synonyms, on_batch_done=None, on_error=None):
+        """
+        Возвращает {синоним: [номера патентов]} для запросов вида (term) AND (синоним)
+        и множество синонимов, результат которых точный (его можно кэшировать как результат
+        отдельного запроса). При ошибке пакета его синонимы получают пустой список,
+        а on_error(синонимы, исключение) — ошибку.
+        """
+        batches = plan_batches(term, synonyms, self.link_builder, self.max_url_length, self.max_synonyms)
+
+        async def run(batch):
+            try:
+                result = await self._search_batch(term, batch)
+            except Exception as e:
+                # print(f"[!] Ошибка при поиске {batch!r}: {e}")
+                result = {synonym: ([], False) for synonym in batch}
+                if on_error:
+                    on_error(batch, e)
+            if on_batch_done:
+                on_batch_done()
+            return result
+
+        found = {}
+        certain = set()
+        for result in await asyncio.gather(*(run(batch) for batch in batches)):
+            for synonym, (patents, exact) in result.items():
+                found[synonym] = patents
+                if exact:
+                    certain.add(synonym)
+        return found, certain
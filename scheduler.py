@@ -0,0 +1,81 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class PhaseCounter:
+    """Счётчик пропускной способности одной фазы конвейера."""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0
+        self.started = None
+        self.finished = None
+        self._lock = threading.Lock()
+
+    def add(self, items, seconds):
+        with self._lock:
+            now = time.perf_counter()
+            if self.started is None:
+                self.started = now - seconds
+            self.finished = now
+            self.items += items
+            self.busy += seconds
+
+    def report(self):
+        elapsed = (self.finished - self.started) if self.started is not None else 0.0
+        rate = self.items / elapsed if elapsed else 0.0
+        return f"{self.name}: {self.items} шт. за {elapsed:.1f} с ({rate:.1f}/с)"
+
+
+class PipelineScheduler:
+    """
+    Конвейер из двух фаз с отдельными ограничениями параллельности:
+    результат каждой загрузки сразу уходит на обработку второй фазы,
+    не дожидаясь окончания остальных загрузок.
+    """
+
+    def __init__(self, fetch_workers, process_workers, fetch_name="Загрузка", process_name="Обработка"):
+        self.fetch_workers = max(1, fetch_workers or 1)
+        self.process_workers = max(1, process_workers or 1)
+        self.fetch_counter = PhaseCounter(fetch_name)
+        self.process_counter = PhaseCounter(process_name)
+
+    @staticmethod
+    def _timed(func, counter, size):
+        def run(item):
+            start = time.perf_counter()
+            try:
+                return func(item)
+            finally:
+                counter.add(size(item), time.perf_counter() - start)
+        return run
+
+    def run(self, jobs, fetch, process, size=len, on_done=None):
+        """
+        Выполняет fetch(job) для каждого задания и process(результат) для каждого результата.
+        `size` задаёт число элементов в задании для счётчиков. Возвращает список результатов process.
+        """
+        fetch = self._timed(fetch, self.fetch_counter, size)
+        process = self._timed(process, self.process_counter, size)
+        results = []
+        with ThreadPoolExecutor(self.fetch_workers) as fetch_pool, \
+                ThreadPoolExecutor(self.process_workers) as process_pool:
+            fetching = {fetch_pool.submit(fetch, job) for job in jobs}
+            processing = set()
+            while fetching or processing:
+                done, _ = wait(fetching | processing, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in fetching:
+                        fetching.discard(future)
+                        processing.add(process_pool.submit(process, future.result()))
+                    else:
+                        processing.discard(future)
+                        results.append(future.result())
+                        if on_done:
+                            on_done(results[-1])
+        return results
+
+    def report(self):
+        return f"{self.fetch_counter.report()}; {self.process_counter.report()}"
@@ -0,0 +1,99 @@
+import numpy as np
+
+PHRASES_PER_QUERY = 5
+
+
+def write_scores(path, score_blocks, patents_per_row, queries_per_row):
+    """
+    Сохраняет скоры в компактный бинарный файл .npz (без pickle):
+    scores — плоский массив float32 в порядке (строка, патент, запрос, фраза),
+    патенты и запросы — плоские массивы строк, *_offsets — границы строк в них.
+    score_blocks — массивы формы (патенты, запросы, 5) для каждой строки.
+    """
+    patent_counts = np.array([len(p) for p in patents_per_row], dtype=np.int64)
+    query_counts = np.array([len(q) for q in queries_per_row], dtype=np.int64)
+    score_counts = patent_counts * query_counts * PHRASES_PER_QUERY
+    flat = [np.asarray(block, dtype=np.float32).ravel() for block in score_blocks]
+    np.savez(
+        path,
+        scores=np.concatenate(flat) if flat else np.empty(0, dtype=np.float32),
+        patent_ids=np.array([p for patents in patents_per_row for p in patents], dtype=str),
+        queries=np.array([q for queries in queries_per_row for q in queries], dtype=str),
+        patent_offsets=np.concatenate([[0], np.cumsum(patent_counts)]),
+        query_offsets=np.concatenate([[0], np.cumsum(query_counts)]),
+        score_offsets=np.concatenate([[0], np.cumsum(score_counts)]),
+    )
+
+
+class ScoreArtifact:
+    """Чтение файла скоров и векторизованный отбор лучших патентов."""
+
+    def __init__(self, path):
+        with np.load(path, allow_pickle=False) as data:
+            self.scores = data["scores"]
+            self.patent_ids = data["patent_ids"]
+            self.queries = data["queries"]
+            self.patent_offsets = data["patent_offsets"]
+            self.query_offsets = data["query_offsets"]
+            self.score_offsets = data["score_offsets"]
+
+    def __len__(self):
+        return len(self.patent_offsets) - 1
+
+    def row_block(self, i):
+        """Скоры строки в виде массива (патенты, запросы, 5)."""
+        k = self.patent_offsets[i + 1] - self.patent_offsets[i]
+        m = self.query_offsets[i + 1] - self.query_offsets[i]
+        return self.scores[self.score_offsets[i]:self.score_offsets[i + 1]].reshape(k, m, PHRASES_PER_QUERY)
+
+    def row_patents(self, i):
+        return self.patent_ids[self.patent_offsets[i]:self.patent_offsets[i + 1]].tolist()
+
+    def row_queries(self, i):
+        return self.queries[self.query_offsets[i]:self.query_offsets[i + 1]].tolist()
+
+    def nested(self, i):
+        """Скоры строки в прежнем формате {патент: {запрос: [5 чисел]}}."""
+        queries = self.row_queries(i)
+        return {
+            patent: dict(zip(queries, block))
+            for patent, block in zip(self.row_patents(i), self.row_block(i).tolist())
+        }
+
+    def patent_segments(self):
+        """
+        Для каждого патента (по всему файлу): номер строки, начало и длина его
+        отрезка в плоском массиве scores.
+        """
+        patent_rows = np.repeat(np.arange(len(self)), np.diff(self.patent_offsets))
+        per_patent = np.diff(self.query_offsets)[patent_rows] * PHRASES_PER_QUERY
+        starts = self.score_offsets[patent_rows] + (
+            np.arange(len(patent_rows)) - self.patent_offsets[patent_rows]
+        ) * per_patent
+        return patent_rows, starts, per_patent
+
+    def patent_max(self):
+        """Максимальный скор каждого патента по всем запросам и фразам (NaN, если скоров нет)."""
+        patent_rows, starts, lengths = self.patent_segments()
+        result = np.full(len(starts), np.nan, dtype=np.float32)
+        nonempty = lengths > 0
+        if nonempty.any() and self.scores.size:
+            # reduceat по началам непустых отрезков: отрезки патентов идут подряд
+            result[nonempty] = np.maximum.reduceat(self.scores, starts[nonempty])
+        return patent_rows, result
+
+    def top_k(self, k=5):
+        """
+        Лучшие k патентов каждой строки по максимальному скору.
+        Возвращает (номер строки, номер патента в плоском массиве, скор) для отобранных патентов,
+        отсортированные по строке и убыванию скора.
+        """
+        patent_rows, maxima = self.patent_max()
+        valid = ~np.isnan(maxima)
+        index = np.nonzero(valid)[0]
+        order = index[np.lexsort((-maxima[index], patent_rows[index]))]
+        rows = patent_rows[order]
+        row_start = np.searchsorted(rows, rows, side="left")
+        keep = (np.arange(len(order)) - row_start) < k
+        order = order[keep]
+        return patent_rows[order], order, maxima[order]
@@ -0,0 +1,55 @@
+import numpy as np
+
+PHRASES_PER_QUERY = 5
+
+
+def normalize(vectors, eps=1e-12):
+    """L2-нормализация строк (как в sentence_transformers.util.cos_sim)."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, eps)
+
+
+class SimilarityScorer:
+    """
+    Пакетный расчёт косинусной близости аннотаций и фраз синтеза.
+    Для каждой строки все пары (патент, запрос) считаются одним умножением матриц
+    вместо отдельного вызова pytorch_cos_sim на каждую тройку (строка, патент, запрос).
+    """
+
+    def __init__(self, matrix, abstract_rows, phrase_rows):
+        """
+        matrix — матрица эмбеддингов (например, memmap из EmbeddingStore),
+        abstract_rows — {текст аннотации: номер строки матрицы},
+        phrase_rows — {запрос: массив из 5 номеров строк фраз синтеза}.
+        """
+        self.matrix = matrix
+        self.abstract_rows = abstract_rows
+        self.phrase_rows = phrase_rows
+
+    def score_matrix(self, abstracts, queries):
+        """
+        Возвращает массив (число аннотаций, число запросов, 5) со скорами.
+        Пустые аннотации и тексты без эмбеддинга получают нули, как и раньше.
+        """
+        scores = np.zeros((len(abstracts), len(queries), PHRASES_PER_QUERY), dtype=np.float32)
+        a_idx = [i for i, a in enumerate(abstracts) if a and self.abstract_rows.get(a) is not None]
+        q_idx = [j for j, q in enumerate(queries) if self.phrase_rows.get(q) is not None]
+        if not a_idx or not q_idx:
+            return scores
+
+        a_emb = normalize(self.matrix[np.array([self.abstract_rows[abstracts[i]] for i in a_idx])])
+        p_rows = np.concatenate([self.phrase_rows[queries[j]] for j in q_idx])
+        p_emb = normalize(self.matrix[p_rows])
+        similarities = (a_emb @ p_emb.T).reshape(len(a_idx), len(q_idx), PHRASES_PER_QUERY)
+        scores[np.ix_(a_idx, q_idx)] = similarities
+        return scores
+
+    def score_row(self, patents, queries):
+        """Скоры одной строки в прежнем формате {патент: {запрос: [5 чисел]}}."""
+        patent_ids = list(patents)
+        scores = self.score_matrix([patents[p] for p in patent_ids], queries).tolist()
+        return {
+            patent_id: dict(zip(queries, patent_scores))
+            for patent_id, patent_scores in zip(patent_ids, scores)
+        }
@@ -0,0 +1,151 @@
+"""
+Потоковый режим: строки проходят этапы proj_1 → proj_2 → proj_3 → proj_4 пакетами
+через ограниченные очереди asyncio. Каждый этап работает в своём потоке, поэтому
+сетевые этапы и расчёт скоров идут одновременно; когда очередь следующего этапа
+заполнена, предыдущий ждёт (обратное давление), и в памяти не копятся лишние пакеты.
+
+Запуск: python streaming.py [--resume] [--refresh-stale] [--retry-failures] или python pipeline.py --stream
+"""
+import asyncio
+import json
+import sys
+import time
+
+import metrics
+from datastore import read_table, TableWriter
+from scheduler import PhaseCounter
+
+# (этап, входная таблица, выходная таблица)
+STREAM_STEPS = [
+    ("proj_1", "CAS", "Synonyms"),
+    ("proj_2", "Synonyms", "Patents"),
+    ("proj_3", "Patents", "Angl_Abstract"),
+    ("proj_4", "Angl_Abstract", "Scores"),
+]
+
+
+def make_stage(name, config, resume=False, refresh_stale=False, retry_failures=False):
+    if name == "proj_1":
+        from proj_1 import SynonymLookup
+        return SynonymLookup(config, refresh_stale=refresh_stale, retry_failures=retry_failures)
+    if name == "proj_2":
+        from proj_2 import PatentSearch
+        return PatentSearch(config, resume)
+    if name == "proj_3":
+        from proj_3 import AbstractTranslation
+        return AbstractTranslation(config, resume)
+    if name == "proj_4":
+        from proj_4 import SimilarityScoring
+        return SimilarityScoring(config)
+    raise ValueError(f"Этап {name} не поддерживает потоковый режим")
+
+
+async def stream_rows(df, stages, batch_rows=20, queue_size=2, on_output=None):
+    """
+    Пропускает строки df через этапы [(имя, объект с process())] пакетами по batch_rows строк.
+    Между этапами — очереди asyncio.Queue(maxsize=queue_size).
+    on_output(имя этапа, пакет) вызывается для результата каждого этапа в порядке пакетов.
+    Возвращает счётчики этапов (PhaseCounter).
+    """
+    inboxes = [asyncio.Queue(maxsize=queue_size) for _ in stages]
+    done = asyncio.Queue(maxsize=queue_size)
+    outboxes = inboxes[1:] + [done]
+    counters = [PhaseCounter(name) for name, _ in stages]
+
+    async def feed():
+        for start in range(0, len(df), batch_rows):
+            await inboxes[0].put(df.iloc[start:start + batch_rows])
+        await inboxes[0].put(None)
+
+    async def work(index):
+        name, stage = stages[index]
+        while (batch := await inboxes[index].get()) is not None:
+            started = time.perf_counter()
+            result = await asyncio.to_thread(stage.process, batch)
+            counters[index].add(len(batch), time.perf_counter() - started)
+            if on_output is not None:
+                on_output(name, result)
+            # Строки, отброшенные этапом (например, CAS без синонимов), дальше не идут
+            if len(result):
+                await outboxes[index].put(result)
+        await outboxes[index].put(None)
+
+    async def drain():
+        while await done.get() is not None:
+            pass
+
+    tasks = [asyncio.create_task(feed()), *(asyncio.create_task(work(i)) for i in range(len(stages))),
+             asyncio.create_task(drain())]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    return counters
+
+
+def run_stream(names=None, resume=False, refresh_stale=False, retry_failures=False):
+    """
+    Выполняет выбранные этапы из STREAM_STEPS (по умолчанию все) в потоковом режиме.
+    refresh_stale и retry_failures передаются proj_1 так же, как его флаги командной строки;
+    proj_2 и proj_3 в потоке повторяют строки с ошибками через свои контрольные точки.
+    """
+    with open("config.json", "r", encoding="utf-8") as file:
+        config = json.load(file)
+    steps = [step for step in STREAM_STEPS if names is None or step[0] in names]
+    df = read_table(steps[0][1])
+
+    stages = [(name, make_stage(name, config, resume, refresh_stale, retry_failures)) for name, _, _ in steps]
+    writers = {name: TableWriter(output) for name, _, output in steps}
+    started = time.perf_counter()
+    scored = [0]
+    last = steps[-1][0]
+
+    def on_output(name, batch):
+        if not len(batch):
+            return
+        writers[name].write(batch)
+        if name == last:
+            scored[0] += len(batch)
+            print(f"✔ {name}: обработано строк {scored[0]} из {len(df)} за {time.perf_counter() - started:.0f} с")
+
+    try:
+        counters = asyncio.run(stream_rows(
+            df, stages, config.get("stream_batch_rows", 20), config.get("stream_queue_size", 2), on_output
+        ))
+    except BaseException:
+        # Уже записанные пакеты сохраняются, таблицы этапов без результатов не перезаписываются
+        for writer in writers.values():
+            if writer.rows:
+                writer.close()
+        for name, _ in stages:
+            metrics.finish(name, "failed")
+        raise
+    else:
+        for writer in writers.values():
+            writer.close()
+        # Отчёты читают журналы ошибок из SQLite, поэтому они — до закрытия этапов
+        for name, stage in stages:
+            if name == "proj_4":
+                stage.write_scores("data/Scores.npz")
+            if hasattr(stage, "report"):
+                print(stage.report())
+            metrics.finish(name)
+    finally:
+        for _, stage in stages:
+            stage.close()
+    print("; ".join(counter.report() for counter in counters))
+
+
+def run_steps():
+    run_stream(
+        resume="--resume" in sys.argv,
+        refresh_stale="--refresh-stale" in sys.argv,
+        retry_failures="--retry-failures" in sys.argv,
+    )
+    print("\n✔ Потоковая обработка завершена")
+
+
+if __name__ == '__main__':
+    run_steps()
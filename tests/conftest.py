@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Скрипты проекта лежат в корне репозитория и импортируются как модули верхнего уровня
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Пустой рабочий каталог: этапы читают config.json и data/ относительно текущего каталога."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def stub_server():
+    from bench.stubs import StubServer
+
+    with StubServer() as server:
+        yield server
@@ -0,0 +1,90 @@
+import pandas as pd
+
+from checkpoint import StageCheckpoint
+
+
+class Doubler:
+    """process() для StageCheckpoint: запоминает обработанные строки, результат — удвоенное значение строкой."""
+
+    def __init__(self, fail=()):
+        self.seen = []
+        self.fail = set(fail)
+
+    def __call__(self, rows):
+        self.seen.extend(rows["x"])
+        rows["y"] = [str(x * 2) for x in rows["x"]]
+        rows["ok"] = [x not in self.fail for x in rows["x"]]
+        return rows
+
+
+def run(path, df, process, resume=False, settings=None, **kwargs):
+    checkpoint = StageCheckpoint("test", settings or {}, str(path), resume=resume)
+    try:
+        return checkpoint.run(df, ["x"], ["y"], process, **kwargs)
+    finally:
+        checkpoint.close()
+
+
+def test_only_new_rows_are_processed(tmp_path):
+    path = tmp_path / "cache.sqlite"
+    first = Doubler()
+    assert run(path, pd.DataFrame({"x": [1, 2, 3]}), first, chunk_rows=2)["y"].tolist() == ["2", "4", "6"]
+    assert first.seen == [1, 2, 3]
+
+    second = Doubler()
+    result = run(path, pd.DataFrame({"x": [3, 4, 1]}), second)
+    # Порядок строк — как во входной таблице, результаты прошлых запусков подставлены
+    assert result["y"].tolist() == ["6", "8", "2"]
+    assert second.seen == [4]
+
+
+def test_settings_change_invalidates_rows(tmp_path):
+    path = tmp_path / "cache.sqlite"
+    run(path, pd.DataFrame({"x": [1]}), Doubler(), settings={"terms": ["a"]})
+    process = Doubler()
+    run(path, pd.DataFrame({"x": [1]}), process, settings={"terms": ["b"]})
+    assert process.seen == [1]
+
+
+def test_incomplete_rows_are_repeated(tmp_path):
+    path = tmp_path / "cache.sqlite"
+    df = pd.DataFrame({"x": [1, 2]})
+    first = run(path, df, Doubler(fail=[2]), is_complete=lambda row: row["ok"])
+    assert first["y"].tolist() == ["2", "4"]
+
+    second = Doubler()
+    run(path, df, second, is_complete=lambda row: row["ok"])
+    assert second.seen == [2]
+
+
+def test_interrupted_run(tmp_path):
+    path = tmp_path / "cache.sqlite"
+    checkpoint = StageCheckpoint("test", {}, str(path))
+    checkpoint.save({key: {"y": "2"} for key in ["k"]})
+    checkpoint.close()
+
+    # Без resume строки прерванного запуска отбрасываются, с resume — используются
+    resumed = StageCheckpoint("test", {}, str(path), resume=True)
+    assert resumed.load(["k"]) == {"k": {"y": "2"}}
+    resumed.close()
+    fresh = StageCheckpoint("test", {}, str(path))
+    assert fresh.load(["k"]) == {}
+    fresh.close()
+
+
+def test_resume_after_failure(tmp_path):
+    path = tmp_path / "cache.sqlite"
+    df = pd.DataFrame({"x": [1, 2, 3, 4]})
+
+    def crash(rows):
+        if 3 in set(rows["x"]):
+            raise RuntimeError("сбой")
+        return Doubler()(rows)
+
+    try:
+        run(path, df, crash, chunk_rows=2)
+    except RuntimeError:
+        pass
+    process = Doubler()
+    assert run(path, df, process, resume=True, chunk_rows=2)["y"].tolist() == ["2", "4", "6", "8"]
+    assert process.seen == [3, 4]
@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+
+from csv_split import split_name_cas, valid_cas
+
+
+def test_valid_cas_check_digit():
+    cas = pd.Series(["64-17-5", "7732-18-5", "50-00-0", "11138-66-2", "64-17-6", "7732-18-4"])
+    assert valid_cas(cas).tolist() == [True, True, True, True, False, False]
+
+
+def test_valid_cas_format():
+    cas = pd.Series(["6417-5", "1-17-5", "12345678-00-0", "64-17-55", "64 17 5", "", np.nan, None])
+    assert not valid_cas(cas).any()
+
+
+def test_valid_cas_empty():
+    assert valid_cas(pd.Series([], dtype=object)).tolist() == []
+
+
+def test_split_name_cas():
+    values = pd.Series([
+        "Ксантановая камедь, CAS 11138-66-2",
+        "Этанол (CAS 64-17-5)",
+        "Вода CAS: 7732-18-5",
+        "Без номера",
+    ])
+    names, cas = split_name_cas(values)
+    assert names.tolist() == ["Ксантановая камедь", "Этанол", "Вода", "Без номера"]
+    assert cas.tolist()[:3] == ["11138-66-2", "64-17-5", "7732-18-5"]
+    assert pd.isna(cas.iloc[3])
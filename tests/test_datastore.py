@@ -0,0 +1,82 @@
+import json
+
+import pandas as pd
+import pytest
+
+import datastore
+from datastore import TableWriter, patch_rows, read_table, write_table
+
+
+def sample():
+    return pd.DataFrame({
+        "CAS": ["64-17-5", "7732-18-5"],
+        "Name": ["Ethanol", None],
+        "Synonyms": [["ethyl alcohol", "EtOH"], []],
+        "abstracts": [{"US1": "Ethanol, производство"}, {}],
+        "score": [{"US1": {"ethanol": [0.5, 0.25]}}, {}],
+        "best_score": [0.5, float("nan")],
+    })
+
+
+def assert_round_trip(df):
+    expected = sample()
+    assert list(df.columns) == list(expected.columns)
+    assert df["CAS"].tolist() == expected["CAS"].tolist()
+    assert df["Synonyms"].tolist() == expected["Synonyms"].tolist()
+    assert df["abstracts"].tolist() == expected["abstracts"].tolist()
+    assert df["score"].tolist() == expected["score"].tolist()
+    assert df["best_score"].iloc[0] == 0.5 and pd.isna(df["best_score"].iloc[1])
+
+
+@pytest.mark.parametrize("storage_format", ["parquet", "csv"])
+def test_round_trip(workdir, storage_format):
+    (workdir / "config.json").write_text(json.dumps({"storage_format": storage_format}))
+    write_table(sample(), "Best_score")
+    assert (workdir / "data" / f"Best_score.{storage_format}").exists()
+    assert_round_trip(read_table("Best_score"))
+
+
+def test_read_columns(workdir):
+    write_table(sample(), "Best_score")
+    df = read_table("Best_score", columns=["CAS", "abstracts"])
+    assert list(df.columns) == ["CAS", "abstracts"]
+    assert df["abstracts"].tolist() == sample()["abstracts"].tolist()
+
+
+def test_old_csv_is_readable(workdir):
+    # Файлы прежних версий: списки и словари записаны через str()
+    (workdir / "data").mkdir()
+    pd.DataFrame({
+        "CAS": ["64-17-5"],
+        "Synonyms": [str(["ethyl alcohol", "EtOH"])],
+        "abstracts": [str({"US1": "text"})],
+    }).to_csv(workdir / "data" / "Angl_Abstract.csv", sep=";", index=False)
+    df = read_table("Angl_Abstract")
+    assert df["Synonyms"].tolist() == [["ethyl alcohol", "EtOH"]]
+    assert df["abstracts"].tolist() == [{"US1": "text"}]
+
+
+def test_writer_chunks(workdir):
+    with TableWriter("CAS") as writer:
+        writer.write(sample().iloc[:1])
+        writer.write(sample().iloc[1:])
+    assert writer.rows == 2
+    assert_round_trip(read_table("CAS"))
+
+
+def test_memory_tables(workdir):
+    datastore.use_memory(persist=False, persist_tables=["Final"])
+    try:
+        write_table(sample(), "Best_score")
+        write_table(sample(), "Final")
+        assert_round_trip(read_table("Best_score"))
+        assert not (workdir / "data" / "Best_score.parquet").exists()
+        assert (workdir / "data" / "Final.parquet").exists()
+    finally:
+        datastore.release_memory()
+
+
+def test_patch_rows():
+    patched = patch_rows(sample(), [1], pd.DataFrame({"Name": ["Water"]}), ["Name"])
+    assert patched["Name"].tolist() == ["Ethanol", "Water"]
+    assert pd.isna(sample()["Name"].iloc[1])
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from embedding_store import EmbeddingStore
+
+
+def test_add_and_reopen(tmp_path):
+    store = EmbeddingStore("model", root=str(tmp_path))
+    store.add(["a", "b"], np.array([[1, 2], [3, 4]], dtype=np.float32))
+    assert store.missing(["a", "c", "a"]) == ["c"]
+    store.close()
+
+    store = EmbeddingStore("model", root=str(tmp_path))
+    assert len(store) == 2
+    np.testing.assert_array_equal(store.get(["b", "a"]), [[3, 4], [1, 2]])
+    store.close()
+
+
+def test_partial_row_is_truncated(tmp_path):
+    store = EmbeddingStore("model", root=str(tmp_path))
+    store.add(["a"], np.array([[1, 2]], dtype=np.float32))
+    store.close()
+    # Сбой во время записи: в конце файла половина строки, в индекс она не попала
+    with open(store.vectors_path, "ab") as file:
+        file.write(np.float32(9).tobytes())
+
+    store = EmbeddingStore("model", root=str(tmp_path))
+    store.add(["b"], np.array([[3, 4]], dtype=np.float32))
+    np.testing.assert_array_equal(store.get(["a", "b"]), [[1, 2], [3, 4]])
+    store.close()
+
+
+def test_dtype_mismatch(tmp_path):
+    store = EmbeddingStore("model", root=str(tmp_path), dtype="float16")
+    store.add(["a"], np.array([[1, 2]], dtype=np.float32))
+    store.close()
+    with pytest.raises(ValueError):
+        EmbeddingStore("model", root=str(tmp_path), dtype="float32")
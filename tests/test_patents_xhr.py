@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+
+from bench.stubs import PATENTS_FIXTURE, StubServer, patents_response
+from failures import FetchError
+from patents_xhr import XhrSearch, parse_results, xhr_query_url
+from proj_2 import generate_link
+
+
+def search_results(base_url, url, max_retries=4):
+    async def main():
+        async with XhrSearch(4, 1000, 1000, base_url) as search:
+            search._fetcher.max_retries = max_retries
+            return await search.search_results(url)
+
+    return asyncio.run(main())
+
+
+def test_parse_results_fixture():
+    results = parse_results(PATENTS_FIXTURE)
+    assert [number for number, _ in results] == ["US9669409B2", "CN105603101A", "WO2018009346A1"]
+    # Разметка подсветки и HTML-сущности убраны, номер, заголовок и фрагмент — в одном тексте
+    number, text = results[0]
+    assert text.startswith("US9669409B2 Method for producing xanthan gum in a microfluidic reactor")
+    assert "<b>" not in text and "&hellip;" not in text
+
+
+def test_parse_results_empty_payload():
+    assert parse_results({}) == []
+    assert parse_results({"results": {"cluster": [{"result": [{"patent": {}}]}]}}) == []
+
+
+def test_xhr_query_url_keeps_search_parameters():
+    url = xhr_query_url(generate_link("(microfluidic) AND (xanthan gum)", 30), "http://localhost:1/")
+    assert url.startswith("http://localhost:1/xhr/query?url=q%3D%28microfluidic%29")
+    assert "num%3D30" in url and url.endswith("&exp=")
+
+
+def test_search_against_stub(stub_server):
+    link = generate_link("(microfluidic) AND (xanthan gum)")
+    expected = parse_results(patents_response(link.split("?", 1)[1]))
+    assert len(expected) == 9
+    assert search_results(stub_server.base_url, link) == expected
+    assert stub_server.requests == 1
+
+
+def test_search_error_is_not_an_empty_result():
+    with StubServer(error_rate=1.0) as server:
+        with pytest.raises(FetchError):
+            search_results(server.base_url, generate_link("(microfluidic) AND (ethanol)"), max_retries=0)
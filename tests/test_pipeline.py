@@ -0,0 +1,22 @@
+import pytest
+
+from pipeline import group_streamed, order_steps
+
+
+def test_order_steps():
+    assert order_steps(["proj_2", "csv_split", "proj_1"]) == ["csv_split", "proj_1", "proj_2"]
+    with pytest.raises(ValueError):
+        order_steps(["proj_9"])
+
+
+@pytest.mark.parametrize("names, grouped, streamed", [
+    (["csv_split", "proj_1", "proj_2", "proj_3", "proj_4", "proj_5"],
+     ["csv_split", "stream", "proj_5"], ["proj_1", "proj_2", "proj_3", "proj_4"]),
+    (["proj_2", "proj_3"], ["stream"], ["proj_2", "proj_3"]),
+    # proj_3 нужна таблица Patents, а не строки proj_1: этапы не объединяются
+    (["proj_1", "proj_3"], ["proj_1", "proj_3"], []),
+    (["proj_1", "proj_3", "proj_4"], ["proj_1", "stream"], ["proj_3", "proj_4"]),
+    (["proj_2"], ["proj_2"], []),
+])
+def test_group_streamed(names, grouped, streamed):
+    assert group_streamed(names) == (grouped, streamed)
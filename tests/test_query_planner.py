@@ -0,0 +1,121 @@
+import asyncio
+from urllib.parse import parse_qs, urlsplit
+
+from bench.stubs import query_synonyms
+from patents_xhr import XhrSearch
+from proj_2 import generate_link
+from query_planner import QueryPlanner, batch_query, matches, plan_batches
+
+
+class FakeBackend:
+    """Бэкенд поиска в памяти: {синоним: [(номер, текст результата)]}, запрос с OR — объединение."""
+
+    titled_results = True
+
+    def __init__(self, results):
+        self.results = results
+        self.queries = []
+
+    async def search_results(self, url):
+        params = parse_qs(urlsplit(url).query)
+        _, synonyms = query_synonyms(params["q"][0])
+        self.queries.append(synonyms)
+        found = [result for synonym in synonyms for result in self.results.get(synonym, [])]
+        return found[:int(params.get("num", ["10"])[0])]
+
+
+def run_planner(backend, synonyms, **kwargs):
+    planner = QueryPlanner(backend, generate_link, **kwargs)
+    found, certain = asyncio.run(planner.search("microfluidic", synonyms))
+    return found, certain, planner
+
+
+def test_batch_query():
+    assert batch_query("flow", ["ethanol"]) == "(flow) AND (ethanol)"
+    assert batch_query("flow", ["ethanol", "acetone"]) == "(flow) AND ((ethanol) OR (acetone))"
+
+
+def test_plan_batches_respects_limits():
+    synonyms = [f"compound {i}" for i in range(14)]
+    batches = plan_batches("flow", synonyms, generate_link, max_url_length=2000, max_synonyms=6)
+    assert [len(batch) for batch in batches] == [6, 6, 2]
+    assert [s for batch in batches for s in batch] == synonyms
+
+    short = plan_batches("flow", synonyms, generate_link, max_url_length=150, max_synonyms=6)
+    assert all(len(generate_link(batch_query("flow", batch), len(batch))) <= 150 for batch in short if len(batch) > 1)
+
+
+def test_matches_whole_words():
+    assert matches("sodium chloride", "US1 Chloride of sodium in flow")
+    assert not matches("NA", "sodium carbonate")
+    assert matches("Na", "Na salt")
+    assert not matches("ac", "acetic acid")
+    assert not matches("", "anything")
+
+
+def test_attribution_by_title():
+    backend = FakeBackend({
+        "ethanol": [("US1", "US1 Ethanol production")],
+        "acetone": [("US2", "US2 Acetone recovery"), ("US3", "US3 acetone and ethanol blend")],
+    })
+    found, certain, planner = run_planner(backend, ["ethanol", "acetone"])
+    assert found == {"ethanol": ["US1", "US3"], "acetone": ["US2", "US3"]}
+    # Распределение по тексту не точное: такие результаты не кэшируются как результат ссылки
+    assert certain == set()
+    assert planner.requests == 1
+
+
+def test_ambiguous_batch_is_requeried_per_synonym():
+    backend = FakeBackend({
+        "ethanol": [("US1", "US1 Ethanol production")],
+        "acetone": [("US2", "US2 Solvent recovery")],
+    })
+    found, certain, planner = run_planner(backend, ["ethanol", "acetone"])
+    assert found == {"ethanol": ["US1"], "acetone": ["US2"]}
+    assert certain == {"ethanol", "acetone"}
+    assert backend.queries == [["ethanol", "acetone"], ["ethanol"], ["acetone"]]
+
+
+def test_full_page_splits_batch():
+    backend = FakeBackend({
+        "ethanol": [(f"US{i}", f"US{i} ethanol") for i in range(10)],
+        "acetone": [(f"CN{i}", f"CN{i} acetone") for i in range(10)],
+    })
+    found, certain, planner = run_planner(backend, ["ethanol", "acetone"])
+    assert len(found["ethanol"]) == len(found["acetone"]) == 10
+    assert certain == {"ethanol", "acetone"}
+    assert planner.requests == 3
+
+
+def test_failed_batch_reports_error():
+    class Broken(FakeBackend):
+        async def search_results(self, url):
+            raise ConnectionError("down")
+
+    errors = []
+
+    async def main():
+        planner = QueryPlanner(Broken({}), generate_link)
+        return await planner.search("microfluidic", ["ethanol", "acetone"], on_error=lambda s, e: errors.append(s))
+
+    found, certain = asyncio.run(main())
+    assert found == {"ethanol": [], "acetone": []} and certain == set()
+    assert errors == [["ethanol", "acetone"]]
+
+
+def test_planner_matches_single_queries_on_stub(stub_server):
+    """Через заглушку Google Patents результаты планировщика совпадают с отдельными запросами синонимов."""
+    synonyms = [f"compound {i}" for i in range(30)] + ["ethanol", "sodium chloride", "NA", "acetic acid"]
+
+    async def main():
+        async with XhrSearch(8, 1000, 1000, stub_server.base_url) as search:
+            planner = QueryPlanner(search, generate_link)
+            found, certain = await planner.search("microfluidic", synonyms)
+            own = {s: await search.search(generate_link(f"(microfluidic) AND ({s})")) for s in synonyms}
+            return found, certain, own, planner.requests
+
+    found, certain, own, requests = asyncio.run(main())
+    assert found == own
+    # Часть синонимов заглушка не упоминает в заголовках — их пакеты запрашиваются заново
+    assert 0 < len(certain) < len(synonyms)
+    assert requests < len(synonyms)
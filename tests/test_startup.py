@@ -0,0 +1,14 @@
+import pytest
+
+from bench.startup import STARTUP_BUDGET_MS, measure
+
+
+@pytest.mark.parametrize("module", sorted(STARTUP_BUDGET_MS))
+def test_import_within_budget(module):
+    """Модуль этапа импортируется в отдельном интерпретаторе (python -X importtime) не дольше бюджета."""
+    imported, _, children, error = measure(module, repeat=3)
+    if error is not None and error.startswith("ModuleNotFoundError"):
+        pytest.skip(f"не установлена зависимость: {error}")
+    assert error is None, error
+    heavy = ", ".join(f"{name} {ms:.0f} мс" for name, ms in children[:3])
+    assert imported <= STARTUP_BUDGET_MS[module], f"импорт {imported:.0f} мс, самые тяжёлые: {heavy}"
@@ -0,0 +1,25 @@
+import pytest
+
+from translation import is_english
+
+
+@pytest.mark.parametrize("text", [
+    "A continuous process for the synthesis of compound 229 in a microfluidic reactor with improved heat transfer.",
+    "Method for producing lithium carbonate",
+    "Microfluidic chip",
+])
+def test_english(text):
+    assert is_english(text)
+
+
+@pytest.mark.parametrize("text", [
+    "Die Erfindung betrifft ein Verfahren zur Herstellung von Xanthan in einem mikrofluidischen Reaktor, "
+    "wobei die Temperatur geregelt wird.",
+    "L'invention concerne un procédé de préparation de la gomme xanthane dans un réacteur microfluidique "
+    "avec un rendement élevé.",
+    "La invención se refiere a un procedimiento para la preparación de goma xantana en un reactor "
+    "microfluídico con alto rendimiento.",
+    "本发明涉及一种在微通道反应器中连续制备的方法",
+])
+def test_not_english(text):
+    assert not is_english(text)
@@ -0,0 +1,210 @@
+import hashlib
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Лимит GoogleTranslator — 5000 символов на запрос, оставляем запас под разделители
+MAX_CHARS = 4500
+SEPARATOR = "\n"
+
+# deep_translator импортируется при первом обращении к переводчику (см. translator_class)
+GoogleTranslator = None
+
+WORD_REGEX = re.compile(r"[^\W\d_]+")
+ENGLISH_STOPWORDS = {
+    "the", "of", "and", "a", "an", "to", "in", "is", "are", "for", "with", "by", "on",
+    "as", "at", "from", "or", "which", "that", "this", "be", "it", "its", "wherein", "said",
+}
+# Служебные слова других языков с латиницей; слова, совпадающие с английскими ("in", "a"), не учитываются
+OTHER_STOPWORDS = {
+    language: words - ENGLISH_STOPWORDS
+    for language, words in {
+        "de": {"der", "die", "das", "und", "ist", "mit", "von", "zur", "zum", "den", "dem", "des", "ein",
+               "eine", "einer", "eines", "für", "durch", "auf", "wird", "werden", "sich", "bei", "oder", "aus", "wobei"},
+        "fr": {"le", "la", "les", "des", "du", "de", "et", "est", "une", "un", "pour", "dans", "par", "avec",
+               "sur", "qui", "que", "au", "aux", "ou", "selon", "ce", "cette"},
+        "es": {"el", "la", "los", "las", "del", "de", "y", "es", "una", "un", "para", "por", "con", "que",
+               "en", "se", "su", "al", "o", "sus", "como"},
+        "it": {"il", "lo", "la", "gli", "le", "di", "del", "della", "dei", "e", "una", "un", "per", "con",
+               "che", "sono", "nel", "nella", "da"},
+        "pt": {"o", "os", "as", "do", "da", "dos", "das", "de", "e", "uma", "um", "para", "por", "com",
+               "que", "em", "no", "na", "ao"},
+    }.items()
+}
+
+
+def is_english(text):
+    """
+    Дешёвое определение английского текста без сетевых запросов:
+    почти все буквы латинские, английских служебных слов больше, чем служебных слов
+    любого другого языка с латиницей (немецкого, французского, испанского и т. д.),
+    и в длинном тексте их достаточно много.
+    """
+    words = WORD_REGEX.findall(text)
+    if not words:
+        return True
+    letters = sum(len(w) for w in words)
+    ascii_letters = sum(len(w) for w in words if w.isascii())
+    if ascii_letters / letters < 0.95:
+        return False
+    lowered = [w.lower() for w in words]
+    english = sum(1 for w in lowered if w in ENGLISH_STOPWORDS)
+    if any(sum(1 for w in lowered if w in stopwords) >= max(english, 1) for stopwords in OTHER_STOPWORDS.values()):
+        return False
+    if len(words) < 8:
+        return True
+    return english / len(words) >= 0.08
+
+
+def translator_class():
+    global GoogleTranslator
+    if GoogleTranslator is None:
+        from deep_translator import GoogleTranslator
+    return GoogleTranslator
+
+
+def text_key(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def pack_batches(texts, max_chars=MAX_CHARS):
+    """Упаковывает тексты в пакеты, длина которых вместе с разделителями не превышает max_chars."""
+    batches = []
+    current = []
+    size = 0
+    for text in texts:
+        extra = len(text) + (len(SEPARATOR) if current else 0)
+        if current and size + extra > max_chars:
+            batches.append(current)
+            current, size = [], 0
+            extra = len(text)
+        current.append(text)
+        size += extra
+    if current:
+        batches.append(current)
+    return batches
+
+
+class BatchTranslator:
+    """
+    Перевод на английский с пропуском английских текстов, постоянным кэшем
+    «хэш текста → перевод» и упаковкой коротких текстов в один запрос к переводчику.
+    """
+
+    def __init__(self, cache=None, max_workers=10, max_chars=MAX_CHARS, metrics=None):
+        self.cache = cache
+        self.metrics = metrics
+        self.max_workers = max_workers or 10
+        self.max_chars = max_chars
+        self.stats = {"texts": 0, "english": 0, "cached": 0, "duplicates": 0, "translated": 0, "requests": 0}
+        self.failed = set()
+        # Текст → последняя ошибка его перевода ("ИмяИсключения: текст")
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def _request(self, text):
+        with self._lock:
+            self.stats["requests"] += 1
+        translator = translator_class()(source="auto", target="en")
+        if self.metrics is None:
+            return translator.translate(text)
+        with self.metrics.timed("translate"):
+            return translator.translate(text)
+
+    def _translate_batch(self, batch):
+        """Переводит пакет одним запросом; если разделители потерялись — по одному тексту."""
+        if len(batch) > 1:
+            try:
+                translated = self._request(SEPARATOR.join(batch))
+                parts = translated.split(SEPARATOR) if translated else []
+                if len(parts) == len(batch):
+                    return [part.strip() or text for part, text in zip(parts, batch)]
+            except Exception as e:
+                # print(f" Ошибка пакетного перевода: {e}")
+                pass
+            if self.metrics is not None:
+                self.metrics.retry("translate", len(batch))
+        results = []
+        for text in batch:
+            try:
+                results.append(self._request(text) or text)
+            except Exception as e:
+                # print(f" Ошибка перевода: {e}")
+                with self._lock:
+                    self.errors[text] = f"{type(e).__name__}: {e}"
+                results.append(None)
+        return results
+
+    def translate_many(self, texts):
+        """Возвращает словарь {исходный текст: перевод}; при ошибке перевода — исходный текст."""
+        translations = {}
+        pending = []
+        seen = set()
+        counts = {"texts": 0, "english": 0, "cached": 0, "duplicates": 0, "translated": 0}
+        for text in texts:
+            counts["texts"] += 1
+            if text in seen:
+                counts["duplicates"] += 1
+                continue
+            seen.add(text)
+            if not text or is_english(text):
+                counts["english"] += 1
+                translations[text] = text
+            else:
+                pending.append(text)
+
+        if self.cache is not None and pending:
+            cached = self.cache.get_many(text_key(t) for t in pending)
+            remaining = []
+            for text in pending:
+                entry = cached.get(text_key(text))
+                if entry is not None:
+                    counts["cached"] += 1
+                    translations[text] = entry.value
+                else:
+                    remaining.append(text)
+            if self.metrics is not None:
+                self.metrics.cache(counts["cached"], len(remaining))
+            pending = remaining
+
+        # Переносы строк внутри текста заменяются пробелами, чтобы не путать их с разделителем пакета
+        flat = {text: " ".join(text.split()) for text in pending}
+        batches = pack_batches([flat[t] for t in pending], self.max_chars)
+        originals = iter(pending)
+        if self.max_workers > 1 and len(batches) > 1:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                translated = list(executor.map(self._translate_batch, batches))
+        else:
+            translated = [self._translate_batch(batch) for batch in batches]
+
+        done = []
+        failed = []
+        for results in translated:
+            for result in results:
+                text = next(originals)
+                translations[text] = result if result is not None else text
+                if result is not None:
+                    done.append((text_key(text), result, False))
+                else:
+                    failed.append(text)
+        counts["translated"] = len(done)
+        if self.cache is not None:
+            self.cache.put_many(done)
+
+        with self._lock:
+            self.failed.update(failed)
+            # Ошибки записаны под текстом без переносов строк — переносим их на исходный текст
+            for text in failed:
+                if flat[text] in self.errors:
+                    self.errors[text] = self.errors.pop(flat[text])
+            for key, value in counts.items():
+                self.stats[key] += value
+        return translations
+
+    def report(self):
+        avoided = self.stats["english"] + self.stats["cached"] + self.stats["duplicates"]
+        return (
+            f"Переводов без обращения к сети: {avoided} из {self.stats['texts']} "
+            f"(английский: {self.stats['english']}, кэш: {self.stats['cached']}, "
+            f"повторы: {self.stats['duplicates']}); запросов к переводчику: {self.stats['requests']}"
+        )